@@ -0,0 +1,33 @@
+"""add_binary_quantized_embeddings
+
+Revision ID: a6d4c08e9b53
+Revises: f3b8d2e61a07
+Create Date: 2026-10-17 15:20:36.000000
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a6d4c08e9b53'
+down_revision = 'f3b8d2e61a07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('snippet', sa.Column('embedding_bits', postgresql.BIT(varying=True), nullable=True))
+    # Same quantization as vector_store.quantize_binary (and pgvector's binary_quantize),
+    # written without binary_quantize so it also runs on pgvector < 0.7
+    op.execute(
+        "UPDATE snippet SET embedding_bits = ("
+        "SELECT string_agg(CASE WHEN x > 0 THEN '1' ELSE '0' END, '' ORDER BY i) "
+        "FROM unnest(embedding::real[]) WITH ORDINALITY AS t(x, i)"
+        ")::varbit WHERE embedding IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('snippet', 'embedding_bits')
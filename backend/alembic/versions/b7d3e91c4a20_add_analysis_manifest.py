@@ -0,0 +1,34 @@
+"""add_analysis_manifest
+
+Revision ID: b7d3e91c4a20
+Revises: 39b1f8c83ef4
+Create Date: 2026-10-17 09:12:41.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e91c4a20'
+down_revision = '39b1f8c83ef4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('analysis_manifest',
+    sa.Column('path', sa.String(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('mtime', sa.Float(), nullable=False),
+    sa.Column('content_hash', sa.String(), nullable=False),
+    sa.Column('snippets', sa.JSON(), nullable=True),
+    sa.Column('analyzed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('path')
+    )
+    op.create_index(op.f('ix_analysis_manifest_path'), 'analysis_manifest', ['path'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_analysis_manifest_path'), table_name='analysis_manifest')
+    op.drop_table('analysis_manifest')
@@ -0,0 +1,45 @@
+"""add_snippet_chunk
+
+Revision ID: b7e3a91c5d24
+Revises: a6d4c08e9b53
+Create Date: 2026-10-17 16:05:12.000000
+
+"""
+import sqlalchemy as sa
+from pgvector.sqlalchemy import HALFVEC, Vector
+
+from alembic import op
+from app.core.config import settings
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3a91c5d24'
+down_revision = 'a6d4c08e9b53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Same column type as snippet.embedding, see app.models.snippet.embedding_column_type
+    embedding_type = HALFVEC() if settings.EMBEDDING_HALF_PRECISION else Vector()
+    op.create_table('snippet_chunk',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('snippet_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('start', sa.Integer(), nullable=False),
+    sa.Column('end', sa.Integer(), nullable=False),
+    sa.Column('embedding', embedding_type, nullable=True),
+    sa.Column('embedding_model', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['snippet_id'], ['snippet.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_snippet_chunk_id'), 'snippet_chunk', ['id'], unique=False)
+    op.create_index(op.f('ix_snippet_chunk_snippet_id'), 'snippet_chunk', ['snippet_id'], unique=False)
+    op.create_index(op.f('ix_snippet_chunk_embedding_model'), 'snippet_chunk', ['embedding_model'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_snippet_chunk_embedding_model'), table_name='snippet_chunk')
+    op.drop_index(op.f('ix_snippet_chunk_snippet_id'), table_name='snippet_chunk')
+    op.drop_index(op.f('ix_snippet_chunk_id'), table_name='snippet_chunk')
+    op.drop_table('snippet_chunk')
@@ -0,0 +1,68 @@
+"""add_ann_vector_indexes
+
+Revision ID: c2f8e6a4d913
+Revises: b7e3a91c5d24
+Create Date: 2026-10-17 17:10:44.000000
+
+"""
+import hashlib
+import math
+
+import sqlalchemy as sa
+
+from alembic import op
+from app.core.config import settings
+
+# revision identifiers, used by Alembic.
+revision = 'c2f8e6a4d913'
+down_revision = 'b7e3a91c5d24'
+branch_labels = None
+depends_on = None
+
+# Same naming and DDL as app.services.vector_index, frozen here so later code changes cannot alter this migration
+INDEX_PREFIX = "ix_snippet_embedding_ann_"
+
+
+def _index_name(model_id: str, dimension: int) -> str:
+    return INDEX_PREFIX + hashlib.sha1(f"{model_id}:{dimension}".encode()).hexdigest()[:12]
+
+
+def upgrade() -> None:
+    method = settings.VECTOR_INDEX_METHOD
+    if method == "none":
+        return
+    connection = op.get_bind()
+    models = connection.execute(sa.text(
+        "SELECT embedding_model, embedding_dim, count(*) FROM snippet "
+        "WHERE embedding IS NOT NULL AND embedding_model IS NOT NULL AND embedding_dim > 0 "
+        "GROUP BY embedding_model, embedding_dim"
+    )).fetchall()
+    # One partial index per model, the column itself has no fixed dimension to index
+    for model_id, dimension, rows in models:
+        if settings.EMBEDDING_HALF_PRECISION or dimension > 2000:
+            if dimension > 4000:
+                continue
+            type_name = "halfvec"
+        else:
+            type_name = "vector"
+        if method == "hnsw":
+            options = f"m = {settings.VECTOR_HNSW_M}, ef_construction = {settings.VECTOR_HNSW_EF_CONSTRUCTION}"
+        else:
+            lists = settings.VECTOR_IVFFLAT_LISTS or max(1, rows // 1000 if rows <= 1_000_000 else int(math.sqrt(rows)))
+            options = f"lists = {lists}"
+        model_literal = "'" + model_id.replace("'", "''") + "'"
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {_index_name(model_id, dimension)} ON snippet "
+            f"USING {method} ((embedding::{type_name}({dimension})) {type_name}_cosine_ops) "
+            f"WITH ({options}) "
+            f"WHERE embedding_model = {model_literal} AND embedding_dim = {dimension}"
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    names = connection.execute(sa.text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = 'snippet' AND starts_with(indexname, :prefix)"
+    ), {"prefix": INDEX_PREFIX}).scalars().all()
+    for name in names:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
@@ -0,0 +1,39 @@
+"""add_minhash_lsh_index
+
+Revision ID: c41f0a8e6d15
+Revises: b7d3e91c4a20
+Create Date: 2026-10-17 11:03:27.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c41f0a8e6d15'
+down_revision = 'b7d3e91c4a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('snippet', sa.Column('minhash', sa.JSON(), nullable=True))
+    op.create_table('snippet_lsh_band',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('snippet_id', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['snippet_id'], ['snippet.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_snippet_lsh_band_id'), 'snippet_lsh_band', ['id'], unique=False)
+    op.create_index(op.f('ix_snippet_lsh_band_snippet_id'), 'snippet_lsh_band', ['snippet_id'], unique=False)
+    op.create_index(op.f('ix_snippet_lsh_band_bucket'), 'snippet_lsh_band', ['bucket'], unique=False)
+    # Existing snippets are indexed through POST /snippets/near-duplicates/index
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_snippet_lsh_band_bucket'), table_name='snippet_lsh_band')
+    op.drop_index(op.f('ix_snippet_lsh_band_snippet_id'), table_name='snippet_lsh_band')
+    op.drop_index(op.f('ix_snippet_lsh_band_id'), table_name='snippet_lsh_band')
+    op.drop_table('snippet_lsh_band')
+    op.drop_column('snippet', 'minhash')
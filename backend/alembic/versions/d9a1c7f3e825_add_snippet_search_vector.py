@@ -0,0 +1,32 @@
+"""add_snippet_search_vector
+
+Revision ID: d9a1c7f3e825
+Revises: c2f8e6a4d913
+Create Date: 2026-10-17 18:02:37.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd9a1c7f3e825'
+down_revision = 'c2f8e6a4d913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 'simple' keeps identifiers as written (no stemming, no stop words), Get-ADUser is indexed as
+    # get-aduser plus its parts. Content is capped, a tsvector cannot exceed 1MB.
+    op.execute(
+        "ALTER TABLE snippet ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'B') || "
+        "setweight(to_tsvector('simple', left(coalesce(content, ''), 100000)), 'C')"
+        ") STORED"
+    )
+    op.execute("CREATE INDEX ix_snippet_search_vector ON snippet USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_snippet_search_vector")
+    op.drop_column('snippet', 'search_vector')
@@ -0,0 +1,80 @@
+"""native_dimension_embeddings
+
+Revision ID: e5c19b7a3f62
+Revises: d8a2f5b17c39
+Create Date: 2026-10-17 13:47:09.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+from app.core.config import settings
+
+# revision identifiers, used by Alembic.
+revision = 'e5c19b7a3f62'
+down_revision = 'd8a2f5b17c39'
+branch_labels = None
+depends_on = None
+
+LOCAL_DIMENSION = 384  # all-MiniLM-L6-v2, zero padded to 1536 so far
+LOCAL_MODEL_ID = "local_builtin/all-MiniLM-L6-v2"
+
+
+def _remote_model_id(connection: sa.engine.Connection) -> str | None:
+    # Same naming as EmbeddingModel.id, frozen here so later code changes cannot alter this migration
+    config = dict(connection.execute(sa.text("SELECT key, value FROM system_settings")).fetchall())
+    provider = config.get("EMBEDDING_PROVIDER") or config.get("LLM_PROVIDER") or "openai"
+    if provider == "local_builtin":
+        return None  # Unpadded vectors cannot come from the local model, leave them for re-indexing
+    if provider == "azure":
+        deployment = config.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME") or config.get("AZURE_OPENAI_DEPLOYMENT_NAME")
+        return f"azure:{config.get('AZURE_OPENAI_ENDPOINT') or ''}/{deployment or ''}"
+    base_url = config.get("OPENAI_BASE_URL")
+    return f"{'openai:' + base_url if base_url else 'openai'}/text-embedding-3-small"
+
+
+def upgrade() -> None:
+    op.add_column('snippet', sa.Column('embedding_model', sa.String(), nullable=True))
+    op.add_column('snippet', sa.Column('embedding_dim', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_snippet_embedding_model'), 'snippet', ['embedding_model'], unique=False)
+
+    # Drop the fixed width, every row keeps its values
+    op.execute("ALTER TABLE snippet ALTER COLUMN embedding TYPE vector")
+
+    # Zero padded local vectors are cut back to their native 384 dimensions, nothing is re-embedded
+    op.execute(sa.text(
+        "UPDATE snippet SET "
+        "embedding = ((embedding::real[])[1:384])::vector, "
+        "embedding_model = :model, embedding_dim = :dim "
+        "WHERE embedding IS NOT NULL "
+        "AND (embedding::real[])[385:1536] = array_fill(0::real, ARRAY[1152])"
+    ).bindparams(model=LOCAL_MODEL_ID, dim=LOCAL_DIMENSION))
+
+    connection = op.get_bind()
+    remote_model = _remote_model_id(connection)
+    if remote_model is not None:
+        connection.execute(sa.text(
+            "UPDATE snippet SET embedding_model = :model, embedding_dim = vector_dims(embedding) "
+            "WHERE embedding IS NOT NULL AND embedding_model IS NULL"
+        ), {"model": remote_model})
+
+    if settings.EMBEDDING_HALF_PRECISION:
+        op.execute("ALTER TABLE snippet ALTER COLUMN embedding TYPE halfvec USING embedding::halfvec")
+
+    # Cached local embeddings were stored padded under dimension 1536 and would never be hit again
+    op.execute("DELETE FROM embedding_cache WHERE provider = 'local_builtin'")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE snippet ALTER COLUMN embedding TYPE vector USING embedding::vector")
+    op.execute(
+        "UPDATE snippet SET embedding = (embedding::real[] || "
+        "array_fill(0::real, ARRAY[1536 - vector_dims(embedding)]))::vector "
+        "WHERE embedding IS NOT NULL AND vector_dims(embedding) < 1536"
+    )
+    op.execute("UPDATE snippet SET embedding = NULL WHERE vector_dims(embedding) > 1536")
+    op.execute("ALTER TABLE snippet ALTER COLUMN embedding TYPE vector(1536)")
+    op.execute("DELETE FROM embedding_cache WHERE provider = 'local_builtin'")
+    op.drop_index(op.f('ix_snippet_embedding_model'), table_name='snippet')
+    op.drop_column('snippet', 'embedding_model')
+    op.drop_column('snippet', 'embedding_dim')
@@ -0,0 +1,25 @@
+"""add_analysis_manifest_analyzer_version
+
+Revision ID: e8c3b5d2a714
+Revises: d9a1c7f3e825
+Create Date: 2026-10-17 21:14:05.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e8c3b5d2a714'
+down_revision = 'd9a1c7f3e825'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing entries have no version and are re-parsed on the next scan
+    op.add_column('analysis_manifest', sa.Column('analyzer_version', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('analysis_manifest', 'analyzer_version')
@@ -0,0 +1,41 @@
+"""add_reindex_job
+
+Revision ID: f3b8d2e61a07
+Revises: e5c19b7a3f62
+Create Date: 2026-10-17 14:32:51.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d2e61a07'
+down_revision = 'e5c19b7a3f62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('reindex_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('model_id', sa.String(), nullable=True),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('processed', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('last_snippet_id', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_reindex_job_id'), 'reindex_job', ['id'], unique=False)
+    op.create_index(op.f('ix_reindex_job_status'), 'reindex_job', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_reindex_job_status'), table_name='reindex_job')
+    op.drop_index(op.f('ix_reindex_job_id'), table_name='reindex_job')
+    op.drop_table('reindex_job')
@@ -0,0 +1,42 @@
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from starlette.types import Message
+
+from app.core.config import settings
+
+
+class BodySizeLimitRoute(APIRoute):
+    """
+    Route that rejects request bodies larger than ANALYZER_UPLOAD_MAX_REQUEST_BYTES with a 413.
+    The body is counted while it is received, before Starlette spools multipart uploads, so an
+    oversized upload is stopped at the limit instead of after it has been written to disk.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request) -> Response:
+            limit = settings.ANALYZER_UPLOAD_MAX_REQUEST_BYTES
+            declared = request.headers.get("content-length", "")
+            if declared.isdigit() and int(declared) > limit:
+                raise HTTPException(status_code=413, detail="Request exceeds the request size limit")
+
+            received = 0
+            receive = request.receive
+
+            async def limited_receive() -> Message:
+                nonlocal received
+                message = await receive()
+                if message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    # Raised inside the body parsing, FastAPI passes HTTPExceptions through
+                    if received > limit:
+                        raise HTTPException(status_code=413, detail="Request exceeds the request size limit")
+                return message
+
+            return await handler(Request(request.scope, limited_receive))
+
+        return limited_handler
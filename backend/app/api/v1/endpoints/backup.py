@@ -12,6 +12,8 @@ from app.models.setting import SystemSetting
 from app.models.snippet import Snippet
 from app.models.user import User
 from app.schemas.backup import BackupData
+from app.services.near_duplicates import near_duplicate_index
+from app.services.settings_cache import settings_cache
 
 router = APIRouter()
 
@@ -67,11 +69,14 @@ def import_backup(
             
         # Snippets
         for sn in backup_data.snippets:
-            data = sn.model_dump(exclude={'has_embedding'})
+            # Backups carry no vectors, so no embedding model either
+            data = sn.model_dump(exclude={'has_embedding', 'embedding_model'})
             snippet_obj = Snippet(**data)
-            db.merge(snippet_obj)
+            # Backups carry no MinHash signature, and the content may differ from the stored one
+            near_duplicate_index.index_snippet(db.merge(snippet_obj))
             
         db.commit()
+        settings_cache.invalidate()
         
         # Reset sequences (Postgres specific)
         with contextlib.suppress(Exception):
@@ -5,9 +5,11 @@ from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.db.upsert import dialect_insert
 from app.models.setting import SystemSetting
 from app.schemas.setting import SettingResponse, SettingsUpdateRequest
 from app.services.ai_service import AIService
+from app.services.settings_cache import SystemSettings, settings_cache
 
 
 class TestConnectionRequest(BaseModel):
@@ -38,13 +40,16 @@ DEFAULT_KEYS = {
 SECRETS = ["OPENAI_API_KEY"]
 
 def _ensure_defaults(db: Session) -> None:
-    for key, default_val in DEFAULT_KEYS.items():
-        exists = db.query(SystemSetting).filter(SystemSetting.key == key).first()
-        if not exists:
-            # Check if secret
-            is_secret = key in SECRETS
-            db.add(SystemSetting(key=key, value=default_val, is_secret=is_secret))
+    # Every key is known already, no need to touch the table
+    if DEFAULT_KEYS.keys() <= settings_cache.get(db).keys:
+        return
+    # One INSERT for all defaults, keys that exist keep their value
+    rows = [
+        {"key": key, "value": default_val, "is_secret": key in SECRETS} for key, default_val in DEFAULT_KEYS.items()
+    ]
+    db.execute(dialect_insert(db, SystemSetting).values(rows).on_conflict_do_nothing(index_elements=["key"]))
     db.commit()
+    settings_cache.invalidate()
 
 @router.get("/", response_model=list[SettingResponse])
 def get_settings(
@@ -74,8 +79,11 @@ def update_settings(
     Update settings.
     """
     updated = []
+    existing: dict[str, SystemSetting] = {
+        str(s.key): s for s in db.query(SystemSetting).filter(SystemSetting.key.in_(list(update_req.settings)))
+    }
     for key, value in update_req.settings.items():
-        setting = db.query(SystemSetting).filter(SystemSetting.key == key).first()
+        setting = existing.get(key)
         if setting:
             setting.value = value
             updated.append(setting)
@@ -89,7 +97,7 @@ def update_settings(
             updated.append(new_setting)
     
     db.commit()
-    db.commit()
+    settings_cache.invalidate()
     return updated
 
 @router.post("/test-connection")
@@ -105,20 +113,20 @@ async def test_connection(
     # Check if masked key
     if not api_key_to_use or "****" in api_key_to_use:
         # Retrieve stored key from DB
-        stored_setting = db.query(SystemSetting).filter(SystemSetting.key == "OPENAI_API_KEY").first()
-        if stored_setting and stored_setting.value:
-             api_key_to_use = stored_setting.value
+        stored_key = settings_cache.get(db).openai_api_key
+        if stored_key:
+             api_key_to_use = stored_key
 
-    # Construct a temporary config dict
-    config = {
-        "LLM_PROVIDER": request.provider,
-        "OPENAI_API_KEY": api_key_to_use,
-        "OPENAI_BASE_URL": request.base_url,
-        "AZURE_OPENAI_ENDPOINT": request.azure_endpoint,
-        "AZURE_OPENAI_DEPLOYMENT_NAME": request.azure_deployment,
-        "AZURE_OPENAI_API_VERSION": request.azure_api_version,
-        "OPENAI_MODEL": request.model or "gpt-3.5-turbo" # Use provided model or fallback
-    }
+    # Construct temporary settings
+    config = SystemSettings(
+        llm_provider=request.provider,
+        openai_api_key=api_key_to_use,
+        openai_base_url=request.base_url,
+        azure_openai_endpoint=request.azure_endpoint,
+        azure_openai_deployment_name=request.azure_deployment,
+        azure_openai_api_version=request.azure_api_version,
+        openai_model=request.model or "gpt-3.5-turbo" # Use provided model or fallback
+    )
     
     try:
         # We'll reuse AIService's init_client but need to expose it or refactor.
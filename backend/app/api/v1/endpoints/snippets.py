@@ -1,21 +1,41 @@
+import asyncio
+import hashlib
+import json
 import logging
+import os
 import re
-from typing import Any
+from collections.abc import Iterable, Iterator
+from typing import IO, Any, Literal
 
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile
-from sqlalchemy.orm import Session
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.api import deps
+from app.api.body_limit import BodySizeLimitRoute
+from app.core.config import settings
+from app.models.reindex_job import ReindexJob
 from app.models.snippet import Snippet
-from app.schemas.analysis import SnippetAnalysisResult
+from app.schemas.analysis import AnalysisCacheStats, FolderAnalysisReport, SnippetAnalysisResult
+from app.schemas.embedding import EmbeddingCacheStats, LocalEmbeddingStats, ReindexJobStatus, VectorIndexStatus
 from app.schemas.snippet import SnippetCreate, SnippetResponse, SnippetUpdate
+from app.services.analysis_manifest import analysis_manifest_service
+from app.services.embedding_cache import embedding_cache
 from app.services.embedding_service import embedding_service
-from app.services.script_analyzer import ScriptAnalyzerService
+from app.services.near_duplicates import near_duplicate_index
+from app.services.reindex import reindex_service
+from app.services.script_analyzer import ArchiveLimitError, script_analyzer
+from app.services.vector_index import vector_index
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
-analyzer = ScriptAnalyzerService()
+# The size limit applies while the body is received, uploads beyond it are never spooled
+router = APIRouter(route_class=BodySizeLimitRoute)
+analyzer = script_analyzer
+
+# Stays below SQLite's default limit of bound parameters per statement
+HASH_LOOKUP_BATCH_SIZE = 500
 
 @router.post("/analyze/upload", response_model=list[SnippetAnalysisResult])
 async def analyze_upload(
@@ -25,33 +45,89 @@ async def analyze_upload(
 ) -> Any:
     """
     Analyze uploaded files for PowerShell content.
+    Starlette has already spooled the uploads; they are checked against the configured size caps
+    and parsed concurrently in the analyzer's worker pool straight from those spools.
     """
-    snippets = []
+    uploads: list[tuple[str, IO[bytes]]] = []
+    request_budget = settings.ANALYZER_UPLOAD_MAX_REQUEST_BYTES
+    limiter = asyncio.Semaphore(analyzer.worker_count() * 2)
+
+    async def analyze(filename: str, stream: IO[bytes]) -> list[SnippetCreate]:
+        async with limiter:
+            content = await run_in_threadpool(analyzer.decode_stream, stream)
+            return await analyzer.analyze_content_async(content, filename, split_functions)
+
     for file in files:
         if not file.filename or not file.filename.lower().endswith(".ps1"):
             continue
-            
-        content_bytes = await file.read()
+        size = _upload_size(file)
+        limit = min(settings.ANALYZER_UPLOAD_MAX_FILE_BYTES, request_budget)
+        if size > limit:
+            scope = "file" if limit == settings.ANALYZER_UPLOAD_MAX_FILE_BYTES else "request"
+            raise HTTPException(status_code=413, detail=f"Upload {file.filename} exceeds the {scope} size limit")
+        file.file.seek(0)
+        uploads.append((file.filename, file.file))
+        request_budget -= size
+
+    # FastAPI closes the uploads once the response is sent
+    extracted = await asyncio.gather(*(analyze(filename, stream) for filename, stream in uploads))
+
+    snippets = [s for file_snippets in extracted for s in file_snippets]
+    # MinHash signatures and the duplicate lookups are CPU and database work, kept off the event loop
+    return await run_in_threadpool(_to_analysis_results, snippets, db)
+
+@router.post("/analyze/archive", response_model=list[SnippetAnalysisResult])
+async def analyze_archive(
+    file: UploadFile,
+    split_functions: bool = Query(False, description="Whether to split script into functions"),
+    db: Session = Depends(deps.get_db)
+) -> Any:
+    """
+    Analyze every .ps1 file inside an uploaded .zip or .tar(.gz) archive.
+    Members are streamed out of the archive one by one (never extracted to disk) and
+    relative_path is set from the path inside the archive. The upload itself is capped at
+    ANALYZER_UPLOAD_MAX_REQUEST_BYTES while it is received (see BodySizeLimitRoute).
+    """
+    members = analyzer.iter_archive(
+        file.file, settings.ANALYZER_UPLOAD_MAX_FILE_BYTES, settings.ANALYZER_ARCHIVE_MAX_BYTES
+    )
+    limiter = asyncio.Semaphore(analyzer.worker_count() * 2)
+
+    async def analyze(member_path: str, content: str) -> list[SnippetCreate]:
         try:
-            content = content_bytes.decode("utf-8")
-        except UnicodeDecodeError:
-            # Fallback for other encodings if needed
-            content = content_bytes.decode("latin-1")
-            
-        extracted = analyzer.analyze_content(content, file.filename or "unknown", split_functions)
-        snippets.extend(extracted)
-    
-    # Fetch existing hashes to mark duplicates
-    existing_hashes = {r[0] for r in db.query(Snippet.content_hash).filter(Snippet.content_hash.isnot(None)).all()}
-    
-    results = []
-    for s in snippets:
-        res = SnippetAnalysisResult(**s.model_dump())
-        if s.content_hash and s.content_hash in existing_hashes:
-            res.is_duplicate = True
-        results.append(res)
-        
-    return results
+            extracted = await analyzer.analyze_content_async(content, os.path.basename(member_path), split_functions)
+        finally:
+            limiter.release()
+        for s in extracted:
+            s.relative_path = member_path
+        return extracted
+
+    tasks: list[asyncio.Task[list[SnippetCreate]]] = []
+    try:
+        try:
+            # Reading and decompressing happens in a thread; at most a few decoded members wait for a worker
+            async for member_path, content in iterate_in_threadpool(members):
+                await limiter.acquire()
+                tasks.append(asyncio.create_task(analyze(member_path, content)))
+        # Only errors of the archive itself are the client's fault
+        except ArchiveLimitError as e:
+            raise HTTPException(status_code=413, detail=str(e)) from e
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        extracted = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    snippets = [s for member_snippets in extracted for s in member_snippets]
+    return await run_in_threadpool(_to_analysis_results, snippets, db)
+
+def _upload_size(file: UploadFile) -> int:
+    # Set by the multipart parser; the body as a whole is capped while received (BodySizeLimitRoute)
+    if file.size is not None:
+        return file.size
+    file.file.seek(0, os.SEEK_END)
+    return file.file.tell()
 
 @router.post("/analyze", response_model=list[SnippetAnalysisResult])
 def analyze_folder(
@@ -60,18 +136,117 @@ def analyze_folder(
 ) -> Any:
     """
     Analyze a folder for PowerShell scripts and return detected snippets.
+    Only new or changed files are parsed (in parallel, see ANALYZER_WORKERS / ANALYZER_CHUNK_SIZE),
+    unchanged files are replayed from the analysis manifest.
     Does not save automatically, purely returns found candidates.
     Checks for duplicates based on content hash.
     """
-    snippets = analyzer.analyze_folder(folder_path)
+    analysis = analysis_manifest_service.analyze_folder(db, folder_path)
+    return _to_analysis_results(analysis.snippets, db)
+
+@router.post("/analyze/incremental", response_model=FolderAnalysisReport)
+def analyze_folder_incremental(
+    folder_path: str,
+    db: Session = Depends(deps.get_db)
+) -> Any:
+    """
+    Same as /analyze, but also reports deleted files and how many files were parsed or replayed.
+    """
+    analysis = analysis_manifest_service.analyze_folder(db, folder_path)
+    return FolderAnalysisReport(
+        results=_to_analysis_results(analysis.snippets, db),
+        deleted=analysis.deleted,
+        parsed_files=analysis.parsed_files,
+        cached_files=analysis.cached_files,
+    )
+
+@router.get("/analyze/cache", response_model=AnalysisCacheStats)
+def get_analysis_cache_stats() -> Any:
+    """
+    Hit/miss counters of the analysis result cache (for this backend process).
+    """
+    return analyzer.cache.stats()
+
+@router.post("/near-duplicates/index")
+def index_near_duplicates(
+    db: Session = Depends(deps.get_db)
+) -> Any:
+    """
+    Compute MinHash signatures for all snippets that do not have one yet (e.g. after upgrading).
+    """
+    return {"indexed": near_duplicate_index.index_missing(db)}
+
+@router.post("/analyze/stream")
+def analyze_folder_stream(
+    folder_path: str,
+    stream_format: Literal["ndjson", "sse"] = Query("ndjson", alias="format"),
+    progress_every: int = Query(50, ge=1, description="Emit a progress frame every N files"),
+    db: Session = Depends(deps.get_db)
+) -> StreamingResponse:
+    """
+    Stream the analysis of a folder as NDJSON lines or server-sent events.
+    Every frame has a type and data: "result" (one SnippetAnalysisResult), "progress" (files scanned,
+    snippets found) or a final "done" frame with the totals.
+    """
+    # The generator outlives the request's session, so it opens its own on the same engine
+    session_factory = sessionmaker(bind=db.get_bind())
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        _stream_folder_analysis(folder_path, session_factory, stream_format, progress_every),
+        media_type=media_type,
+    )
+
+def _stream_folder_analysis(
+    folder_path: str, session_factory: sessionmaker[Session], stream_format: str, progress_every: int
+) -> Iterator[str]:
+    files_scanned = 0
+    snippets_found = 0
+    pending: list[SnippetCreate] = []
+    with session_factory() as db:
+        for _, snippets in analyzer.iter_folder(folder_path):
+            files_scanned += 1
+            snippets_found += len(snippets)
+            pending.extend(snippets)
+            # Results are held back until one duplicate lookup can cover a whole batch
+            at_progress = files_scanned % progress_every == 0
+            if at_progress or len(pending) >= HASH_LOOKUP_BATCH_SIZE:
+                for res in _to_analysis_results(pending, db):
+                    yield _stream_frame("result", res.model_dump(), stream_format)
+                pending = []
+            if at_progress:
+                progress = {"files_scanned": files_scanned, "snippets_found": snippets_found}
+                yield _stream_frame("progress", progress, stream_format)
+        for res in _to_analysis_results(pending, db):
+            yield _stream_frame("result", res.model_dump(), stream_format)
+    yield _stream_frame("done", {"files_scanned": files_scanned, "snippets_found": snippets_found}, stream_format)
+
+def _stream_frame(frame_type: str, data: dict[str, Any], stream_format: str) -> str:
+    if stream_format == "sse":
+        return f"event: {frame_type}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"type": frame_type, "data": data}) + "\n"
+
+def _existing_hashes(db: Session, hashes: Iterable[str]) -> set[str]:
+    """
+    Return the subset of hashes already stored, using batched IN lookups on the indexed content_hash column.
+    """
+    candidates = sorted(set(hashes))
+    existing: set[str] = set()
+    for i in range(0, len(candidates), HASH_LOOKUP_BATCH_SIZE):
+        batch = candidates[i:i + HASH_LOOKUP_BATCH_SIZE]
+        existing.update(r[0] for r in db.query(Snippet.content_hash).filter(Snippet.content_hash.in_(batch)))
+    return existing
+
+def _to_analysis_results(snippets: list[SnippetCreate], db: Session) -> list[SnippetAnalysisResult]:
+    # Only look up the hashes we actually have candidates for
+    existing_hashes = _existing_hashes(db, (s.content_hash for s in snippets if s.content_hash))
     
-    # Fetch existing hashes to mark duplicates
-    existing_hashes = {r[0] for r in db.query(Snippet.content_hash).filter(Snippet.content_hash.isnot(None)).all()}
+    signatures = [near_duplicate_index.signature(s.content) for s in snippets]
+    near_duplicates = near_duplicate_index.find_similar(db, signatures) if snippets else []
     
     results = []
-    for s in snippets:
+    for s, similar in zip(snippets, near_duplicates, strict=True):
         # Convert to AnalysisResult and flag duplicates
-        res = SnippetAnalysisResult(**s.model_dump())
+        res = SnippetAnalysisResult(**s.model_dump(), near_duplicates=similar)
         if s.content_hash and s.content_hash in existing_hashes:
             res.is_duplicate = True
         results.append(res)
@@ -117,6 +292,153 @@ async def create_snippet(
     """
     Create a new snippet.
     """
+    snippet = await run_in_threadpool(_build_snippet, snippet_in)
+
+    try:
+        # Generate embedding for the new snippet
+        # Limit text length if necessary, but OpenAI handles up to 8k tokens.
+        await embedding_service.index_snippets([snippet], db)
+    except Exception as e:
+        logger.error(f"Failed to generate embedding for snippet {snippet_in.name}: {e}")
+        # We proceed without embedding rather than failing the creation
+
+    db.add(snippet)
+    db.commit()
+    db.refresh(snippet)
+    return snippet
+
+@router.post("/bulk", response_model=list[SnippetResponse])
+async def create_snippets(
+    *,
+    db: Session = Depends(deps.get_db),
+    snippets_in: list[SnippetCreate]
+) -> Any:
+    """
+    Create many snippets at once (e.g. importing analysis results), embedding them in batches.
+    """
+    snippets = await run_in_threadpool(lambda: [_build_snippet(snippet_in) for snippet_in in snippets_in])
+
+    try:
+        await embedding_service.index_snippets(snippets, db)
+    except Exception as e:
+        logger.error(f"Failed to generate embeddings for {len(snippets)} snippets: {e}")
+        # We proceed without embeddings rather than failing the import
+
+    db.add_all(snippets)
+    db.commit()
+    for snippet in snippets:
+        db.refresh(snippet)
+    return snippets
+
+@router.post("/index")
+async def index_snippets(
+    *,
+    db: Session = Depends(deps.get_db),
+    ids: list[int]
+) -> Any:
+    """
+    Regenerate embeddings for the given snippets with batched embedding calls.
+    """
+    snippets = db.query(Snippet).filter(Snippet.id.in_(ids)).all()
+    try:
+        await embedding_service.index_snippets(snippets, db)
+        db.commit()
+    except Exception as e:
+        logger.error(f"Failed to generate embeddings for {len(snippets)} snippets: {e}")
+        raise HTTPException(status_code=500, detail=f"Indexing failed: {str(e)}") from e
+    return {"indexed": len(snippets)}
+
+@router.get("/embeddings/cache", response_model=EmbeddingCacheStats)
+def get_embedding_cache_stats(
+    db: Session = Depends(deps.get_db)
+) -> Any:
+    """
+    Size and hit rate of the embedding cache (counters are for this backend process).
+    """
+    return embedding_cache.stats(db)
+
+@router.get("/embeddings/local", response_model=LocalEmbeddingStats)
+def get_local_embedding_stats() -> Any:
+    """
+    Backend and encode latency of the local embedding model (for this backend process).
+    """
+    return embedding_service.local_stats()
+
+@router.post("/reindex", response_model=ReindexJobStatus)
+async def start_reindex(
+    db: Session = Depends(deps.get_db)
+) -> Any:
+    """
+    Start a background job embedding every snippet that has no embedding of the current model
+    (e.g. after switching the embedding provider). Returns the running job if there is one.
+    """
+    job = reindex_service.start(db, sessionmaker(bind=db.get_bind(), autoflush=False))
+    return reindex_service.progress(job)
+
+@router.get("/reindex", response_model=ReindexJobStatus | None)
+def get_latest_reindex(
+    db: Session = Depends(deps.get_db)
+) -> Any:
+    """
+    Progress and ETA of the most recent re-index job.
+    """
+    job = db.query(ReindexJob).order_by(ReindexJob.id.desc()).first()
+    return reindex_service.progress(job) if job else None
+
+@router.get("/reindex/{job_id}", response_model=ReindexJobStatus)
+def get_reindex(
+    job_id: int,
+    db: Session = Depends(deps.get_db)
+) -> Any:
+    """
+    Progress and ETA of a re-index job.
+    """
+    job = db.get(ReindexJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Re-index job not found")
+    return reindex_service.progress(job)
+
+@router.post("/reindex/{job_id}/cancel", response_model=ReindexJobStatus)
+def cancel_reindex(
+    job_id: int,
+    db: Session = Depends(deps.get_db)
+) -> Any:
+    """
+    Stop a re-index job after its current chunk.
+    """
+    job = db.get(ReindexJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Re-index job not found")
+    return reindex_service.progress(reindex_service.cancel(db, job))
+
+@router.get("/vector-index", response_model=list[VectorIndexStatus])
+def get_vector_indexes(
+    db: Session = Depends(deps.get_db)
+) -> Any:
+    """
+    ANN index and size per embedding model.
+    """
+    _require_postgres(db)
+    return vector_index.status(db)
+
+@router.post("/vector-index/rebuild", response_model=list[VectorIndexStatus])
+def rebuild_vector_index(
+    method: Literal["hnsw", "ivfflat", "none"] | None = None,
+    db: Session = Depends(deps.get_db)
+) -> Any:
+    """
+    Drop and rebuild the ANN index of the active embedding model (default method: VECTOR_INDEX_METHOD).
+    Snippet writes wait while the index builds.
+    """
+    _require_postgres(db)
+    model = embedding_service.active_model(db)
+    return vector_index.rebuild(db, model.id, method)
+
+def _require_postgres(db: Session) -> None:
+    if db.get_bind().dialect.name != "postgresql":
+        raise HTTPException(status_code=400, detail="Vector indexes need PostgreSQL with pgvector")
+
+def _build_snippet(snippet_in: SnippetCreate) -> Snippet:
     # Auto-detect PowerShell function
     if re.search(r'^\s*function\s+[\w-]+\s*\{', snippet_in.content, re.IGNORECASE | re.MULTILINE):
         if snippet_in.tags is None:
@@ -126,7 +448,6 @@ async def create_snippet(
 
     if not snippet_in.content_hash:
         # Compute if not provided
-        import hashlib
         snippet_in.content_hash = hashlib.sha256(snippet_in.content.encode('utf-8')).hexdigest()
 
     snippet = Snippet(
@@ -140,21 +461,7 @@ async def create_snippet(
         relative_path=snippet_in.relative_path,
         content_hash=snippet_in.content_hash
     )
-
-    try:
-        # Generate embedding for the new snippet
-        # Combine relevant fields for semantic search
-        text_to_embed = f"{snippet_in.name}\n{snippet_in.description or ''}\n{snippet_in.content}"
-        # Limit text length if necessary, but OpenAI handles up to 8k tokens.
-        embedding = await embedding_service.generate_embedding(text_to_embed, db)
-        snippet.embedding = embedding
-    except Exception as e:
-        logger.error(f"Failed to generate embedding for snippet {snippet_in.name}: {e}")
-        # We proceed without embedding rather than failing the creation
-
-    db.add(snippet)
-    db.commit()
-    db.refresh(snippet)
+    near_duplicate_index.index_snippet(snippet)
     return snippet
 
 @router.get("/{id}", response_model=SnippetResponse)
@@ -214,12 +521,14 @@ async def update_snippet(
     for field, value in update_data.items():
         setattr(snippet, field, value)
 
+    if "content" in update_data:
+        # Signature plus loading the old LSH buckets to replace them, neither belongs on the event loop
+        await run_in_threadpool(near_duplicate_index.index_snippet, snippet)
+
     # Regenerate embedding if content/metadata changed
     if any(k in update_data for k in ["name", "description", "content"]):
         try:
-            text_to_embed = f"{snippet.name}\n{snippet.description or ''}\n{snippet.content}"
-            embedding = await embedding_service.generate_embedding(text_to_embed, db)
-            snippet.embedding = embedding
+            await embedding_service.index_snippets([snippet], db)
         except Exception as e:
             logger.error(f"Failed to update embedding for snippet {id}: {e}")
 
@@ -259,9 +568,7 @@ async def index_snippet(
         raise HTTPException(status_code=404, detail="Snippet not found")
         
     try:
-        text_to_embed = f"{snippet.name}\n{snippet.description or ''}\n{snippet.content}"
-        embedding = await embedding_service.generate_embedding(text_to_embed, db)
-        snippet.embedding = embedding
+        await embedding_service.index_snippets([snippet], db)
         db.add(snippet)
         db.commit()
         db.refresh(snippet)
@@ -1,5 +1,6 @@
 
 import json
+from typing import Literal
 
 from pydantic import AnyHttpUrl, EmailStr, PostgresDsn, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -50,6 +51,89 @@ class Settings(BaseSettings):
     AI_API_KEY: str = ""
     AI_MODEL: str = "gpt-4-turbo"
 
+    # Script analysis
+    ANALYZER_WORKERS: int = 0  # 0 = one worker process per CPU core, 1 = analyze serially
+    ANALYZER_CHUNK_SIZE: int = 64  # Files handed to a worker per batch
+    ANALYZER_UPLOAD_MAX_FILE_BYTES: int = 10 * 1024 * 1024
+    ANALYZER_UPLOAD_MAX_REQUEST_BYTES: int = 200 * 1024 * 1024
+    ANALYZER_ARCHIVE_MAX_BYTES: int = 1024 * 1024 * 1024  # Uncompressed size limit for archive uploads
+    ANALYZER_CACHE_SIZE: int = 4096  # Analysis results kept in memory, 0 disables the memory tier
+    ANALYZER_CACHE_DIR: str | None = None  # Enables the on-disk cache tier, e.g. /app/data/analysis-cache
+    ANALYZER_CACHE_DISK_MAX_ENTRIES: int = 100_000  # Files kept in the disk tier (least recently used go), 0 = no limit
+
+    # HTTP clients for the LLM/embedding providers, reused across requests
+    LLM_CLIENT_CACHE_SIZE: int = 8  # Distinct provider configs kept open at once
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle connection is kept
+    LLM_HTTP_TIMEOUT: float = 600.0  # Seconds per request (generations can be slow)
+    LLM_HTTP_CONNECT_TIMEOUT: float = 5.0
+    LLM_MAX_RETRIES: int = 2
+
+    # Seconds other worker processes may serve stale system settings after a change, 0 disables the cache
+    SETTINGS_CACHE_TTL_SECONDS: float = 30.0
+
+    # Embeddings
+    EMBEDDING_BATCH_SIZE: int = 256  # Inputs per remote embeddings request (OpenAI allows up to 2048)
+    EMBEDDING_BATCH_MAX_CHARS: int = 400_000  # Keeps a request well below the provider's token limit
+    EMBEDDING_LOCAL_BATCH_SIZE: int = 32  # Batch size for local encoding
+    # Local model runtime: "torch" (sentence-transformers) or "onnx" (int8 quantized export on onnxruntime,
+    # much cheaper on CPU-only hosts). Both produce all-MiniLM-L6-v2 embeddings, but the quantized ones are only
+    # close, so the ONNX file is part of the model id: switching backends makes stored vectors stale (re-index).
+    EMBEDDING_LOCAL_BACKEND: Literal["torch", "onnx"] = "torch"
+    EMBEDDING_ONNX_MODEL: str = "Xenova/all-MiniLM-L6-v2"  # Hugging Face repo or local directory with tokenizer.json
+    EMBEDDING_ONNX_FILE: str = "onnx/model_quantized.onnx"  # Relative to EMBEDDING_ONNX_MODEL
+    EMBEDDING_ONNX_THREADS: int = 0  # onnxruntime intra-op threads, 0 lets onnxruntime decide
+    # Load the local model and run one encode at startup, so the first request does not pay for it.
+    # With a sidecar the warm-up waits for its socket instead and never loads the model in the worker.
+    EMBEDDING_LOCAL_WARMUP: bool = False
+    EMBEDDING_MICROBATCH_MAX_SIZE: int = 64  # Texts from concurrent local requests coalesced into one encode
+    EMBEDDING_MICROBATCH_MAX_WAIT_MS: float = 5.0  # How long the first queued request waits for company
+    # Unix socket of the shared local model process (python -m app.embedding_sidecar), e.g. /tmp/embeddings.sock.
+    # Workers load the model themselves while the sidecar is not reachable; a request that times out fails.
+    EMBEDDING_SIDECAR_SOCKET: str | None = None
+    EMBEDDING_SIDECAR_TIMEOUT: float = 60.0  # Seconds per sidecar request
+    # Store snippet embeddings as pgvector halfvec (needs pgvector >= 0.7), half the size of vector.
+    # Read by the migrations, switching later needs ALTER TABLE snippet ALTER COLUMN embedding TYPE halfvec/vector
+    EMBEDDING_HALF_PRECISION: bool = False
+    # Long snippets additionally get one embedding per function / per this many characters, 0 disables chunking
+    EMBEDDING_CHUNK_MAX_CHARS: int = 4000
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 100_000  # Rows kept in the embedding cache table, 0 disables the cache
+
+    # Vector search: pick candidates by Hamming distance over binary quantized embeddings, rerank them exactly.
+    # Needs pgvector >= 0.7, falls back to the exact search otherwise
+    VECTOR_SEARCH_QUANTIZED: bool = False
+    VECTOR_RERANK_CANDIDATES: int = 200  # Candidates reranked with the full vectors
+    # Retrieval fuses a full-text search (exact cmdlet names) with the vector search by reciprocal rank fusion,
+    # in one query on Postgres. Off: vector search only
+    VECTOR_SEARCH_HYBRID: bool = True
+    HYBRID_SEARCH_CANDIDATES: int = 50  # Candidates taken from each of the lexical and the vector search
+    HYBRID_RRF_K: int = 60  # RRF score is the sum of 1 / (k + rank), a larger k flattens the rank differences
+    # Where similarity search runs: "pgvector" in the database, "numpy" in an in-memory index of this process,
+    # "auto" picks numpy unless the database is PostgreSQL (SQLite has no vector operators)
+    VECTOR_STORE_BACKEND: Literal["auto", "pgvector", "numpy"] = "auto"
+    # Directory the in-memory index is saved to and memory-mapped from on restart, None keeps it in memory only.
+    # Saved at shutdown assuming this process is the only writer, a stale save is detected and rebuilt.
+    VECTOR_MEMORY_INDEX_DIR: str | None = None
+    # Approximate nearest neighbour index per embedding model: "hnsw", "ivfflat" or "none" (exact scans).
+    # Built by the migration, by re-index jobs and by POST /snippets/vector-index/rebuild
+    VECTOR_INDEX_METHOD: Literal["hnsw", "ivfflat", "none"] = "hnsw"
+    VECTOR_HNSW_M: int = 16
+    VECTOR_HNSW_EF_CONSTRUCTION: int = 64
+    VECTOR_HNSW_EF_SEARCH: int = 40  # Candidates per HNSW search, higher improves recall and costs latency
+    VECTOR_IVFFLAT_LISTS: int = 0  # 0 picks rows / 1000 (sqrt(rows) above 1M rows) when the index is built
+    VECTOR_IVFFLAT_PROBES: int = 10  # Lists searched per IVFFlat search, higher improves recall and costs latency
+
+    # Bulk re-index job (POST /snippets/reindex)
+    REINDEX_CHUNK_SIZE: int = 256  # Snippets committed together, a resumed job repeats at most one chunk
+    REINDEX_BATCH_SIZE: int = 32  # Snippets per embedding call
+    REINDEX_CONCURRENCY: int = 4  # Embedding calls in flight at once
+    REINDEX_MAX_SNIPPETS_PER_MINUTE: int = 0  # Rate limit towards the provider, 0 = unlimited
+    REINDEX_STALE_SECONDS: int = 300  # A running job without heartbeat for this long is resumed
+
+    # Near-duplicate detection (MinHash signatures in an LSH band index)
+    NEAR_DUPLICATE_THRESHOLD: float = 0.8  # Minimum estimated Jaccard similarity to report
+
     # Security
     SECRET_KEY: str = "changethis-to-a-secure-random-key-in-production"
     ALGORITHM: str = "HS256"
@@ -0,0 +1,13 @@
+def setup_tracing() -> None:
+    """
+    Console span exporter for OpenTelemetry.
+    Imported on application startup rather than module import, the SDK is not needed by
+    Alembic, app.initial_data or the embedding sidecar.
+    """
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter, SimpleSpanProcessor
+
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(ConsoleSpanExporter()))
+    trace.set_tracer_provider(provider)
@@ -5,5 +5,13 @@ from app.models.snippet import Snippet  # noqa
 from app.models.setting import SystemSetting  # noqa
 from app.models.user import User  # noqa
 from app.models.project import Project  # noqa
+from app.models.analysis_manifest import AnalysisManifestEntry  # noqa
+from app.models.snippet_lsh import SnippetLshBand  # noqa
+from app.models.embedding_cache import EmbeddingCacheEntry  # noqa
+from app.models.reindex_job import ReindexJob  # noqa
+from app.models.snippet_chunk import SnippetChunk  # noqa
 
-__all__ = ["Base", "Snippet", "User", "Project"]
+__all__ = [
+    "Base", "Snippet", "User", "Project", "AnalysisManifestEntry", "SnippetLshBand", "EmbeddingCacheEntry",
+    "ReindexJob", "SnippetChunk",
+]
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from sqlalchemy.ext.declarative import as_declarative, declared_attr
 
@@ -8,7 +8,11 @@ class Base:
     id: Any
     __name__: str
 
+    if TYPE_CHECKING:
+        # The declarative constructor accepts mapped attributes as keyword arguments
+        def __init__(self, **kwargs: Any) -> None: ...
+
     # Generate __tablename__ automatically
-    @declared_attr
+    @declared_attr.directive
     def __tablename__(cls) -> str:
         return cls.__name__.lower()
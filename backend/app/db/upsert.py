@@ -0,0 +1,11 @@
+from typing import Any
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def dialect_insert(session: Session, model: Any) -> Any:
+    """INSERT construct of the session's dialect, which supports on_conflict_do_nothing/do_update."""
+    if session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
@@ -0,0 +1,38 @@
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.services.embedding_service import embedding_service
+from app.services.embedding_sidecar import serve
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Owns the one copy of the local embedding model that all backend workers share.
+# Started by entrypoint.sh when EMBEDDING_SIDECAR_SOCKET is set.
+
+def main() -> None:
+    if not settings.EMBEDDING_SIDECAR_SOCKET:
+        raise SystemExit("EMBEDDING_SIDECAR_SOCKET is not set")
+
+    # Load before listening, so workers fall back to their own model until it is ready
+    model = embedding_service._get_local_model()
+    if settings.EMBEDDING_LOCAL_WARMUP:
+        model.encode(["Get-ChildItem -Path ."])
+
+    def encode(texts: list[str]) -> list[list[float]]:
+        vectors: list[list[float]] = model.encode(texts, batch_size=settings.EMBEDDING_LOCAL_BATCH_SIZE).tolist()
+        return vectors
+
+    try:
+        asyncio.run(serve(
+            settings.EMBEDDING_SIDECAR_SOCKET,
+            encode,
+            max_batch_size=settings.EMBEDDING_MICROBATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_MICROBATCH_MAX_WAIT_MS,
+        ))
+    except KeyboardInterrupt:
+        logger.info("Embedding sidecar stopped")
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,21 @@
+import asyncio
 from typing import Any
 
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import ConsoleSpanExporter, SimpleSpanProcessor
 from structlog import get_logger
 
 from app.api.v1.api import api_router
 from app.api.v1.endpoints import terminal
 from app.core.config import settings
+from app.core.telemetry import setup_tracing
+from app.db.session import SessionLocal
+from app.services.embedding_service import embedding_service
+from app.services.llm_clients import llm_clients
+from app.services.memory_vector_index import memory_vector_index
+from app.services.reindex import reindex_service
+from app.services.script_analyzer import script_analyzer
 
-# Observability Setup
-trace.set_tracer_provider(TracerProvider())
-trace.get_tracer_provider().add_span_processor(  # type: ignore
-    SimpleSpanProcessor(ConsoleSpanExporter())
-)
-tracer = trace.get_tracer(__name__)
 logger = get_logger()
 
 app = FastAPI(
@@ -54,6 +53,22 @@ async def add_security_headers(request: Request, call_next: Any) -> Response:
 @app.on_event("startup")
 async def startup_event() -> None:
     logger.info("Starting up ER-PSScripter Backend...")
+    # Observability Setup
+    setup_tracing()
+    try:
+        reindex_service.resume_interrupted(SessionLocal)
+    except Exception as e:
+        logger.warning(f"Could not resume re-index jobs: {e}")
+    if settings.EMBEDDING_LOCAL_WARMUP:
+        # In the background, requests that need the model meanwhile queue behind the warm-up
+        app.state.embedding_warmup = asyncio.create_task(embedding_service.warm_up())
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    script_analyzer.shutdown()
+    embedding_service.shutdown()
+    memory_vector_index.save()
+    await llm_clients.aclose()
 
 @app.get("/health")
 def health_check() -> dict[str, str]:
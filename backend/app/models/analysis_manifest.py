@@ -0,0 +1,24 @@
+import datetime
+from typing import Any
+
+from sqlalchemy import JSON, BigInteger, DateTime, Float, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class AnalysisManifestEntry(Base):
+    __tablename__ = "analysis_manifest"
+
+    # Absolute path of an analyzed .ps1 file
+    path: Mapped[str] = mapped_column(String, primary_key=True, index=True)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    mtime: Mapped[float] = mapped_column(Float, nullable=False)
+    content_hash: Mapped[str] = mapped_column(String, nullable=False)  # SHA256 of the raw file bytes
+    # ANALYZER_VERSION the snippets were extracted with, entries of another version are re-parsed
+    analyzer_version: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Cached SnippetCreate dumps extracted from the file
+    snippets: Mapped[list[dict[str, Any]] | None] = mapped_column(JSON, default=list)
+    analyzed_at: Mapped[datetime.datetime | None] = mapped_column(
+        DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow
+    )
@@ -0,0 +1,22 @@
+import datetime
+
+from sqlalchemy import DateTime, Integer, LargeBinary, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    # Provider label, including the endpoint for self-hosted/Azure providers
+    provider: Mapped[str] = mapped_column(String, primary_key=True)
+    model: Mapped[str] = mapped_column(String, primary_key=True)
+    dimension: Mapped[int] = mapped_column(Integer, primary_key=True)
+    text_hash: Mapped[str] = mapped_column(String, primary_key=True)  # SHA256 of the embedded text
+    embedding: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # Packed float32 values
+    created_at: Mapped[datetime.datetime | None] = mapped_column(DateTime, default=datetime.datetime.utcnow)
+    # Eviction order
+    last_used_at: Mapped[datetime.datetime | None] = mapped_column(
+        DateTime, default=datetime.datetime.utcnow, index=True
+    )
@@ -0,0 +1,26 @@
+import datetime
+
+from sqlalchemy import DateTime, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class ReindexJob(Base):
+    __tablename__ = "reindex_job"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    # running, completed, failed, cancelled
+    status: Mapped[str] = mapped_column(String, nullable=False, default="running", index=True)
+    model_id: Mapped[str | None] = mapped_column(String, nullable=True)  # EmbeddingModel.id snippets are brought up to
+    # Snippets that needed embedding when the job started
+    total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    processed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    failed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Highest snippet id handled so far, a resumed job continues after it
+    last_snippet_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)  # Last embedding error
+    started_at: Mapped[datetime.datetime | None] = mapped_column(DateTime, default=datetime.datetime.utcnow)
+    # Written with every committed chunk, a running job without heartbeat was interrupted
+    heartbeat_at: Mapped[datetime.datetime | None] = mapped_column(DateTime, default=datetime.datetime.utcnow)
+    finished_at: Mapped[datetime.datetime | None] = mapped_column(DateTime, nullable=True)
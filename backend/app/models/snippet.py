@@ -1,22 +1,45 @@
 import datetime
 from typing import TYPE_CHECKING, Optional
 
-from pgvector.sqlalchemy import Vector
-from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, Text
+from pgvector.sqlalchemy import HALFVEC, Vector
+from sqlalchemy import JSON, Column, DateTime, FetchedValue, ForeignKey, Integer, String, Text
+from sqlalchemy.dialects.postgresql import BIT, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from app.core.config import settings
 from app.db.base_class import Base
 
 if TYPE_CHECKING:
     from app.models.project import Project
+    from app.models.snippet_chunk import SnippetChunk
+    from app.models.snippet_lsh import SnippetLshBand
+
+def embedding_column_type() -> HALFVEC | Vector:
+    # Stored at the model's native dimension, so the column has no fixed width
+    return HALFVEC() if settings.EMBEDDING_HALF_PRECISION else Vector()
 
 class Snippet(Base):
-    id = Column(Integer, primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, nullable=False)
     description = Column(Text, nullable=True)
     content = Column(Text, nullable=False)
     # Use mapped_column for better Mypy support with pgvector
-    embedding: Mapped[list[float] | None] = mapped_column(Vector(1536), nullable=True)
+    embedding: Mapped[list[float] | None] = mapped_column(embedding_column_type(), nullable=True)
+    # EmbeddingModel.id the embedding was made with
+    embedding_model: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    embedding_dim: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Binary quantized copy of the embedding ("0101..."), candidate search by Hamming distance
+    embedding_bits: Mapped[str | None] = mapped_column(
+        String().with_variant(BIT(varying=True), "postgresql"), nullable=True
+    )
+    # Full-text document over name, description and content, a generated column on Postgres
+    # (see the add_snippet_search_vector migration), never written by the application
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR().with_variant(Text(), "sqlite"),
+        server_default=FetchedValue(),
+        server_onupdate=FetchedValue(),
+        deferred=True,
+    )
     tags = Column(JSON, default=list)  # Storing list of strings
     category = Column(String, default="General", index=True)
     source = Column(String, nullable=True)  # File path or URL
@@ -26,11 +49,19 @@ class Snippet(Base):
     relative_path = Column(String, nullable=True)  # Path relative to project root, e.g., "utils/helper.ps1"
     
     content_hash = Column(String, index=True, nullable=True)  # SHA256 of content for duplicate detection
+    # MinHash signature of the normalized tokens for near-duplicate detection
+    minhash: Mapped[list[int] | None] = mapped_column(JSON, nullable=True)
     
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
     project: Mapped[Optional["Project"]] = relationship("Project", back_populates="snippets")
+    # Deleted by the ORM, not only ON DELETE CASCADE: SQLite ignores foreign keys unless enabled per connection
+    lsh_bands: Mapped[list["SnippetLshBand"]] = relationship("SnippetLshBand", cascade="all, delete-orphan")
+    # Separately embedded parts of long snippets, empty if the snippet embedding covers it all
+    chunks: Mapped[list["SnippetChunk"]] = relationship(
+        "SnippetChunk", cascade="all, delete-orphan", order_by="SnippetChunk.position"
+    )
 
     @property
     def has_embedding(self) -> bool:
@@ -0,0 +1,21 @@
+from sqlalchemy import ForeignKey, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+from app.models.snippet import embedding_column_type
+
+
+class SnippetChunk(Base):
+    __tablename__ = "snippet_chunk"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    snippet_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("snippet.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    position: Mapped[int] = mapped_column(Integer, nullable=False)  # Order within the snippet
+    # Function the chunk belongs to, None for script code
+    name: Mapped[str | None] = mapped_column(String, nullable=True)
+    start: Mapped[int] = mapped_column(Integer, nullable=False)  # Offsets into snippet.content
+    end: Mapped[int] = mapped_column(Integer, nullable=False)
+    embedding: Mapped[list[float] | None] = mapped_column(embedding_column_type(), nullable=True)
+    embedding_model: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
@@ -0,0 +1,15 @@
+from sqlalchemy import ForeignKey, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class SnippetLshBand(Base):
+    __tablename__ = "snippet_lsh_band"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    snippet_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("snippet.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    # "<band>:<hash of the band's signature rows>", snippets sharing a bucket are near-duplicate candidates
+    bucket: Mapped[str] = mapped_column(String, nullable=False, index=True)
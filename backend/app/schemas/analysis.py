@@ -1,5 +1,30 @@
+from pydantic import BaseModel
+
 from .snippet import SnippetCreate
 
 
+class NearDuplicate(BaseModel):
+    snippet_id: int
+    name: str
+    similarity: float  # Estimated Jaccard similarity of the normalized tokens
+
+
 class SnippetAnalysisResult(SnippetCreate):
     is_duplicate: bool = False
+    near_duplicates: list[NearDuplicate] = []
+
+
+class FolderAnalysisReport(BaseModel):
+    results: list[SnippetAnalysisResult]
+    deleted: list[str] = []  # Files analyzed before that are gone now
+    parsed_files: int = 0
+    cached_files: int = 0
+
+
+class AnalysisCacheStats(BaseModel):
+    hits: int
+    disk_hits: int
+    misses: int
+    entries: int
+    max_entries: int
+    disk_evicted: int
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class EmbeddingCacheStats(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float  # hits / (hits + misses) since the backend process started
+    evicted: int
+    entries: int
+    max_entries: int
+
+
+class LocalEmbeddingStats(BaseModel):
+    backend: str  # torch or onnx
+    loaded: bool  # Model loaded in this backend process
+    sidecar: bool  # Encodes go to the embedding sidecar
+    encodes: int
+    texts: int
+    last_encode_ms: float | None = None
+    avg_encode_ms: float | None = None
+    avg_text_ms: float | None = None
+    warmup_ms: float | None = None  # Set once the startup warm-up finished
+
+
+class VectorIndexStatus(BaseModel):
+    name: str
+    model_id: str
+    dimension: int
+    rows: int  # Snippets the index covers
+    method: str | None = None  # hnsw or ivfflat, None if the model has no index
+    size_bytes: int
+    build_seconds: float | None = None  # Only after a rebuild
+
+
+class ReindexJobStatus(BaseModel):
+    id: int
+    status: str  # running, completed, failed or cancelled
+    model_id: str | None = None  # Embedding model snippets are brought up to
+    total: int
+    processed: int
+    failed: int
+    percent: float
+    snippets_per_second: float
+    eta_seconds: float | None = None  # Only while running
+    error: str | None = None  # Last embedding error
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
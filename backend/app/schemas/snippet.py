@@ -25,6 +25,7 @@ class SnippetResponse(SnippetBase):
     created_at: datetime
     updated_at: datetime
     has_embedding: bool = False
+    embedding_model: str | None = None
 
     class Config:
         from_attributes = True
@@ -1,30 +1,28 @@
 import logging
 from typing import Any
 
-import openai
 from sqlalchemy.orm import Session
 
-from app.models.setting import SystemSetting
 from app.models.snippet import Snippet
 from app.services.embedding_service import embedding_service
+from app.services.llm_clients import llm_clients
+from app.services.settings_cache import SystemSettings, settings_cache
+from app.services.vector_store import vector_store
 
 logger = logging.getLogger(__name__)
 
 class AIService:
     # Remove __init__ client setup, moving to dynamic setup per request
 
-    def _get_config(self, db: Session) -> dict[str, Any]:
-        # Fetch all settings as key-value pairs
-        settings = db.query(SystemSetting).all()
-        config = {str(s.key): s.value for s in settings}
-        return config
+    def _get_config(self, db: Session) -> SystemSettings:
+        return settings_cache.get(db)
 
-    def _init_client(self, config: dict[str, Any]) -> tuple[Any, Any]:
-        provider = config.get("LLM_PROVIDER", "openai")
-        api_key = config.get("OPENAI_API_KEY", "")
+    def _init_client(self, config: SystemSettings) -> tuple[Any, Any]:
+        provider = config.llm_provider or "openai"
+        api_key = config.openai_api_key or ""
         
         # Support for local LLMs (e.g., Ollama) which might not need an API Key
-        base_url = config.get("OPENAI_BASE_URL") or None
+        base_url = config.openai_base_url or None
         
         # If API key is empty but we have a base_url, use a dummy key
         if (not api_key or api_key == "sk-placeholder") and base_url:
@@ -37,14 +35,14 @@ class AIService:
 
         client: Any = None
         if provider == "azure":
-            endpoint = config.get("AZURE_OPENAI_ENDPOINT")
-            deployment = config.get("AZURE_OPENAI_DEPLOYMENT_NAME")
-            api_version = config.get("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+            endpoint = config.azure_openai_endpoint
+            deployment = config.azure_openai_deployment_name
+            api_version = config.azure_openai_api_version or "2024-02-15-preview"
             
             if not endpoint or not deployment:
                 raise ValueError("Azure configuration missing (Endpoint/Deployment)")
 
-            client = openai.AsyncAzureOpenAI(
+            client = llm_clients.azure(
                 api_key=api_key,
                 api_version=api_version,
                 azure_endpoint=endpoint
@@ -55,13 +53,13 @@ class AIService:
                 # Internal Docker URL for the built-in Ollama service
                 base_url = "http://ollama:11434/v1"
                 # Default to a small/fast model if none specified
-                model = config.get("OPENAI_MODEL") or "llama3"
+                model = config.openai_model or "llama3"
                 api_key = "local-builtin" # Dummy key
             else:
-                base_url = config.get("OPENAI_BASE_URL") or None # Empty string -> None
-                model = config.get("OPENAI_MODEL", "gpt-4o")
+                base_url = config.openai_base_url or None # Empty string -> None
+                model = config.openai_model or "gpt-4o"
             
-            client = openai.AsyncOpenAI(
+            client = llm_clients.openai(
                 api_key=api_key,
                 base_url=base_url
             )
@@ -154,15 +152,15 @@ class AIService:
             rag_snippets = []
             try:
                 # Generate embedding for the user prompt
-                query_embedding = await embedding_service.generate_embedding(user_prompt, db)
+                vectors, embedding_model = await embedding_service.embed_texts([user_prompt], db)
+                query_embedding = vectors[0]
                 
-                # Perform vector search using synchronous SQLAlchemy
-                from sqlalchemy import select
-                
-                # Retrieve top 3 snippets with distance < 0.4 (Cosine Distance)
-                # Lower distance = more similar
-                stmt = select(Snippet).order_by(Snippet.embedding.cosine_distance(query_embedding)).limit(3)
-                relevant_rows = db.execute(stmt).scalars().all()
+                # Retrieve top 3 snippets by cosine distance (lower distance = more similar), fused with a
+                # full-text search of the prompt on Postgres so exact cmdlet names are not outranked by prose.
+                # Only embeddings of the same model are comparable (and have the same dimension)
+                relevant_rows = vector_store.search(
+                    db, query_embedding, embedding_model.id, limit=3, query_text=user_prompt
+                )
                 
                 # Filter by threshold locally if not doing it in DB (pgvector usually sorts, but thresholding is good)
                 # Note: pgvector distance is 0..2 for cosine (1 - cosine_similarity)
@@ -173,7 +171,7 @@ class AIService:
                 # Add unique relevant snippets to context
                 existing_ids = {s.id for s in context_snippets}
                 for s in relevant_rows:
-                    if s.id not in existing_ids and s.embedding is not None:
+                    if s.id not in existing_ids:
                         # Manual threshold check (optional, but good for quality)
                         # calculating distance locally is hard without numpy, so we rely on the DB sort order.
                         # We blindly trust the top 3 are relevant enough for now.
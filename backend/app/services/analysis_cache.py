@@ -0,0 +1,165 @@
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# A cache entry is the filename the snippets were extracted for plus their model dumps
+CacheEntry = tuple[str, list[dict[str, Any]]]
+
+
+class AnalysisCache:
+    """
+    LRU cache for analyzer results keyed by content hash, with an optional on-disk tier.
+    Entries are stored as plain dicts so callers can never mutate a cached result.
+    The disk tier keeps at most max_disk_entries files (0 = unlimited), the least recently
+    used ones (by mtime, refreshed on every disk hit) are deleted beyond that.
+    Disk entries written with another version (see ANALYZER_VERSION) are misses.
+    Counters are per process.
+    """
+
+    def __init__(
+        self, max_entries: int, cache_dir: str | None = None, max_disk_entries: int = 0, version: int = 0
+    ) -> None:
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.version = version
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._written_since_eviction = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evicted = 0
+
+    def get(self, key: str) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._remember(key, entry)
+        if not self._write_disk(key, entry) or self.max_disk_entries <= 0:
+            return
+        with self._lock:
+            self._written_since_eviction += 1
+            due = self._written_since_eviction >= self._eviction_interval()
+            if due:
+                self._written_since_eviction = 0
+        if due:
+            self.evict_disk()
+
+    def evict_disk(self) -> int:
+        """Delete the least recently used disk entries beyond max_disk_entries."""
+        if not self.cache_dir or self.max_disk_entries <= 0:
+            return 0
+        files = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for f in os.scandir(shard.path):
+                # Files can vanish meanwhile, other processes share the directory and evict too
+                if f.name.endswith(".json"):
+                    with contextlib.suppress(FileNotFoundError):
+                        files.append((f.stat().st_mtime, f.path))
+        excess = len(files) - self.max_disk_entries
+        if excess <= 0:
+            return 0
+        files.sort()
+        deleted = 0
+        for _, path in files[:excess]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+                deleted += 1
+        with self._lock:
+            self.disk_evicted += deleted
+        logger.info(f"Evicted {deleted} analysis cache entries from disk")
+        return deleted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_evicted": self.disk_evicted,
+            }
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key: str) -> str:
+        assert self.cache_dir is not None
+        # Shard by hash prefix to keep directories small
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> CacheEntry | None:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != self.version:
+                # Written by another analyzer version, replaced by the next put
+                return None
+            entry = data["filename"], data["snippets"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable analysis cache entry {key}: {e}")
+            return None
+        # The mtime is the entry's last use, eviction goes by it
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return entry
+
+    def _write_disk(self, key: str, entry: CacheEntry) -> bool:
+        if not self.cache_dir:
+            return False
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file first so concurrent readers never see partial JSON
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(path), delete=False) as f:
+                json.dump({"version": self.version, "filename": entry[0], "snippets": entry[1]}, f)
+            os.replace(f.name, path)
+        except OSError as e:
+            logger.warning(f"Failed to write analysis cache entry {key}: {e}")
+            return False
+        return True
+
+    def _eviction_interval(self) -> int:
+        # Counting entries walks the whole directory, only check every 1% of the capacity
+        return max(1, self.max_disk_entries // 100)
@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import os
+from dataclasses import dataclass, field
+
+from sqlalchemy.orm import Session
+
+from app.models.analysis_manifest import AnalysisManifestEntry
+from app.schemas.snippet import SnippetCreate
+from app.services.script_analyzer import ANALYZER_VERSION, script_analyzer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FolderAnalysis:
+    snippets: list[SnippetCreate] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)  # Previously analyzed files that no longer exist
+    parsed_files: int = 0
+    cached_files: int = 0
+
+
+class AnalysisManifestService:
+    """
+    Incremental folder analysis.
+    Every analyzed file is recorded with its size, mtime and content hash together with the
+    snippets extracted from it. On the next scan only new or changed files are parsed, the
+    others are replayed from the manifest. Entries of another ANALYZER_VERSION count as changed.
+    """
+
+    def __init__(self) -> None:
+        self.analyzer = script_analyzer
+
+    def analyze_folder(self, db: Session, folder_path: str) -> FolderAnalysis:
+        result = FolderAnalysis()
+        if not os.path.isdir(folder_path):
+            return result
+
+        root = os.path.abspath(folder_path)
+        prefix = root.rstrip(os.sep) + os.sep
+        manifest = {
+            str(e.path): e
+            for e in db.query(AnalysisManifestEntry).filter(
+                AnalysisManifestEntry.path.startswith(prefix, autoescape=True)
+            )
+        }
+
+        # Walk order is kept: None marks a file whose snippets still have to be parsed
+        ordered: list[tuple[str, list[SnippetCreate] | None]] = []
+        to_parse: list[str] = []
+        file_stats: dict[str, os.stat_result] = {}
+        seen: set[str] = set()
+
+        for path in self.analyzer.iter_script_files(root):
+            seen.add(path)
+            try:
+                stat = os.stat(path)
+                entry = manifest.get(path)
+                if entry is not None and entry.analyzer_version != ANALYZER_VERSION:
+                    entry = None
+                if entry is not None and entry.size == stat.st_size and entry.mtime == stat.st_mtime:
+                    ordered.append((path, self._replay(entry)))
+                    continue
+
+                # Only a file of the same size can be merely touched
+                touched = (
+                    entry is not None
+                    and entry.size == stat.st_size
+                    and entry.content_hash == self._hash_file(path)
+                )
+            except OSError as e:
+                logger.error(f"Error reading {path}: {e}")
+                continue
+
+            if entry is not None and touched:
+                entry.size = stat.st_size
+                entry.mtime = stat.st_mtime
+                ordered.append((path, self._replay(entry)))
+                continue
+
+            to_parse.append(path)
+            file_stats[path] = stat
+            ordered.append((path, None))
+
+        # Hashed from the bytes that were parsed, so hash and snippets always describe the same version
+        parsed: dict[str, list[SnippetCreate]] = {}
+        for path, analysis in zip(to_parse, self.analyzer.analyze_files_hashed(to_parse), strict=True):
+            if analysis is None:
+                # Not recorded, so the next scan tries again
+                parsed[path] = []
+                continue
+            file_hash, snippets = analysis
+            parsed[path] = snippets
+            db.merge(AnalysisManifestEntry(
+                path=path,
+                size=file_stats[path].st_size,
+                mtime=file_stats[path].st_mtime,
+                content_hash=file_hash,
+                analyzer_version=ANALYZER_VERSION,
+                snippets=[s.model_dump() for s in snippets],
+            ))
+
+        for path, cached in ordered:
+            result.snippets.extend(cached if cached is not None else parsed[path])
+        result.parsed_files = len(to_parse)
+        result.cached_files = len(ordered) - len(to_parse)
+
+        result.deleted = sorted(set(manifest) - seen)
+        for path in result.deleted:
+            db.delete(manifest[path])
+
+        db.commit()
+        return result
+
+    def _replay(self, entry: AnalysisManifestEntry) -> list[SnippetCreate]:
+        return [SnippetCreate(**s) for s in entry.snippets or []]
+
+    def _hash_file(self, path: str) -> str:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+analysis_manifest_service = AnalysisManifestService()
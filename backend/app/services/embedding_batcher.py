@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+EncodeFn = Callable[[list[str]], list[list[float]]]
+# Texts of one caller and the future its vectors are delivered to
+_Request = tuple[list[str], "asyncio.Future[list[list[float]]]"]
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding calls into micro-batches for a synchronous encoder.
+    Callers await `embed`; a worker task collects queued requests until max_batch_size
+    texts are pending or max_wait_ms passed since the first one, then runs a single
+    encode call in a dedicated thread and resolves every caller's future with its slice.
+    The encoder only ever runs in that one thread, so it may lazily load a model.
+    """
+
+    def __init__(self, encode: EncodeFn, max_batch_size: int, max_wait_ms: float) -> None:
+        self._encode = encode
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._executor: ThreadPoolExecutor | None = None
+        self._queue: asyncio.Queue[_Request] | None = None
+        self._worker: asyncio.Task[None] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.batches = 0
+        self.batched_texts = 0
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[list[list[float]]] = loop.create_future()
+        self._ensure_worker(loop).put_nowait((list(texts), future))
+        return await future
+
+    def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+        self._worker = self._queue = self._loop = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _ensure_worker(self, loop: asyncio.AbstractEventLoop) -> "asyncio.Queue[_Request]":
+        # The worker belongs to one event loop (tests and scripts may run several in turn)
+        if self._loop is not loop or self._worker is None or self._worker.done() or self._queue is None:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def _run(self, queue: "asyncio.Queue[_Request]") -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(queue.get(), timeout)
+                except TimeoutError:
+                    break
+                batch.append(request)
+                size += len(request[0])
+            await self._process(loop, batch)
+
+    async def _process(self, loop: asyncio.AbstractEventLoop, batch: list[_Request]) -> None:
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        try:
+            vectors = await loop.run_in_executor(self._executor, self._encode, texts)
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(texts)} texts failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.batched_texts += len(texts)
+        offset = 0
+        for request_texts, future in batch:
+            if not future.done():  # The caller may have been cancelled meanwhile
+                future.set_result(vectors[offset:offset + len(request_texts)])
+            offset += len(request_texts)
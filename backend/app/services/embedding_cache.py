@@ -0,0 +1,196 @@
+import datetime
+import hashlib
+import logging
+import threading
+from array import array
+from typing import Any
+
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.upsert import dialect_insert
+from app.models.embedding_cache import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Keys per IN (...) lookup, keeps statements well below bind parameter limits
+LOOKUP_BATCH_SIZE = 500
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embeddings in the `embedding_cache` table, keyed by
+    (provider, model, dimension, sha256(text)).
+    The cache works in its own session so it never commits the caller's transaction,
+    and database errors only turn into cache misses. Rows that were not used for the
+    longest time are evicted once the table grows beyond EMBEDDING_CACHE_MAX_ENTRIES.
+    Hit/miss counters are per process.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._inserted_since_eviction = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.EMBEDDING_CACHE_MAX_ENTRIES > 0
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(
+        self, db: Session, provider: str, model: str, dimension: int, hashes: list[str]
+    ) -> dict[str, list[float]]:
+        """Return the cached embeddings for the given text hashes and mark them as used."""
+        if not self.enabled or not hashes:
+            return {}
+        wanted = list(dict.fromkeys(hashes))
+        found: dict[str, list[float]] = {}
+        try:
+            with Session(bind=db.get_bind()) as session:
+                for i in range(0, len(wanted), LOOKUP_BATCH_SIZE):
+                    batch = wanted[i:i + LOOKUP_BATCH_SIZE]
+                    rows = session.execute(
+                        select(EmbeddingCacheEntry.text_hash, EmbeddingCacheEntry.embedding).where(
+                            EmbeddingCacheEntry.provider == provider,
+                            EmbeddingCacheEntry.model == model,
+                            EmbeddingCacheEntry.dimension == dimension,
+                            EmbeddingCacheEntry.text_hash.in_(batch),
+                        )
+                    )
+                    for text_hash, blob in rows:
+                        found[text_hash] = self._unpack(blob)
+                if found:
+                    self._touch(session, provider, model, dimension, list(found))
+                    session.commit()
+        except SQLAlchemyError as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            found = {}
+
+        with self._lock:
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+        return found
+
+    def put_many(
+        self, db: Session, provider: str, model: str, dimension: int, embeddings: dict[str, list[float]]
+    ) -> None:
+        """Store embeddings by text hash. Existing rows are left untouched."""
+        if not self.enabled or not embeddings:
+            return
+        now = datetime.datetime.utcnow()
+        rows = [
+            {
+                "provider": provider,
+                "model": model,
+                "dimension": dimension,
+                "text_hash": text_hash,
+                "embedding": self._pack(vector),
+                "created_at": now,
+                "last_used_at": now,
+            }
+            for text_hash, vector in embeddings.items()
+        ]
+        try:
+            with Session(bind=db.get_bind()) as session:
+                insert = dialect_insert(session, EmbeddingCacheEntry)
+                for i in range(0, len(rows), LOOKUP_BATCH_SIZE):
+                    session.execute(insert.values(rows[i:i + LOOKUP_BATCH_SIZE]).on_conflict_do_nothing())
+                session.commit()
+                with self._lock:
+                    self._inserted_since_eviction += len(rows)
+                    due = self._inserted_since_eviction >= self._eviction_interval()
+                    if due:
+                        self._inserted_since_eviction = 0
+                if due:
+                    self.evict(session)
+        except SQLAlchemyError as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def evict(self, session: Session) -> int:
+        """Delete the least recently used rows beyond EMBEDDING_CACHE_MAX_ENTRIES."""
+        excess = self.count(session) - settings.EMBEDDING_CACHE_MAX_ENTRIES
+        if excess <= 0:
+            return 0
+        # Exactly the excess oldest rows by primary key, rows written together share their last_used_at
+        key = tuple_(
+            EmbeddingCacheEntry.provider,
+            EmbeddingCacheEntry.model,
+            EmbeddingCacheEntry.dimension,
+            EmbeddingCacheEntry.text_hash,
+        )
+        oldest = (
+            select(
+                EmbeddingCacheEntry.provider,
+                EmbeddingCacheEntry.model,
+                EmbeddingCacheEntry.dimension,
+                EmbeddingCacheEntry.text_hash,
+            )
+            .order_by(EmbeddingCacheEntry.last_used_at, EmbeddingCacheEntry.text_hash)
+            .limit(excess)
+        )
+        result = session.execute(delete(EmbeddingCacheEntry).where(key.in_(oldest)))
+        session.commit()
+        deleted = int(getattr(result, "rowcount", 0) or 0)
+        with self._lock:
+            self.evicted += deleted
+        logger.info(f"Evicted {deleted} embedding cache entries")
+        return deleted
+
+    def count(self, session: Session) -> int:
+        return int(session.scalar(select(func.count()).select_from(EmbeddingCacheEntry)) or 0)
+
+    def stats(self, db: Session) -> dict[str, Any]:
+        with self._lock:
+            hits, misses, evicted = self.hits, self.misses, self.evicted
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "evicted": evicted,
+            "entries": self.count(db),
+            "max_entries": settings.EMBEDDING_CACHE_MAX_ENTRIES,
+        }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = self.misses = self.evicted = 0
+
+    def _touch(self, session: Session, provider: str, model: str, dimension: int, hashes: list[str]) -> None:
+        now = datetime.datetime.utcnow()
+        for i in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+            session.execute(
+                update(EmbeddingCacheEntry)
+                .where(
+                    EmbeddingCacheEntry.provider == provider,
+                    EmbeddingCacheEntry.model == model,
+                    EmbeddingCacheEntry.dimension == dimension,
+                    EmbeddingCacheEntry.text_hash.in_(hashes[i:i + LOOKUP_BATCH_SIZE]),
+                )
+                .values(last_used_at=now)
+            )
+
+    @staticmethod
+    def _eviction_interval() -> int:
+        # Counting rows is a table scan on Postgres, only check every 1% of the capacity
+        return max(1, settings.EMBEDDING_CACHE_MAX_ENTRIES // 100)
+
+    @staticmethod
+    def _pack(vector: list[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _unpack(blob: bytes) -> list[float]:
+        values = array("f")
+        values.frombytes(blob)
+        return values.tolist()
+
+
+embedding_cache = EmbeddingCache()
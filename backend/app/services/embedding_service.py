@@ -1,102 +1,350 @@
+import asyncio
 import logging
+import os
+import time
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
 from typing import Any, cast
 
 from openai import AsyncAzureOpenAI, AsyncOpenAI
 from sqlalchemy.orm import Session
 
-from app.models.setting import SystemSetting
-
-# Optional import for local embeddings to avoid heavy load if not used? 
-# For now global is fine, it caches model lazy.
-try:
-    from sentence_transformers import SentenceTransformer
-except ImportError:
-    SentenceTransformer = None
+from app.core.config import settings
+from app.models.snippet import Snippet
+from app.models.snippet_chunk import SnippetChunk
+from app.schemas.snippet import SnippetBase
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import embedding_cache
+from app.services.embedding_sidecar import EmbeddingSidecarClient
+from app.services.llm_clients import llm_clients
+from app.services.onnx_embedder import OnnxEmbedder
+from app.services.settings_cache import SystemSettings, settings_cache
+from app.services.snippet_chunker import Chunk, snippet_chunker
+from app.services.vector_store import quantize_binary
 
 logger = logging.getLogger(__name__)
 
+LOCAL_MODEL_NAME = "all-MiniLM-L6-v2"
+# Output dimension of models we know, embeddings are stored at this native size
+KNOWN_DIMENSIONS = {
+    LOCAL_MODEL_NAME: 384,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+@dataclass(frozen=True)
+class EmbeddingModel:
+    provider: str  # Includes the endpoint for self-hosted and Azure providers
+    name: str
+    dimension: int  # 0 if the output dimension is only known once the provider answered
+
+    @property
+    def id(self) -> str:
+        """Stored in snippet.embedding_model, only embeddings of the same model are comparable."""
+        return f"{self.provider}/{self.name}"
+
+
+@dataclass(frozen=True)
+class SnippetEmbeddings:
+    model: EmbeddingModel
+    vectors: list[list[float]]  # One per snippet
+    chunks: list[list[Chunk]]  # Per snippet, see SnippetChunker
+    chunk_vectors: list[list[float]]  # One per chunk, in snippet order
+
+
 class EmbeddingService:
     def __init__(self) -> None:
         self.model = "text-embedding-3-small"
         self._local_model: Any = None
+        self._sidecar: EmbeddingSidecarClient | None = None
+        self._sidecar_available: bool | None = None
+        # Local encode latency, as seen by this process (includes the sidecar round trip)
+        self._encodes = 0
+        self._encoded_texts = 0
+        self._encode_seconds = 0.0
+        self._last_encode_ms: float | None = None
+        self._warmup_ms: float | None = None
+        # Concurrent local encodes are coalesced and run off the event loop
+        self._local_batcher = EmbeddingBatcher(
+            self._encode_local,
+            max_batch_size=settings.EMBEDDING_MICROBATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_MICROBATCH_MAX_WAIT_MS,
+        )
 
     def _get_local_model(self) -> Any:
         if self._local_model is None:
-            if SentenceTransformer is None:
-                raise ImportError("sentence-transformers not installed.")
-            logger.info("Loading local embedding model 'all-MiniLM-L6-v2'...")
-            self._local_model = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info("Local model loaded.")
+            backend = settings.EMBEDDING_LOCAL_BACKEND
+            logger.info(f"Loading local embedding model '{LOCAL_MODEL_NAME}' ({backend})...")
+            start = time.perf_counter()
+            if backend == "onnx":
+                self._local_model = OnnxEmbedder(
+                    settings.EMBEDDING_ONNX_MODEL, settings.EMBEDDING_ONNX_FILE, threads=settings.EMBEDDING_ONNX_THREADS
+                )
+            else:
+                # Imported here, torch takes seconds to import and only the local provider needs it
+                try:
+                    from sentence_transformers import SentenceTransformer
+                except ImportError as e:
+                    raise ImportError("sentence-transformers not installed.") from e
+                self._local_model = SentenceTransformer(LOCAL_MODEL_NAME)
+            logger.info(f"Local model loaded in {time.perf_counter() - start:.1f}s.")
         return self._local_model
 
-    async def generate_embedding(self, text: str, db: Session) -> list[float]:
+    def _encode_local(self, texts: list[str]) -> list[list[float]]:
+        # Runs in the batcher's thread, loading the model there keeps the event loop free too
+        start = time.perf_counter()
+        vectors = self._encode_with_sidecar(texts)
+        if vectors is None:
+            vectors = self._get_local_model().encode(texts, batch_size=settings.EMBEDDING_LOCAL_BATCH_SIZE).tolist()
+        elapsed = time.perf_counter() - start
+        self._encodes += 1
+        self._encoded_texts += len(texts)
+        self._encode_seconds += elapsed
+        self._last_encode_ms = elapsed * 1000
+        logger.debug(f"Encoded {len(texts)} texts locally in {elapsed * 1000:.1f} ms")
+        return [cast(list[float], v) for v in vectors]
+
+    async def warm_up(self) -> None:
+        """Load the local model (or reach the sidecar) and run one encode."""
+        start = time.perf_counter()
+        socket_path = settings.EMBEDDING_SIDECAR_SOCKET
+        if socket_path and not await self._wait_for_sidecar(socket_path, settings.EMBEDDING_SIDECAR_TIMEOUT):
+            # Loading a model per worker is what the sidecar is there to avoid
+            logger.warning(f"Embedding sidecar at {socket_path} did not come up, skipping the warm-up")
+            return
         try:
-            # Fetch settings from DB
-            settings_rows = db.query(SystemSetting).all()
-            config = {str(s.key): s.value for s in settings_rows}
-            
-            provider = config.get("EMBEDDING_PROVIDER") or config.get("LLM_PROVIDER", "openai")
-            
-            # Local Built-in Provider
-            if provider == "local_builtin":
-                 local_model = self._get_local_model()
-                 # Synchronous call, but fast on CPU for single snippet
-                 # In async context this blocks the event loop briefly. 
-                 # Ideally run in executor, but for now this is okay.
-                 embedding = local_model.encode(text).tolist()
-                 
-                 # Pad to 1536 dimensions if necessary (DB expects 1536)
-                 # all-MiniLM-L6-v2 output is 384
-                 target_dim = 1536
-                 current_dim = len(embedding)
-                 if current_dim < target_dim:
-                     # Pad with zeros
-                     embedding.extend([0.0] * (target_dim - current_dim))
-                 
-                 return cast(list[float], embedding)
-
-            api_key = config.get("OPENAI_API_KEY", "")
-            
-            client: AsyncOpenAI | AsyncAzureOpenAI | None = None
-            model_to_use = self.model
-            
-            if not api_key:
-                raise ValueError("AI API Key not configured")
+            await self._local_batcher.embed(["Get-ChildItem -Path ."])
+        except Exception as e:
+            logger.warning(f"Local embedding warm-up failed: {e}")
+            return
+        self._warmup_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Local embedding model warmed up in {self._warmup_ms:.0f} ms")
+
+    @staticmethod
+    async def _wait_for_sidecar(socket_path: str, timeout: float) -> bool:
+        # The sidecar only creates its socket once its model is loaded
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(socket_path):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.2)
+        return True
+
+    def local_stats(self) -> dict[str, Any]:
+        return {
+            "backend": settings.EMBEDDING_LOCAL_BACKEND,
+            "loaded": self._local_model is not None,
+            "sidecar": bool(settings.EMBEDDING_SIDECAR_SOCKET) and self._sidecar_available is not False,
+            "encodes": self._encodes,
+            "texts": self._encoded_texts,
+            "last_encode_ms": self._last_encode_ms,
+            "avg_encode_ms": self._encode_seconds * 1000 / self._encodes if self._encodes else None,
+            "avg_text_ms": self._encode_seconds * 1000 / self._encoded_texts if self._encoded_texts else None,
+            "warmup_ms": self._warmup_ms,
+        }
+
+    def _encode_with_sidecar(self, texts: list[str]) -> list[list[float]] | None:
+        """Encode through the shared model process, or None if it is not configured or not reachable."""
+        socket_path = settings.EMBEDDING_SIDECAR_SOCKET
+        if not socket_path:
+            return None
+        if self._sidecar is None or self._sidecar.socket_path != socket_path:
+            self._sidecar = EmbeddingSidecarClient(socket_path, settings.EMBEDDING_SIDECAR_TIMEOUT)
+        try:
+            vectors = self._sidecar.encode(texts)
+        except TimeoutError as e:
+            # Reachable but busy, loading a second copy of the model in this worker would not help
+            raise RuntimeError(
+                f"Embedding sidecar at {socket_path} did not answer within {self._sidecar.timeout:g}s"
+            ) from e
+        except OSError as e:
+            if self._sidecar_available is not False:
+                logger.warning(f"Embedding sidecar at {socket_path} not reachable ({e}), using the in-process model")
+            self._sidecar_available = False
+            return None
+        if self._sidecar_available is False:
+            logger.info(f"Embedding sidecar at {socket_path} is back")
+        self._sidecar_available = True
+        return vectors
+
+    def shutdown(self) -> None:
+        self._local_batcher.close()
+
+    def text_for_snippet(self, snippet: Snippet | SnippetBase) -> str:
+        # Combine relevant fields for semantic search
+        return f"{snippet.name}\n{snippet.description or ''}\n{snippet.content}"
+
+    async def generate_embedding(self, text: str, db: Session) -> list[float]:
+        return (await self.generate_embeddings([text], db))[0]
+
+    async def generate_embeddings(self, texts: list[str], db: Session) -> list[list[float]]:
+        return (await self.embed_texts(texts, db))[0]
 
-            if provider == "azure":
-                endpoint = config.get("AZURE_OPENAI_ENDPOINT")
-                deployment = config.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME") or config.get(
-                    "AZURE_OPENAI_DEPLOYMENT_NAME"
+    async def index_snippets(self, snippets: Sequence[Snippet], db: Session) -> None:
+        """
+        Embed the snippets and record which model produced each vector (not committed).
+        Long snippets also get one embedding per chunk (see SnippetChunker), all texts
+        of the call are embedded together.
+        """
+        self.apply_embeddings(snippets, await self.embed_snippets(snippets, db))
+
+    async def embed_snippets(self, snippets: Sequence[Snippet], db: Session) -> SnippetEmbeddings:
+        """The embeddings index_snippets records, without touching the snippets or the session."""
+        chunks = [snippet_chunker.chunk(str(s.content)) for s in snippets]
+        texts = [self.text_for_snippet(s) for s in snippets]
+        texts += [
+            snippet_chunker.embedding_text(str(s.name), chunk, str(s.content))
+            for s, snippet_chunks in zip(snippets, chunks, strict=True)
+            for chunk in snippet_chunks
+        ]
+        vectors, model = await self.embed_texts(texts, db)
+        return SnippetEmbeddings(model, vectors[:len(snippets)], chunks, vectors[len(snippets):])
+
+    def apply_embeddings(self, snippets: Sequence[Snippet], embeddings: SnippetEmbeddings) -> None:
+        model = embeddings.model
+        chunk_vectors = iter(embeddings.chunk_vectors)
+        for snippet, vector, snippet_chunks in zip(snippets, embeddings.vectors, embeddings.chunks, strict=True):
+            snippet.embedding = vector
+            snippet.embedding_model = model.id
+            snippet.embedding_dim = len(vector)
+            snippet.embedding_bits = quantize_binary(vector)
+            # Replaced as a whole, delete-orphan removes the previous chunks
+            snippet.chunks = [
+                SnippetChunk(
+                    position=position,
+                    name=chunk.name,
+                    start=chunk.start,
+                    end=chunk.end,
+                    embedding=next(chunk_vectors),
+                    embedding_model=model.id,
                 )
-                api_version = config.get("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
-                
-                if not endpoint or not deployment:
-                    raise ValueError("Azure configuration incomplete (Embedding Deployment missing)")
-                    
-                client = AsyncAzureOpenAI(
-                    api_key=api_key,
-                    api_version=api_version,
-                    azure_endpoint=endpoint
+                for position, chunk in enumerate(snippet_chunks)
+            ]
+
+    def active_model(self, db: Session) -> EmbeddingModel:
+        config = settings_cache.get(db)
+        return self._model_for(self._provider(config), config)
+
+    async def embed_texts(self, texts: list[str], db: Session) -> tuple[list[list[float]], EmbeddingModel]:
+        """
+        Embed many texts, in input order, at the model's native dimension.
+        Embeddings are looked up in the embedding cache first, only unique uncached texts are embedded.
+        Remote providers get one request per batch (EMBEDDING_BATCH_SIZE inputs / EMBEDDING_BATCH_MAX_CHARS),
+        local models encode in batches of EMBEDDING_LOCAL_BATCH_SIZE.
+        """
+        config = settings_cache.get(db)
+        provider = self._provider(config)
+        model = self._model_for(provider, config)
+        if not texts:
+            return [], model
+        try:
+            hashes = [embedding_cache.text_hash(text) for text in texts]
+            # The cache works in its own session, its queries run on a worker thread
+            vectors = await asyncio.to_thread(
+                embedding_cache.get_many, db, model.provider, model.name, model.dimension, hashes
+            )
+            missing = {h: text for h, text in zip(hashes, texts, strict=True) if h not in vectors}
+            if missing:
+                fresh = await self._embed(list(missing.values()), provider, config)
+                computed = dict(zip(missing, fresh, strict=True))
+                await asyncio.to_thread(
+                    embedding_cache.put_many, db, model.provider, model.name, model.dimension, computed
                 )
-                model_to_use = deployment # Azure uses deployment name as model
-            else:
-                 base_url = config.get("OPENAI_BASE_URL") or None
-                 client = AsyncOpenAI(
-                    api_key=api_key,
-                    base_url=base_url
-                 )
+                vectors.update(computed)
+            # Copies, so duplicate texts never share one list
+            return [list(vectors[h]) for h in hashes], model
+        except Exception as e:
+            logger.error(f"Failed to generate embedding: {e}")
+            raise e
 
-            # Replace newlines to improve performance as recommended by OpenAI
-            text = text.replace("\n", " ")
+    @staticmethod
+    def _provider(config: SystemSettings) -> str:
+        return config.embedding_provider or config.llm_provider or "openai"
+
+    def _model_for(self, provider: str, config: SystemSettings) -> EmbeddingModel:
+        """The model embeddings are made with; the endpoint is part of the provider."""
+        if provider == "local_builtin":
+            return EmbeddingModel(provider, self.local_model_name(), KNOWN_DIMENSIONS[LOCAL_MODEL_NAME])
+        if provider == "azure":
+            deployment = config.azure_openai_embedding_deployment_name or config.azure_openai_deployment_name
+            # Deployment names say nothing about the model behind them
+            return EmbeddingModel(f"azure:{config.azure_openai_endpoint or ''}", deployment or "", 0)
+        base_url = config.openai_base_url
+        return EmbeddingModel(
+            f"openai:{base_url}" if base_url else "openai", self.model, KNOWN_DIMENSIONS.get(self.model, 0)
+        )
+
+    @staticmethod
+    def local_model_name() -> str:
+        """
+        The local model as stored with its embeddings. The int8 ONNX export only approximates
+        the torch model, so its vectors (and cache entries) are kept apart from the torch ones.
+        """
+        if settings.EMBEDDING_LOCAL_BACKEND == "onnx":
+            return f"{LOCAL_MODEL_NAME}@onnx:{settings.EMBEDDING_ONNX_FILE}"
+        return LOCAL_MODEL_NAME
+
+    async def _embed(self, texts: list[str], provider: str, config: SystemSettings) -> list[list[float]]:
+        # Local Built-in Provider
+        if provider == "local_builtin":
+             return await self._local_batcher.embed(texts)
+
+        api_key = config.openai_api_key or ""
+        
+        client: AsyncOpenAI | AsyncAzureOpenAI | None = None
+        model_to_use = self.model
+        
+        if not api_key:
+            raise ValueError("AI API Key not configured")
+
+        if provider == "azure":
+            endpoint = config.azure_openai_endpoint
+            deployment = config.azure_openai_embedding_deployment_name or config.azure_openai_deployment_name
+            api_version = config.azure_openai_api_version or "2024-02-15-preview"
             
-            assert client is not None
+            if not endpoint or not deployment:
+                raise ValueError("Azure configuration incomplete (Embedding Deployment missing)")
+                
+            client = llm_clients.azure(
+                api_key=api_key,
+                api_version=api_version,
+                azure_endpoint=endpoint
+            )
+            model_to_use = deployment # Azure uses deployment name as model
+        else:
+             base_url = config.openai_base_url or None
+             client = llm_clients.openai(
+                api_key=api_key,
+                base_url=base_url
+             )
+
+        assert client is not None
+        embeddings: list[list[float]] = []
+        for batch in self._batches(texts):
+            # Replace newlines to improve performance as recommended by OpenAI
             response = await client.embeddings.create(
-                input=[text],
+                input=[text.replace("\n", " ") for text in batch],
                 model=model_to_use
             )
-            return response.data[0].embedding
-        except Exception as e:
-            logger.error(f"Failed to generate embedding: {e}")
-            raise e
+            # The API may return items out of order, index tells where they belong
+            embeddings.extend(item.embedding for item in sorted(response.data, key=lambda d: d.index))
+        return embeddings
+
+    def _batches(self, texts: list[str]) -> Iterator[list[str]]:
+        batch: list[str] = []
+        batch_chars = 0
+        for text in texts:
+            if batch and (
+                len(batch) >= settings.EMBEDDING_BATCH_SIZE
+                or batch_chars + len(text) > settings.EMBEDDING_BATCH_MAX_CHARS
+            ):
+                yield batch
+                batch, batch_chars = [], 0
+            batch.append(text)
+            batch_chars += len(text)
+        if batch:
+            yield batch
 
 embedding_service = EmbeddingService()
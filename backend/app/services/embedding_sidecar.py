@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+from array import array
+
+from app.services.embedding_batcher import EmbeddingBatcher, EncodeFn
+
+logger = logging.getLogger(__name__)
+
+# Wire format: every frame is a 4 byte big-endian length followed by the payload.
+# Request:  JSON {"texts": [...]}
+# Response: JSON {"rows": n, "dim": d} followed by one frame of n*d packed float32 values,
+#           or a single JSON {"error": "..."} frame.
+_LENGTH = struct.Struct(">I")
+MAX_FRAME_BYTES = 256 * 1024 * 1024
+
+
+class EmbeddingSidecarClient:
+    """
+    Blocking client for the local embedding sidecar (see app/embedding_sidecar.py).
+    Meant to be called from a worker thread, one connection per call.
+    OSError means the sidecar is not reachable; RuntimeError means it failed to encode.
+    """
+
+    def __init__(self, socket_path: str, timeout: float) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def encode(self, texts: list[str]) -> list[list[float]]:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            _send_frame(sock, json.dumps({"texts": texts}).encode("utf-8"))
+            header = json.loads(_recv_frame(sock))
+            if "error" in header:
+                raise RuntimeError(f"Embedding sidecar failed: {header['error']}")
+            rows, dim = int(header["rows"]), int(header["dim"])
+            values = array("f")
+            values.frombytes(_recv_frame(sock))
+        if len(values) != rows * dim or rows != len(texts):
+            raise RuntimeError("Embedding sidecar returned a malformed response")
+        flat = values.tolist()
+        return [flat[i * dim:(i + 1) * dim] for i in range(rows)]
+
+
+async def serve(socket_path: str, encode: EncodeFn, max_batch_size: int, max_wait_ms: float) -> None:
+    """
+    Serve embedding requests on a Unix socket until cancelled.
+    Requests from all connected backend workers are coalesced into micro-batches.
+    """
+    batcher = EmbeddingBatcher(encode, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = json.loads(await _read_frame(reader))
+                except asyncio.IncompleteReadError:
+                    break  # Client closed the connection
+                try:
+                    vectors = await batcher.embed([str(t) for t in request["texts"]])
+                except Exception as e:
+                    _write_frame(writer, json.dumps({"error": str(e)}).encode("utf-8"))
+                    await writer.drain()
+                    continue
+                dim = len(vectors[0]) if vectors else 0
+                _write_frame(writer, json.dumps({"rows": len(vectors), "dim": dim}).encode("utf-8"))
+                _write_frame(writer, array("f", (x for v in vectors for x in v)).tobytes())
+                await writer.drain()
+        except (ConnectionError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Dropping embedding sidecar connection: {e}")
+        finally:
+            writer.close()
+
+    # A socket left behind by a crashed sidecar would make bind fail
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = await asyncio.start_unix_server(handle, path=socket_path)
+    os.chmod(socket_path, 0o660)
+    logger.info(f"Embedding sidecar listening on {socket_path}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def _send_frame(sock: socket.socket, payload: bytes) -> None:
+    sock.sendall(_LENGTH.pack(len(payload)) + payload)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (length,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    if length > MAX_FRAME_BYTES:
+        raise RuntimeError(f"Embedding sidecar frame too large ({length} bytes)")
+    return _recv_exact(sock, length)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks: list[bytes] = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1024 * 1024))
+        if not chunk:
+            raise ConnectionError("Embedding sidecar closed the connection")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame too large ({length} bytes)")
+    return await reader.readexactly(length)
+
+
+def _write_frame(writer: asyncio.StreamWriter, payload: bytes) -> None:
+    writer.write(_LENGTH.pack(len(payload)) + payload)
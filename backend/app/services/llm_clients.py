@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+import httpx
+from openai import AsyncAzureOpenAI, AsyncOpenAI
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Client = AsyncOpenAI | AsyncAzureOpenAI
+
+
+class LLMClientRegistry:
+    """
+    Reuses OpenAI/Azure clients (and their httpx connection pools) across requests.
+    Clients are keyed by the effective provider config, so changed settings produce a new
+    client. The least recently used clients beyond LLM_CLIENT_CACHE_SIZE are closed.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clients: OrderedDict[tuple[str, ...], Client] = OrderedDict()
+        self._closing: set[asyncio.Task[None]] = set()
+        self.created = 0
+
+    def openai(self, api_key: str, base_url: str | None = None) -> AsyncOpenAI:
+        key = ("openai", self._fingerprint(api_key), base_url or "")
+        client = self._get(key, lambda: AsyncOpenAI(api_key=api_key, base_url=base_url, **self._options()))
+        assert isinstance(client, AsyncOpenAI)
+        return client
+
+    def azure(self, api_key: str, api_version: str, azure_endpoint: str) -> AsyncAzureOpenAI:
+        key = ("azure", self._fingerprint(api_key), azure_endpoint, api_version)
+        client = self._get(key, lambda: AsyncAzureOpenAI(
+            api_key=api_key, api_version=api_version, azure_endpoint=azure_endpoint, **self._options()
+        ))
+        assert isinstance(client, AsyncAzureOpenAI)
+        return client
+
+    async def aclose(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for task in list(self._closing):
+            task.cancel()
+        for client in clients:
+            await client.close()
+
+    def _get(self, key: tuple[str, ...], factory: Callable[[], Client]) -> Client:
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+            client = factory()
+            self.created += 1
+            self._clients[key] = client
+            evicted = []
+            while len(self._clients) > max(1, settings.LLM_CLIENT_CACHE_SIZE):
+                evicted.append(self._clients.popitem(last=False)[1])
+        for old in evicted:
+            self._close_later(old)
+        return client
+
+    def _close_later(self, client: Client) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop to close on, the pool is released when the client is collected
+        task = loop.create_task(self._close_after(client, settings.LLM_HTTP_TIMEOUT))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close_after(client: Client, delay: float) -> None:
+        # Requests that already hold the evicted client get up to one request timeout to finish
+        await asyncio.sleep(delay)
+        await client.close()
+
+    @staticmethod
+    def _fingerprint(api_key: str) -> str:
+        # Keys stay out of the registry's dict keys (and out of debug output)
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _options() -> dict[str, Any]:
+        return {
+            "max_retries": settings.LLM_MAX_RETRIES,
+            "http_client": httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(settings.LLM_HTTP_TIMEOUT, connect=settings.LLM_HTTP_CONNECT_TIMEOUT),
+            ),
+        }
+
+
+llm_clients = LLMClientRegistry()
@@ -0,0 +1,313 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.snippet import Snippet
+from app.models.snippet_chunk import SnippetChunk
+
+logger = logging.getLogger(__name__)
+
+# Row keys: (SNIPPET_ROW, snippet id) for the snippet embedding, (CHUNK_ROW, chunk id) for chunk embeddings
+SNIPPET_ROW = 0
+CHUNK_ROW = 1
+_PENDING = "memory_vector_index_changes"
+
+
+def _numpy() -> Any:
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("numpy not installed, the in-memory vector index needs it.") from e
+    return numpy
+
+
+class _ModelMatrix:
+    """Normalized float32 embeddings of one (model, dimension), rows grow and shrink in place."""
+
+    def __init__(self, dimension: int, vectors: Any = None, keys: Any = None) -> None:
+        np = _numpy()
+        self.dimension = dimension
+        self.matrix = vectors if vectors is not None else np.zeros((0, dimension), dtype=np.float32)
+        # Per row: kind, key id, owning snippet id
+        self.keys = keys if keys is not None else np.zeros((0, 3), dtype=np.int64)
+        self.size = len(self.keys)
+        self.rows = {(int(kind), int(key)): i for i, (kind, key, _) in enumerate(self.keys[:self.size])}
+        self.owned: dict[int, set[tuple[int, int]]] = {}
+        for kind, key, owner in self.keys[:self.size]:
+            self.owned.setdefault(int(owner), set()).add((int(kind), int(key)))
+
+    def upsert(self, key: tuple[int, int], owner: int, vector: Any) -> None:
+        np = _numpy()
+        row = self.rows.get(key)
+        if row is None:
+            row = self.size
+            self._reserve(row + 1)
+            self.size += 1
+            self.rows[key] = row
+        elif not self.matrix.flags.writeable:
+            self._reserve(self.size)  # Memory-mapped from disk, copy before the first write
+        self.matrix[row] = _normalize(np.asarray(vector, dtype=np.float32))
+        self.keys[row] = (key[0], key[1], owner)
+        self.owned.setdefault(owner, set()).add(key)
+
+    def remove(self, key: tuple[int, int]) -> None:
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        owner = int(self.keys[row][2])
+        self.owned.get(owner, set()).discard(key)
+        if not self.owned.get(owner, True):
+            del self.owned[owner]
+        if not self.matrix.flags.writeable:
+            self._reserve(self.size)
+        # Swap with the last row, the matrix stays contiguous
+        last = self.size - 1
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.keys[row] = self.keys[last]
+            self.rows[(int(self.keys[row][0]), int(self.keys[row][1]))] = row
+        self.size = last
+
+    def remove_owner(self, owner: int) -> None:
+        for key in list(self.owned.get(owner, ())):
+            self.remove(key)
+
+    def search(self, query: Any, limit: int) -> list[tuple[int, float]]:
+        """(snippet id, cosine distance) of the best rows, at most one per snippet, closest first."""
+        np = _numpy()
+        if not self.size or limit <= 0:
+            return []
+        scores = self.matrix[:self.size] @ _normalize(np.asarray(query, dtype=np.float32))
+        owners = self.keys[:self.size, 2]
+        # Chunks share their snippet, look at more rows until limit distinct snippets are found
+        wanted = min(self.size, limit)
+        while True:
+            top = np.argpartition(-scores, wanted - 1)[:wanted] if wanted < self.size else np.arange(self.size)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            hits: dict[int, float] = {}
+            for row in top:
+                owner = int(owners[row])
+                if owner not in hits:
+                    hits[owner] = 1.0 - float(scores[row])
+            if len(hits) >= limit or wanted == self.size:
+                return list(hits.items())[:limit]
+            wanted = min(self.size, wanted * 4)
+
+    def _reserve(self, rows: int) -> None:
+        np = _numpy()
+        capacity = len(self.matrix) if self.matrix.flags.writeable else 0
+        if rows <= capacity:
+            return
+        capacity = max(rows, 2 * capacity, 64)
+        matrix = np.zeros((capacity, self.dimension), dtype=np.float32)
+        keys = np.zeros((capacity, 3), dtype=np.int64)
+        matrix[:self.size] = self.matrix[:self.size]
+        keys[:self.size] = self.keys[:self.size]
+        self.matrix, self.keys = matrix, keys
+
+
+def _normalize(vector: Any) -> Any:
+    np = _numpy()
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+class MemoryVectorIndex:
+    """
+    Vector search without pgvector (SQLite and offline deployments): the embeddings of a model,
+    snippets and chunks, are kept in one contiguous float32 matrix of normalized rows, a query is
+    one matrix-vector product plus argpartition. Loaded from the database on first use and kept
+    up to date from committed ORM writes of this process.
+    With VECTOR_MEMORY_INDEX_DIR the matrices are saved there and memory-mapped on the next start
+    as long as the snippets did not change in between.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._matrices: dict[tuple[str, int], _ModelMatrix] = {}
+        self._listening = False
+
+    def search(
+        self, db: Session, query_embedding: Sequence[float], model_id: str, limit: int
+    ) -> list[tuple[int, float]]:
+        dimension = len(query_embedding)
+        with self._lock:
+            matrix = self._matrices.get((model_id, dimension))
+            if matrix is None:
+                matrix = self._load(db, model_id, dimension)
+            return matrix.search(query_embedding, limit)
+
+    def save(self) -> None:
+        """Write every loaded matrix to VECTOR_MEMORY_INDEX_DIR."""
+        if not settings.VECTOR_MEMORY_INDEX_DIR:
+            return
+        from app.db.session import SessionLocal
+
+        with self._lock, SessionLocal() as db:
+            for (model_id, dimension), matrix in self._matrices.items():
+                self._save(model_id, dimension, matrix, self._signature(db, model_id, dimension))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matrices.clear()
+
+    def _load(self, db: Session, model_id: str, dimension: int) -> _ModelMatrix:
+        np = _numpy()
+        # Listen before reading, a write committed in between is in both and applied twice (idempotent)
+        self._listen()
+        signature = self._signature(db, model_id, dimension)
+        matrix = self._load_saved(model_id, dimension, signature)
+        if matrix is None:
+            vectors: list[Any] = []
+            keys: list[tuple[int, int, int]] = []
+            snippets = db.execute(
+                select(Snippet.id, Snippet.embedding).where(
+                    Snippet.embedding_model == model_id,
+                    Snippet.embedding_dim == dimension,
+                    Snippet.embedding.is_not(None),
+                )
+            )
+            for snippet_id, embedding in snippets:
+                vectors.append(embedding)
+                keys.append((SNIPPET_ROW, snippet_id, snippet_id))
+            # Joined, chunks left behind by a deleted snippet must not match a later one reusing its id
+            chunks: Iterable[tuple[int, int, list[float]]] = db.execute(
+                select(SnippetChunk.id, SnippetChunk.snippet_id, SnippetChunk.embedding)
+                .join(Snippet, Snippet.id == SnippetChunk.snippet_id)
+                .where(SnippetChunk.embedding_model == model_id, SnippetChunk.embedding.is_not(None))
+            )
+            for chunk_id, snippet_id, embedding in chunks:
+                if len(embedding) == dimension:
+                    vectors.append(embedding)
+                    keys.append((CHUNK_ROW, chunk_id, snippet_id))
+            if vectors:
+                stacked = np.asarray(vectors, dtype=np.float32)
+                norms = np.linalg.norm(stacked, axis=1, keepdims=True)
+                stacked /= np.where(norms > 0, norms, 1.0)
+            else:
+                stacked = np.zeros((0, dimension), dtype=np.float32)
+            key_rows = np.asarray(keys, dtype=np.int64).reshape(-1, 3)
+            matrix = _ModelMatrix(dimension, np.ascontiguousarray(stacked), key_rows)
+            logger.info(f"Loaded {matrix.size} embeddings of {model_id} into the in-memory vector index")
+            self._save(model_id, dimension, matrix, signature)
+        self._matrices[(model_id, dimension)] = matrix
+        return matrix
+
+    @staticmethod
+    def _signature(db: Session, model_id: str, dimension: int) -> list[Any]:
+        # Changes whenever a snippet of the model is added, removed, updated or re-chunked
+        snippets: tuple[Any, ...] = db.execute(
+            select(func.count(Snippet.id), func.max(Snippet.id), func.max(Snippet.updated_at)).where(
+                Snippet.embedding_model == model_id, Snippet.embedding_dim == dimension
+            )
+        ).one()
+        chunks = db.execute(
+            select(func.count(SnippetChunk.id), func.max(SnippetChunk.id)).where(
+                SnippetChunk.embedding_model == model_id
+            )
+        ).one()
+        return [str(v) for v in (*snippets, *chunks)]
+
+    @staticmethod
+    def _path(model_id: str, dimension: int) -> str:
+        digest = hashlib.sha1(f"{model_id}:{dimension}".encode()).hexdigest()[:12]
+        return os.path.join(settings.VECTOR_MEMORY_INDEX_DIR or "", digest)
+
+    def _save(self, model_id: str, dimension: int, matrix: _ModelMatrix, signature: list[Any]) -> None:
+        if not settings.VECTOR_MEMORY_INDEX_DIR:
+            return
+        np = _numpy()
+        path = self._path(model_id, dimension)
+        try:
+            os.makedirs(settings.VECTOR_MEMORY_INDEX_DIR, exist_ok=True)
+            # Written under temporary names and renamed, a crash never leaves a half written index behind
+            for suffix, data in (("vectors", matrix.matrix[:matrix.size]), ("keys", matrix.keys[:matrix.size])):
+                with open(f"{path}.{suffix}.tmp", "wb") as f:
+                    np.save(f, np.ascontiguousarray(data))
+                os.replace(f"{path}.{suffix}.tmp", f"{path}.{suffix}.npy")
+            with open(f"{path}.json.tmp", "w") as f:
+                json.dump({"model_id": model_id, "dimension": dimension, "signature": signature}, f)
+            os.replace(f"{path}.json.tmp", f"{path}.json")
+        except OSError as e:
+            logger.warning(f"Could not save the in-memory vector index to {path}: {e}")
+
+    def _load_saved(self, model_id: str, dimension: int, signature: list[Any]) -> _ModelMatrix | None:
+        if not settings.VECTOR_MEMORY_INDEX_DIR:
+            return None
+        np = _numpy()
+        path = self._path(model_id, dimension)
+        try:
+            with open(f"{path}.json") as f:
+                meta = json.load(f)
+            if meta.get("signature") != signature or meta.get("model_id") != model_id:
+                return None
+            vectors = np.load(f"{path}.vectors.npy", mmap_mode="r")
+            keys = np.load(f"{path}.keys.npy")
+        except (OSError, ValueError):
+            return None
+        logger.info(f"Memory-mapped {len(keys)} embeddings of {model_id} from {path}")
+        return _ModelMatrix(dimension, vectors, keys)
+
+    def _listen(self) -> None:
+        if self._listening:
+            return
+        event.listen(Session, "after_flush", self._after_flush)
+        event.listen(Session, "after_commit", self._after_commit)
+        event.listen(Session, "after_rollback", self._after_rollback)
+        self._listening = True
+
+    def _after_flush(self, session: Session, flush_context: Any) -> None:
+        # Collected per session and applied once the transaction commits
+        changes = session.info.setdefault(_PENDING, [])
+        for obj in session.deleted:
+            if isinstance(obj, Snippet):
+                changes.append(("remove_owner", obj.id, None))
+            elif isinstance(obj, SnippetChunk):
+                changes.append(("remove", (CHUNK_ROW, obj.id), None))
+        for obj in (*session.new, *session.dirty):
+            if not isinstance(obj, Snippet | SnippetChunk):
+                continue
+            instance = inspect(obj, raiseerr=True)
+            attrs = instance.attrs
+            if not (attrs.embedding.history.has_changes() or attrs.embedding_model.history.has_changes()):
+                continue
+            state = instance.dict
+            key = (SNIPPET_ROW, obj.id) if isinstance(obj, Snippet) else (CHUNK_ROW, obj.id)
+            owner = obj.id if isinstance(obj, Snippet) else state.get("snippet_id")
+            embedding = state.get("embedding")
+            if embedding is None or owner is None:
+                changes.append(("remove", key, None))
+            else:
+                changes.append(("upsert", key, (owner, state.get("embedding_model"), embedding)))
+
+    def _after_commit(self, session: Session) -> None:
+        changes = session.info.pop(_PENDING, None)
+        if not changes:
+            return
+        with self._lock:
+            for op, key, value in changes:
+                if op == "remove_owner":
+                    for matrix in self._matrices.values():
+                        matrix.remove_owner(key)
+                    continue
+                for matrix in self._matrices.values():
+                    matrix.remove(key)
+                if op == "upsert":
+                    owner, model_id, embedding = value
+                    target = self._matrices.get((model_id, len(embedding)))
+                    if target is not None:
+                        target.upsert(key, owner, embedding)
+
+    def _after_rollback(self, session: Session) -> None:
+        session.info.pop(_PENDING, None)
+
+
+memory_vector_index = MemoryVectorIndex()
@@ -0,0 +1,135 @@
+import hashlib
+import random
+import re
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from typing import TypeVar
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.snippet import Snippet
+from app.models.snippet_lsh import SnippetLshBand
+from app.schemas.analysis import NearDuplicate
+from app.services.ps_lexer import ps_lexer
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+LOOKUP_BATCH_SIZE = 500
+
+T = TypeVar("T")
+
+# XOR masks act as the permutations. The seed is fixed so signatures stay comparable across
+# processes and restarts; changing it requires re-indexing every snippet.
+_rng = random.Random(0x5EED)
+_MASKS = [_rng.getrandbits(64) for _ in range(NUM_PERM)]
+_TOKEN = re.compile(r"\$[\w:]+|[\w-]+|[^\s\w]")
+_COMMENT_KINDS = ("line_comment", "block_comment")
+
+
+def _batched(items: list[T]) -> Iterator[list[T]]:
+    for i in range(0, len(items), LOOKUP_BATCH_SIZE):
+        yield items[i:i + LOOKUP_BATCH_SIZE]
+
+
+class NearDuplicateIndex:
+    """
+    Near-duplicate detection with MinHash signatures over normalized PowerShell tokens.
+    Every signature is split into BANDS bands that are stored as buckets in snippet_lsh_band,
+    so candidates are found with an indexed lookup instead of a pairwise compare.
+    """
+
+    def normalize_tokens(self, content: str) -> list[str]:
+        # Comments are dropped, case is ignored and every variable name becomes the same token
+        parts: list[str] = []
+        pos = 0
+        for region in ps_lexer.tokenize(content).regions:
+            if region.kind in _COMMENT_KINDS:
+                parts.append(content[pos:region.start])
+                pos = region.end
+        parts.append(content[pos:])
+        tokens = _TOKEN.findall(" ".join(parts).lower())
+        return ["$v" if t.startswith("$") and len(t) > 1 else t for t in tokens]
+
+    def signature(self, content: str) -> list[int]:
+        tokens = self.normalize_tokens(content)
+        count = max(1, len(tokens) - SHINGLE_SIZE + 1)
+        shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(count)}
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles
+        ]
+        return [min(map(mask.__xor__, hashes)) for mask in _MASKS]
+
+    def buckets(self, signature: list[int]) -> list[str]:
+        buckets = []
+        for band in range(BANDS):
+            rows = ",".join(str(v) for v in signature[band * ROWS:(band + 1) * ROWS])
+            buckets.append(f"{band}:{hashlib.blake2b(rows.encode('ascii'), digest_size=8).hexdigest()}")
+        return buckets
+
+    def similarity(self, a: list[int], b: list[int]) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return sum(1 for x, y in zip(a, b, strict=True) if x == y) / NUM_PERM
+
+    def index_snippet(self, snippet: Snippet) -> None:
+        signature = self.signature(str(snippet.content))
+        snippet.minhash = signature
+        # Replacing the collection deletes the old buckets (delete-orphan)
+        snippet.lsh_bands = [SnippetLshBand(bucket=b) for b in self.buckets(signature)]
+
+    def index_missing(self, db: Session, batch_size: int = 200) -> int:
+        """Index every snippet without a signature, committing per batch. Returns the number indexed."""
+        indexed = 0
+        while True:
+            batch = db.query(Snippet).filter(Snippet.minhash.is_(None)).limit(batch_size).all()
+            if not batch:
+                return indexed
+            for snippet in batch:
+                self.index_snippet(snippet)
+            db.commit()
+            indexed += len(batch)
+
+    def find_similar(
+        self, db: Session, signatures: list[list[int]], threshold: float | None = None, limit: int = 5
+    ) -> list[list[NearDuplicate]]:
+        """
+        Return the stored snippets whose estimated similarity reaches threshold, for every signature.
+        """
+        if threshold is None:
+            threshold = settings.NEAR_DUPLICATE_THRESHOLD
+        bucket_lists = [self.buckets(sig) for sig in signatures]
+
+        candidates: dict[str, set[int]] = defaultdict(set)
+        for batch in _batched(sorted({b for buckets in bucket_lists for b in buckets})):
+            rows = db.query(SnippetLshBand.bucket, SnippetLshBand.snippet_id).filter(SnippetLshBand.bucket.in_(batch))
+            for bucket, snippet_id in rows:
+                candidates[bucket].add(snippet_id)
+
+        stored: dict[int, tuple[str, list[int]]] = {}
+        candidate_ids = sorted(set().union(*candidates.values()))
+        for id_batch in _batched(candidate_ids):
+            snippet_rows: Iterable[tuple[int, str, list[int] | None]] = db.query(
+                Snippet.id, Snippet.name, Snippet.minhash
+            ).filter(Snippet.id.in_(id_batch))
+            for snippet_id, name, minhash in snippet_rows:
+                if minhash:
+                    stored[snippet_id] = (name, minhash)
+
+        results: list[list[NearDuplicate]] = []
+        for signature, buckets in zip(signatures, bucket_lists, strict=True):
+            matches = []
+            for snippet_id in set().union(*(candidates.get(b, set()) for b in buckets)):
+                if snippet_id not in stored:
+                    continue
+                name, minhash = stored[snippet_id]
+                similarity = self.similarity(signature, minhash)
+                if similarity >= threshold:
+                    matches.append(NearDuplicate(snippet_id=snippet_id, name=name, similarity=similarity))
+            matches.sort(key=lambda m: m.similarity, reverse=True)
+            results.append(matches[:limit])
+        return results
+
+
+near_duplicate_index = NearDuplicateIndex()
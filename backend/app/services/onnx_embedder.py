@@ -0,0 +1,85 @@
+import logging
+import os
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# all-MiniLM-L6-v2 is trained with at most 256 tokens, sentence-transformers truncates there as well
+MAX_TOKENS = 256
+
+
+class OnnxEmbedder:
+    """
+    CPU encoder for an ONNX export of a mean pooled, normalized sentence-transformers model
+    (like all-MiniLM-L6-v2). encode() mirrors SentenceTransformer.encode, so either can be the
+    local model. Needs onnxruntime and tokenizers; no torch at runtime.
+    """
+
+    def __init__(self, model: str, file_name: str, threads: int = 0, max_tokens: int = MAX_TOKENS) -> None:
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "onnxruntime not installed (pip install onnxruntime), or set EMBEDDING_LOCAL_BACKEND=torch"
+            ) from e
+
+        path = model if os.path.isdir(model) else self._download(model, file_name)
+        self._tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=max_tokens)
+        pad_id = self._tokenizer.token_to_id("[PAD]") or 0
+        self._tokenizer.enable_padding(pad_id=pad_id, pad_token="[PAD]")
+
+        options = onnxruntime.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self._session = onnxruntime.InferenceSession(
+            os.path.join(path, file_name), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._inputs = {i.name for i in self._session.get_inputs()}
+
+    def encode(self, texts: list[str], batch_size: int = 32) -> Any:
+        """Normalized embeddings as a float32 array, one row per text."""
+        import numpy as np
+
+        # Similar lengths per batch keep the padding small, results go back into input order
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        rows: list[Any] = [None] * len(texts)
+        for start in range(0, len(order), max(1, batch_size)):
+            batch = order[start:start + batch_size]
+            for i, vector in zip(batch, self._encode_batch([texts[i] for i in batch]), strict=True):
+                rows[i] = vector
+        if not rows:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(rows)
+
+    def _encode_batch(self, texts: list[str]) -> Any:
+        import numpy as np
+
+        encodings = self._tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self._session.run(None, {k: v for k, v in feeds.items() if k in self._inputs})[0]
+        return mean_pool_normalize(hidden, mask)
+
+    @staticmethod
+    def _download(repo_id: str, file_name: str) -> str:
+        from huggingface_hub import snapshot_download
+
+        logger.info(f"Downloading ONNX embedding model '{repo_id}/{file_name}'...")
+        path: str = snapshot_download(repo_id, allow_patterns=[file_name, "tokenizer.json"])
+        return path
+
+
+def mean_pool_normalize(hidden: Any, mask: Any) -> Any:
+    """Mean of the token embeddings over the attention mask, scaled to unit length (float32)."""
+    import numpy as np
+
+    weights = mask[..., None].astype(np.float32)
+    pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+    norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+    return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
@@ -0,0 +1,231 @@
+import re
+from dataclasses import dataclass, field
+
+# Single-pass PowerShell lexer.
+# It does not try to be a full PowerShell parser: it only understands enough of the
+# grammar (strings, here-strings, comments, braces and `function Name {` headers)
+# to locate function bodies and their comment-based help in one linear scan.
+
+# Anything that can change the lexer state while we are in plain code.
+_CODE_SPECIAL = re.compile(
+    r"""(?P<function>(?<![\w-])function\s+(?P<name>[\w-]+)\s*\{)"""
+    r"""|(?P<block><\#)"""
+    r"""|(?P<here>@["'])"""
+    r"""|[{}'"\#`]""",
+    re.IGNORECASE,
+)
+_HERE_STRING_OPEN = re.compile(r"""@(["'])[ \t]*\r?\n""")
+_DOUBLE_QUOTE_SPECIAL = re.compile(r'[`"]')
+_HERE_STRING_CLOSE = {
+    '"': re.compile(r'^[ \t]*"@', re.MULTILINE),
+    "'": re.compile(r"^[ \t]*'@", re.MULTILINE),
+}
+_COMMENT_PRECEDERS = frozenset(" \t\r\n;{}()|&,=")
+
+
+@dataclass(frozen=True)
+class Region:
+    """A half-open span [start, end) of the source with a given kind."""
+
+    kind: str  # "string", "here_string", "line_comment" or "block_comment"
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class FunctionSpan:
+    name: str
+    start: int  # Index of the `function` keyword
+    body_start: int  # Index of the opening brace
+    end: int  # Index one past the closing brace
+    help: Region | None = None  # Comment-based help block directly preceding the function
+
+
+@dataclass
+class LexResult:
+    functions: list[FunctionSpan] = field(default_factory=list)
+    regions: list[Region] = field(default_factory=list)
+    script_help: Region | None = None  # Leading block comment of the file, unless it is a function's help
+
+
+class PowerShellLexer:
+    def tokenize(self, text: str) -> LexResult:
+        """
+        Scan `text` once and return function spans, help-comment spans and
+        string/comment regions. Functions are returned ordered by start offset.
+        Unterminated functions are dropped.
+        """
+        result = LexResult()
+        # Brace stack: None for an anonymous block, (name, start, body_start, help) for a function
+        stack: list[tuple[str, int, int, Region | None] | None] = []
+        # Last block comment that has only been followed by whitespace so far
+        pending_help: Region | None = None
+        seen_code = False
+        pos = 0
+        length = len(text)
+
+        while pos < length:
+            match = _CODE_SPECIAL.search(text, pos)
+            if match is None:
+                break
+
+            start = match.start()
+            if pending_help is not None and text[pending_help.end:start].strip():
+                pending_help = None
+            if not seen_code and text[pos:start].strip():
+                seen_code = True
+
+            if match.group("function"):
+                if pending_help is not None and pending_help is result.script_help:
+                    # Directly followed by a function, the leading comment documents that function
+                    result.script_help = None
+                stack.append((match.group("name"), start, match.end() - 1, pending_help))
+                pending_help = None
+                seen_code = True
+                pos = match.end()
+                continue
+
+            if match.group("block"):
+                end = self._block_comment_end(text, start)
+                region = Region("block_comment", start, end)
+                result.regions.append(region)
+                if not seen_code and result.script_help is None:
+                    result.script_help = region
+                pending_help = region
+                pos = end
+                continue
+
+            if match.group("here"):
+                end = self._here_string_end(text, start)
+                if end == -1:
+                    # Not a here-string header, the quote is handled as a regular string
+                    pos = start + 1
+                    continue
+                result.regions.append(Region("here_string", start, end))
+                seen_code = True
+                pos = end
+                continue
+
+            char = text[start]
+            seen_code = seen_code or char != "#"
+            if char == "{":
+                stack.append(None)
+                pos = start + 1
+            elif char == "}":
+                if stack:
+                    frame = stack.pop()
+                    if frame is not None:
+                        name, func_start, body_start, help_region = frame
+                        result.functions.append(FunctionSpan(name, func_start, body_start, start + 1, help_region))
+                pos = start + 1
+            elif char == "'":
+                end = self._single_quote_end(text, start)
+                result.regions.append(Region("string", start, end))
+                pos = end
+            elif char == '"':
+                end = self._double_quote_end(text, start)
+                result.regions.append(Region("string", start, end))
+                pos = end
+            elif char == "#":
+                if start == 0 or text[start - 1] in _COMMENT_PRECEDERS:
+                    end = self._line_comment_end(text, start)
+                    result.regions.append(Region("line_comment", start, end))
+                    pos = end
+                else:
+                    pos = start + 1
+            else:  # Backtick escapes the next character in code
+                pos = start + 2
+
+        # Nested functions close before their parents
+        result.functions.sort(key=lambda f: f.start)
+        return result
+
+    def find_matching_brace(self, text: str, start_index: int) -> int:
+        """
+        Return the index of the '}' closing the '{' at start_index, or -1.
+        Strings, here-strings and comments are skipped.
+        """
+        if start_index >= len(text) or text[start_index] != "{":
+            return -1
+
+        depth = 0
+        pos = start_index
+        length = len(text)
+        while pos < length:
+            match = _CODE_SPECIAL.search(text, pos)
+            if match is None:
+                return -1
+            start = match.start()
+
+            if match.group("function") or text[start] == "{":
+                # A function header always ends with its opening brace
+                depth += 1
+                pos = match.end()
+            elif match.group("block"):
+                pos = self._block_comment_end(text, start)
+            elif match.group("here"):
+                end = self._here_string_end(text, start)
+                pos = start + 1 if end == -1 else end
+            elif text[start] == "}":
+                depth -= 1
+                if depth == 0:
+                    return start
+                pos = start + 1
+            elif text[start] == "'":
+                pos = self._single_quote_end(text, start)
+            elif text[start] == '"':
+                pos = self._double_quote_end(text, start)
+            elif text[start] == "#":
+                is_comment = text[start - 1] in _COMMENT_PRECEDERS
+                pos = self._line_comment_end(text, start) if is_comment else start + 1
+            else:
+                pos = start + 2
+        return -1
+
+    @staticmethod
+    def _block_comment_end(text: str, start: int) -> int:
+        end = text.find("#>", start + 2)
+        return len(text) if end == -1 else end + 2
+
+    @staticmethod
+    def _line_comment_end(text: str, start: int) -> int:
+        end = text.find("\n", start)
+        return len(text) if end == -1 else end
+
+    @staticmethod
+    def _single_quote_end(text: str, start: int) -> int:
+        # Backtick is literal in single quotes; '' is an escaped quote
+        pos = start + 1
+        while True:
+            end = text.find("'", pos)
+            if end == -1:
+                return len(text)
+            if text.startswith("''", end):
+                pos = end + 2
+                continue
+            return end + 1
+
+    @staticmethod
+    def _double_quote_end(text: str, start: int) -> int:
+        pos = start + 1
+        while True:
+            match = _DOUBLE_QUOTE_SPECIAL.search(text, pos)
+            if match is None:
+                return len(text)
+            end = match.start()
+            if text[end] == "`" or text.startswith('""', end):
+                pos = end + 2
+                continue
+            return end + 1
+
+    @staticmethod
+    def _here_string_end(text: str, start: int) -> int:
+        """Return the end of the here-string at start, or -1 if start is not a here-string header."""
+        header = _HERE_STRING_OPEN.match(text, start)
+        if header is None:
+            return -1
+        match = _HERE_STRING_CLOSE[header.group(1)].search(text, header.end())
+        return len(text) if match is None else match.end()
+
+
+ps_lexer = PowerShellLexer()
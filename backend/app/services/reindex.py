@@ -0,0 +1,260 @@
+import asyncio
+import datetime
+import logging
+import time
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import ColumnElement, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.reindex_job import ReindexJob
+from app.models.snippet import Snippet
+from app.services.embedding_service import SnippetEmbeddings, embedding_service
+from app.services.vector_index import vector_index
+
+logger = logging.getLogger(__name__)
+
+SessionFactory = Callable[[], Session]
+
+
+class RateLimiter:
+    """Spaces out acquisitions so that at most `per_minute` items pass per minute (0 = unlimited)."""
+
+    def __init__(self, per_minute: int) -> None:
+        self.interval = 60 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, items: int) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + items * self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class ReindexService:
+    """
+    Background job that (re)embeds every snippet without an embedding of the active model.
+    Snippets are walked in id order and committed in chunks together with the job's cursor,
+    so a job interrupted by a crash or restart continues where it stopped and repeats at most
+    one chunk (whose embeddings then mostly come from the embedding cache).
+    """
+
+    def __init__(self) -> None:
+        self._tasks: dict[int, asyncio.Task[None]] = {}
+
+    def stale_filter(self, model_id: str | None) -> ColumnElement[bool]:
+        """Snippets whose embedding is missing or was made with another model."""
+        return or_(
+            Snippet.embedding.is_(None),
+            Snippet.embedding_model.is_(None),
+            Snippet.embedding_model != model_id,
+        )
+
+    def start(self, db: Session, session_factory: SessionFactory) -> ReindexJob:
+        """Start a job, or return the one already running (resuming it if it was interrupted)."""
+        running = (
+            db.query(ReindexJob).filter(ReindexJob.status == "running").order_by(ReindexJob.id.desc()).first()
+        )
+        if running is not None:
+            if running.id not in self._tasks and self._claim(db, running.id):
+                self._launch(running.id, session_factory)
+            return running
+
+        model = embedding_service.active_model(db)
+        job = ReindexJob(
+            status="running",
+            model_id=model.id,
+            total=db.query(func.count(Snippet.id)).filter(self.stale_filter(model.id)).scalar() or 0,
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._launch(job.id, session_factory)
+        return job
+
+    def resume_interrupted(self, session_factory: SessionFactory) -> list[int]:
+        """Resume running jobs whose worker died (no heartbeat for REINDEX_STALE_SECONDS)."""
+        resumed = []
+        with session_factory() as db:
+            job_ids = [job_id for (job_id,) in db.query(ReindexJob.id).filter(ReindexJob.status == "running")]
+            for job_id in job_ids:
+                if job_id not in self._tasks and self._claim(db, job_id):
+                    self._launch(job_id, session_factory)
+                    resumed.append(job_id)
+        if resumed:
+            logger.info(f"Resuming interrupted re-index jobs {resumed}")
+        return resumed
+
+    def cancel(self, db: Session, job: ReindexJob) -> ReindexJob:
+        # The worker checks the status before every chunk
+        if job.status == "running":
+            job.status = "cancelled"
+            job.finished_at = datetime.datetime.utcnow()
+            db.commit()
+            db.refresh(job)
+        return job
+
+    def progress(self, job: ReindexJob) -> dict[str, Any]:
+        done = job.processed + job.failed
+        total = max(job.total, done)
+        now = datetime.datetime.utcnow()
+        elapsed = ((job.finished_at or now) - (job.started_at or now)).total_seconds()
+        eta = None
+        if job.status == "running" and done:
+            eta = max(0.0, (total - done) * elapsed / done)
+        return {
+            "id": job.id,
+            "status": job.status,
+            "model_id": job.model_id,
+            "total": total,
+            "processed": job.processed,
+            "failed": job.failed,
+            "percent": 100.0 if not total else round(100 * done / total, 1),
+            "snippets_per_second": round(done / elapsed, 2) if elapsed > 0 else 0.0,
+            "eta_seconds": eta,
+            "error": job.error,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+
+    async def run(self, job_id: int, session_factory: SessionFactory) -> None:
+        limiter = RateLimiter(settings.REINDEX_MAX_SNIPPETS_PER_MINUTE)
+        semaphore = asyncio.Semaphore(max(1, settings.REINDEX_CONCURRENCY))
+        with session_factory() as db:
+            job = db.get(ReindexJob, job_id)
+            if job is None:
+                return
+            try:
+                while await self._run_chunk(db, job, semaphore, limiter):
+                    pass
+            except Exception as e:
+                logger.error(f"Re-index job {job_id} failed: {e}")
+                db.rollback()
+                job.status = "failed"
+                job.error = str(e)
+                job.finished_at = datetime.datetime.utcnow()
+                db.commit()
+
+    async def _run_chunk(
+        self, db: Session, job: ReindexJob, semaphore: asyncio.Semaphore, limiter: RateLimiter
+    ) -> bool:
+        """Embed and commit the next chunk, False once the job is finished or was cancelled."""
+        # Session work runs on a worker thread, only the embedding itself runs on the event loop
+        chunk = await asyncio.to_thread(self._next_chunk, db, job)
+        if not chunk:
+            return False
+
+        size = max(1, settings.REINDEX_BATCH_SIZE)
+        batches = [chunk[i:i + size] for i in range(0, len(chunk), size)]
+        results = await asyncio.gather(
+            *(self._embed_batch(db, job.id, batch, semaphore, limiter) for batch in batches)
+        )
+        await asyncio.to_thread(self._commit_chunk, db, job, batches, results)
+        return True
+
+    def _next_chunk(self, db: Session, job: ReindexJob) -> list[Snippet]:
+        """Snippets of the next chunk, empty once the job is finished (then marked as such) or cancelled."""
+        db.refresh(job)
+        if job.status != "running":
+            return []
+
+        model = embedding_service.active_model(db)
+        if model.id != job.model_id:
+            # Settings changed while the job ran, snippets done so far are stale again
+            logger.info(f"Re-index job {job.id} switches to model {model.id}, restarting from the first snippet")
+            job.model_id = model.id
+            job.last_snippet_id = 0
+
+        chunk = (
+            db.query(Snippet)
+            .filter(Snippet.id > job.last_snippet_id, self.stale_filter(model.id))
+            .order_by(Snippet.id)
+            .limit(max(1, settings.REINDEX_CHUNK_SIZE))
+            .all()
+        )
+        if not chunk:
+            job.status = "failed" if job.failed and not job.processed else "completed"
+            job.finished_at = datetime.datetime.utcnow()
+            db.commit()
+            logger.info(f"Re-index job {job.id} {job.status}: {job.processed} embedded, {job.failed} failed")
+            if job.processed:
+                try:
+                    vector_index.ensure(db, model.id)
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(f"Could not create the vector index for {model.id}: {e}")
+        return chunk
+
+    def _commit_chunk(
+        self, db: Session, job: ReindexJob, batches: list[list[Snippet]], results: list[SnippetEmbeddings | str]
+    ) -> None:
+        for batch, result in zip(batches, results, strict=True):
+            if isinstance(result, SnippetEmbeddings):
+                embedding_service.apply_embeddings(batch, result)
+                job.processed += len(batch)
+            else:
+                job.failed += len(batch)
+                job.error = result
+        job.last_snippet_id = batches[-1][-1].id
+        job.heartbeat_at = datetime.datetime.utcnow()
+        # Embeddings and cursor in one transaction, a crash never loses or skips a chunk
+        db.commit()
+
+    async def _embed_batch(
+        self, db: Session, job_id: int, batch: list[Snippet], semaphore: asyncio.Semaphore, limiter: RateLimiter
+    ) -> SnippetEmbeddings | str:
+        """The batch's embeddings (applied with the chunk's commit), or the error message."""
+        async with semaphore:
+            await limiter.acquire(len(batch))
+            try:
+                result: SnippetEmbeddings | str = await embedding_service.embed_snippets(batch, db)
+            except Exception as e:
+                logger.warning(f"Re-index batch of {len(batch)} snippets failed: {e}")
+                result = str(e)
+        # A rate limited chunk can take longer than REINDEX_STALE_SECONDS, every batch shows the job is alive
+        await asyncio.to_thread(self._heartbeat, db, job_id)
+        return result
+
+    def _heartbeat(self, db: Session, job_id: int) -> None:
+        # Own short transaction, the job's session only writes when the chunk is committed
+        try:
+            with Session(bind=db.get_bind()) as heartbeat_db:
+                heartbeat_db.execute(
+                    update(ReindexJob)
+                    .where(ReindexJob.id == job_id, ReindexJob.status == "running")
+                    .values(heartbeat_at=datetime.datetime.utcnow())
+                )
+                heartbeat_db.commit()
+        except Exception as e:
+            logger.warning(f"Could not update the heartbeat of re-index job {job_id}: {e}")
+
+    def _claim(self, db: Session, job_id: int) -> bool:
+        """Take over a running job whose heartbeat is stale; only one worker process wins."""
+        now = datetime.datetime.utcnow()
+        cutoff = now - datetime.timedelta(seconds=settings.REINDEX_STALE_SECONDS)
+        result = db.execute(
+            update(ReindexJob)
+            .where(
+                ReindexJob.id == job_id,
+                ReindexJob.status == "running",
+                or_(ReindexJob.heartbeat_at.is_(None), ReindexJob.heartbeat_at < cutoff),
+            )
+            .values(heartbeat_at=now)
+        )
+        db.commit()
+        return bool(getattr(result, "rowcount", 0))
+
+    def _launch(self, job_id: int, session_factory: SessionFactory) -> None:
+        task = asyncio.get_running_loop().create_task(self.run(job_id, session_factory))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+
+reindex_service = ReindexService()
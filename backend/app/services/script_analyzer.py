@@ -1,49 +1,382 @@
+import asyncio
+import codecs
 import hashlib
+import io
+import logging
 import os
-import re
+import tarfile
+import zipfile
+import zlib
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import IO, TypeVar
 
+from app.core.config import settings
 from app.schemas.snippet import SnippetCreate
+from app.services.analysis_cache import AnalysisCache, CacheEntry
+from app.services.ps_lexer import Region, ps_lexer
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# UTF-32 LE must be checked before UTF-16 LE, they share the first two bytes
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+_DECODE_CHUNK_SIZE = 64 * 1024
+
+# Bump whenever the snippets extracted from a script change, cached results of other versions are re-parsed
+ANALYZER_VERSION = 1
+
+
+class ArchiveLimitError(ValueError):
+    """Raised when an archive expands beyond the configured size limit."""
+
+
+# (sha256 of the file's bytes, snippets parsed from exactly those bytes)
+HashedAnalysis = tuple[str, list[SnippetCreate]]
+
+
+class _HashingReader:
+    """Passes reads through while hashing them, so a file is hashed and decoded in one pass."""
+
+    def __init__(self, stream: IO[bytes]) -> None:
+        self._stream = stream
+        self.digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self.digest.update(data)
+        return data
+
+
+# Worker entry points run inside worker processes, so they have to be picklable module-level functions.
+# Each worker process keeps one service, so its analysis cache survives across batches.
+_worker_service: "ScriptAnalyzerService | None" = None
+
+
+def _get_worker_service() -> "ScriptAnalyzerService":
+    global _worker_service
+    if _worker_service is None:
+        _worker_service = ScriptAnalyzerService()
+    return _worker_service
+
+
+def _analyze_batch(paths: list[str]) -> list[list[SnippetCreate]]:
+    service = _get_worker_service()
+    return [service._analyze_file(path) for path in paths]
+
+
+def _analyze_hashed_batch(paths: list[str]) -> list[HashedAnalysis | None]:
+    service = _get_worker_service()
+    return [service._analyze_file_hashed(path) for path in paths]
+
+
+def _analyze_content_job(content: str, filename: str, split_functions: bool) -> list[SnippetCreate]:
+    # The caller already consulted its own cache
+    return _get_worker_service()._extract_functions(content, filename, split_functions)
 
-# ...
 
 class ScriptAnalyzerService:
+    def __init__(self) -> None:
+        self._executor: Executor | None = None
+        self.cache = AnalysisCache(
+            settings.ANALYZER_CACHE_SIZE,
+            settings.ANALYZER_CACHE_DIR,
+            settings.ANALYZER_CACHE_DISK_MAX_ENTRIES,
+            version=ANALYZER_VERSION,
+        )
+
     def _compute_hash(self, content: str) -> str:
         return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
-    def analyze_folder(self, folder_path: str) -> list[SnippetCreate]:
+    def analyze_folder(
+        self, folder_path: str, workers: int | None = None, chunk_size: int | None = None
+    ) -> list[SnippetCreate]:
+        """
+        Analyze every .ps1 file below folder_path.
+        Files are handed to a process pool in batches of chunk_size; workers=1 analyzes serially.
+        Defaults come from ANALYZER_WORKERS / ANALYZER_CHUNK_SIZE.
+        """
         snippets: list[SnippetCreate] = []
         if not os.path.exists(folder_path):
             return snippets
 
+        paths = list(self.iter_script_files(folder_path))
+        for extracted in self.analyze_files(paths, workers, chunk_size):
+            snippets.extend(extracted)
+        return snippets
+
+    def analyze_files(
+        self, paths: list[str], workers: int | None = None, chunk_size: int | None = None
+    ) -> list[list[SnippetCreate]]:
+        """
+        Analyze the given files, returning the snippets of each file in the order of paths.
+        """
+        return self._map_files(self._analyze_file, _analyze_batch, paths, workers, chunk_size)
+
+    def analyze_files_hashed(
+        self, paths: list[str], workers: int | None = None, chunk_size: int | None = None
+    ) -> list[HashedAnalysis | None]:
+        """
+        Like analyze_files, but with the content hash of the bytes that were parsed, and None
+        for files that could not be read.
+        """
+        return self._map_files(self._analyze_file_hashed, _analyze_hashed_batch, paths, workers, chunk_size)
+
+    def _map_files(
+        self,
+        analyze: Callable[[str], T],
+        batch_job: Callable[[list[str]], list[T]],
+        paths: list[str],
+        workers: int | None,
+        chunk_size: int | None,
+    ) -> list[T]:
+        workers, chunk_size = self._pool_params(workers, chunk_size)
+
+        # A pool is not worth spawning for a single batch
+        if workers == 1 or len(paths) <= chunk_size:
+            return [analyze(path) for path in paths]
+
+        results: list[T] = []
+        batches = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+            # map keeps the batch order, so results are identical to a serial run
+            for batch_results in executor.map(batch_job, batches):
+                results.extend(batch_results)
+        return results
+
+    def iter_folder(
+        self, folder_path: str, workers: int | None = None, chunk_size: int | None = None
+    ) -> Iterator[tuple[str, list[SnippetCreate]]]:
+        """
+        Yield (path, snippets) for every .ps1 file below folder_path as soon as it is parsed, in walk order.
+        Only a couple of batches per worker are in flight, so memory stays flat regardless of tree size.
+        """
+        if not os.path.exists(folder_path):
+            return
+
+        workers, chunk_size = self._pool_params(workers, chunk_size)
+        paths = self.iter_script_files(folder_path)
+        if workers == 1:
+            for path in paths:
+                yield path, self._analyze_file(path)
+            return
+
+        executor = ProcessPoolExecutor(max_workers=workers)
+        pending: deque[tuple[list[str], Future[list[list[SnippetCreate]]]]] = deque()
+        try:
+            while batch := list(islice(paths, chunk_size)):
+                pending.append((batch, executor.submit(_analyze_batch, batch)))
+                if len(pending) >= workers * 2:
+                    done_batch, future = pending.popleft()
+                    yield from zip(done_batch, future.result(), strict=True)
+            while pending:
+                done_batch, future = pending.popleft()
+                yield from zip(done_batch, future.result(), strict=True)
+        finally:
+            # Also reached when the consumer stops early (e.g. a client disconnect)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _pool_params(self, workers: int | None, chunk_size: int | None) -> tuple[int, int]:
+        if workers is None:
+            workers = settings.ANALYZER_WORKERS
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        return workers, max(1, chunk_size or settings.ANALYZER_CHUNK_SIZE)
+
+    def worker_count(self) -> int:
+        return self._pool_params(None, None)[0]
+
+    async def analyze_content_async(
+        self, content: str, filename: str, split_functions: bool = False
+    ) -> list[SnippetCreate]:
+        """
+        Run analyze_content in the shared worker pool, keeping the CPU-bound parsing off the event loop.
+        """
+        key = self._cache_key(content, split_functions)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self._replay_cached(cached, filename)
+
+        loop = asyncio.get_running_loop()
+        snippets = await loop.run_in_executor(
+            self._get_executor(), _analyze_content_job, content, filename, split_functions
+        )
+        self.cache.put(key, (filename, [s.model_dump() for s in snippets]))
+        return snippets
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            workers = self.worker_count()
+            # workers=1 means no extra processes, but we still keep the work off the event loop
+            self._executor = ThreadPoolExecutor(max_workers=1) if workers == 1 else ProcessPoolExecutor(workers)
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def iter_archive(
+        self, fileobj: IO[bytes], max_member_bytes: int, max_total_bytes: int
+    ) -> Iterator[tuple[str, str]]:
+        """
+        Yield (member path, decoded content) for every .ps1 member of a zip or tar(.gz/.bz2/.xz) archive.
+        Members are read one at a time straight out of the archive, nothing is extracted to disk.
+        Members larger than max_member_bytes are skipped; ArchiveLimitError is raised once the
+        uncompressed total exceeds max_total_bytes. ValueError is raised for unsupported or corrupt files.
+        """
+        try:
+            yield from self._iter_archive_members(fileobj, max_member_bytes, max_total_bytes)
+        except (tarfile.TarError, zipfile.BadZipFile, EOFError, zlib.error) as e:
+            # Bad CRCs and truncated streams only show up while members are read
+            raise ValueError(f"Invalid or corrupt archive, expected .zip or .tar(.gz): {e}") from e
+
+    def _iter_archive_members(
+        self, fileobj: IO[bytes], max_member_bytes: int, max_total_bytes: int
+    ) -> Iterator[tuple[str, str]]:
+        total = 0
+
+        def read_member(name: str, stream: IO[bytes]) -> str | None:
+            nonlocal total
+            # Reading one byte past the limit tells us the member is too large without trusting headers
+            data = stream.read(max_member_bytes + 1)
+            if len(data) > max_member_bytes:
+                logger.warning(f"Skipping archive member {name}: larger than {max_member_bytes} bytes")
+                return None
+            total += len(data)
+            if total > max_total_bytes:
+                raise ArchiveLimitError(f"Archive expands to more than {max_total_bytes} bytes")
+            return self.decode_stream(io.BytesIO(data))
+
+        if zipfile.is_zipfile(fileobj):
+            fileobj.seek(0)
+            with zipfile.ZipFile(fileobj) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not info.filename.lower().endswith(".ps1"):
+                        continue
+                    with archive.open(info) as member:
+                        content = read_member(info.filename, member)
+                    if content is not None:
+                        yield info.filename.removeprefix("./"), content
+            return
+
+        fileobj.seek(0)
+        with tarfile.open(fileobj=fileobj, mode="r:*") as tar:
+            for tar_info in tar:
+                if not tar_info.isfile() or not tar_info.name.lower().endswith(".ps1"):
+                    continue
+                extracted = tar.extractfile(tar_info)
+                if extracted is None:
+                    continue
+                with extracted:
+                    content = read_member(tar_info.name, extracted)
+                if content is not None:
+                    yield tar_info.name.removeprefix("./"), content
+
+    def decode_stream(self, stream: IO[bytes]) -> str:
+        """
+        Decode a script incrementally.
+        A BOM selects the encoding, otherwise UTF-8 is assumed. If the data turns out not to be
+        UTF-8 (typically an ANSI script from Windows PowerShell), decoding continues in Latin-1
+        from the offending chunk on instead of starting over.
+        """
+        chunk = stream.read(_DECODE_CHUNK_SIZE)
+        encoding = "utf-8"
+        for bom, bom_encoding in _BOMS:
+            if chunk.startswith(bom):
+                encoding = bom_encoding
+                chunk = chunk[len(bom):]
+                break
+
+        decoder = codecs.getincrementaldecoder(encoding)()
+        parts: list[str] = []
+        while True:
+            final = not chunk
+            try:
+                parts.append(decoder.decode(chunk, final))
+            except UnicodeDecodeError:
+                # Bytes buffered from the previous chunk are still pending in the failed decoder
+                pending, _ = decoder.getstate()
+                decoder = codecs.getincrementaldecoder("latin-1")()
+                parts.append(decoder.decode(pending + chunk, final))
+            if final:
+                return "".join(parts)
+            chunk = stream.read(_DECODE_CHUNK_SIZE)
+
+    def iter_script_files(self, folder_path: str) -> Iterator[str]:
         for root, _, files in os.walk(folder_path):
             for file in files:
                 if file.lower().endswith(".ps1"):
-                    full_path = os.path.join(root, file)
-                    try:
-                        with open(full_path, encoding="utf-8") as f:
-                            content = f.read()
-                            extracted = self.analyze_content(content, file)
-                            snippets.extend(extracted)
-                    except Exception as e:
-                        print(f"Error reading {file}: {e}")
-        return snippets
+                    yield os.path.join(root, file)
+
+    def _analyze_file(self, full_path: str) -> list[SnippetCreate]:
+        file = os.path.basename(full_path)
+        try:
+            with open(full_path, "rb") as f:
+                content = self.decode_stream(f)
+            return self.analyze_content(content, file)
+        except Exception as e:
+            logger.error(f"Error reading {file}: {e}")
+            return []
+
+    def _analyze_file_hashed(self, full_path: str) -> HashedAnalysis | None:
+        file = os.path.basename(full_path)
+        try:
+            with open(full_path, "rb") as f:
+                reader = _HashingReader(f)
+                content = self.decode_stream(reader)  # type: ignore[arg-type]
+            return reader.digest.hexdigest(), self.analyze_content(content, file)
+        except Exception as e:
+            logger.error(f"Error reading {file}: {e}")
+            return None
 
     def analyze_content(self, content: str, filename: str, split_functions: bool = False) -> list[SnippetCreate]:
-        return self._extract_functions(content, filename, split_functions)
+        key = self._cache_key(content, split_functions)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self._replay_cached(cached, filename)
+
+        snippets = self._extract_functions(content, filename, split_functions)
+        self.cache.put(key, (filename, [s.model_dump() for s in snippets]))
+        return snippets
+
+    def _cache_key(self, content: str, split_functions: bool) -> str:
+        # The result only depends on the content and the split flag, the filename is patched in on a hit
+        return f"{self._compute_hash(content)}-{int(split_functions)}"
+
+    def _replay_cached(self, entry: CacheEntry, filename: str) -> list[SnippetCreate]:
+        cached_filename, dumps = entry
+        snippets = []
+        for data in dumps:
+            snippet = SnippetCreate(**data)
+            snippet.source = filename
+            # Whole-file snippets are named after their file
+            if snippet.name == cached_filename:
+                snippet.name = filename
+            snippets.append(snippet)
+        return snippets
 
     def _extract_functions(self, content: str, source: str, split_functions: bool = False) -> list[SnippetCreate]:
         found_snippets = []
-        
-        # Regex to find function definitions start: function Name {
-        # We use this to find the starting point, then we use brace counting for the body.
-        function_start_pattern = re.compile(r"function\s+([\w-]+)\s*\{", re.IGNORECASE)
-        
-        matches = list(function_start_pattern.finditer(content))
-        
+
+        # One linear pass over the file gives us every function span together with
+        # the comment-based help directly in front of it. Strings, here-strings and
+        # comments are skipped by the lexer, so braces inside them do not count.
+        lexed = ps_lexer.tokenize(content)
+
         # IF splitting is disabled OR no functions found, treat as whole file
-        if not split_functions or not matches:
+        if not split_functions or not lexed.functions:
             # No functions found, treat entire file as script
-            help_info = self._extract_help_info(content, 0)
+            help_info = self._help_for_region(content, lexed.script_help)
             description_val = help_info.get("description", "")
             description = description_val if isinstance(description_val, str) else ""
             
@@ -66,42 +399,32 @@ class ScriptAnalyzerService:
             ))
             return found_snippets
 
-        for match in matches:
-            func_name = match.group(1)
-            start_index = match.end() - 1 # This is the opening brace '{'
-            
-            # Extract body using brace counting
-            end_index = self._find_matching_brace(content, start_index)
-            
-            if end_index != -1:
-                # We have the full function body including braces
-                # But typically we want the whole definition including "function Name"
-                # So we take from match.start() to end_index + 1
-                full_function_text = content[match.start():end_index+1]
-                
-                # Look for help immediately before the function
-                help_info = self._extract_help_info(content, match.start())
-                
-                description_val = help_info.get("description", "")
-                description = description_val if isinstance(description_val, str) else ""
-                
-                 # Append parameters if found
-                parameters_val = help_info.get("parameters")
-                if isinstance(parameters_val, list) and parameters_val:
-                    params_str = ", ".join([str(p) for p in parameters_val])
-                    description += f"\n\nParameters: {params_str}"
-                
-                tags_val = help_info.get("tags", [])
-                tags = tags_val if isinstance(tags_val, list) else []
-
-                found_snippets.append(SnippetCreate(
-                    name=func_name,
-                    content=full_function_text,
-                    source=source,
-                    description=description.strip() or None,
-                    tags=sorted(list(set([str(t) for t in tags] + ["function", "auto-discovered"]))),
-                    content_hash=self._compute_hash(full_function_text)
-                ))
+        for function in lexed.functions:
+            # We want the whole definition including "function Name", up to the closing brace
+            full_function_text = content[function.start:function.end]
+
+            help_info = self._help_for_region(content, function.help)
+
+            description_val = help_info.get("description", "")
+            description = description_val if isinstance(description_val, str) else ""
+
+            # Append parameters if found
+            parameters_val = help_info.get("parameters")
+            if isinstance(parameters_val, list) and parameters_val:
+                params_str = ", ".join([str(p) for p in parameters_val])
+                description += f"\n\nParameters: {params_str}"
+
+            tags_val = help_info.get("tags", [])
+            tags = tags_val if isinstance(tags_val, list) else []
+
+            found_snippets.append(SnippetCreate(
+                name=function.name,
+                content=full_function_text,
+                source=source,
+                description=description.strip() or None,
+                tags=sorted(list(set([str(t) for t in tags] + ["function", "auto-discovered"]))),
+                content_hash=self._compute_hash(full_function_text)
+            ))
 
         return found_snippets
 
@@ -111,67 +434,18 @@ class ScriptAnalyzerService:
         Find the index of the closing brace '}' corresponding to the '{' at start_index.
         Returns -1 if not found.
         """
-        if start_index >= len(content) or content[start_index] != '{':
-            return -1
+        return ps_lexer.find_matching_brace(content, start_index)
 
-        balance = 1
-        in_single_quote = False
-        in_double_quote = False
-        escape = False
-        
-        i = start_index + 1
-        while i < len(content):
-            char = content[i]
-            
-            if escape:
-                escape = False
-                i += 1
-                continue
-                
-            if char == '`': # PowerShell escape character
-                escape = True
-                i += 1
-                continue
-
-            if char == "'" and not in_double_quote:
-                in_single_quote = not in_single_quote
-            elif char == '"' and not in_single_quote:
-                in_double_quote = not in_double_quote
-            
-            if not in_single_quote and not in_double_quote:
-                if char == '{':
-                    balance += 1
-                elif char == '}':
-                    balance -= 1
-                    if balance == 0:
-                        return i
-            i += 1
-            
-        return -1
+    def _help_for_region(self, content: str, region: Region | None) -> dict[str, list[str] | str]:
+        if region is None:
+            return {}
+        # Strip the <# and #> delimiters
+        return self._parse_help_block(content[region.start + 2:region.end - 2])
 
-    def _extract_help_info(self, content: str, end_pos: int) -> dict[str, list[str] | str]:
+    def _parse_help_block(self, comment_block: str) -> dict[str, list[str] | str]:
         """
-        Scans backwards from end_pos to find a Comment-Based Help block (<# ... #>).
-        Parses .SYNOPSIS, .DESCRIPTION, .PARAMETER.
+        Parses .SYNOPSIS, .DESCRIPTION, .PARAMETER out of the inside of a <# ... #> block.
         """
-        # Look backwards for the *end* of a block comment: #>
-        # We limit the search to avoid scanning the whole file unnecessarily
-        search_limit = max(0, end_pos - 2000) 
-        preceding_text = content[search_limit:end_pos].rstrip()
-        
-        if not preceding_text.endswith("#>"):
-            return {}
-
-        # Find the start of the comment block <#
-        # We need to find the last occurrence of <# before the #> we just found
-        block_end_idx = preceding_text.rfind("#>")
-        block_start_idx = preceding_text.rfind("<#", 0, block_end_idx)
-        
-        if block_start_idx == -1:
-            return {}
-            
-        comment_block = preceding_text[block_start_idx+2 : block_end_idx]
-        
         # Parse standard keywords
         info: dict[str, list[str] | str] = {
             "tags": [],
@@ -237,3 +511,6 @@ class ScriptAnalyzerService:
         info["description"] = "\n\n".join(desc_parts)
         
         return info
+
+
+script_analyzer = ScriptAnalyzerService()
@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.setting import SystemSetting
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SystemSettings:
+    """Snapshot of the system_settings the LLM and embedding clients read, None where a key is not stored."""
+
+    keys: frozenset[str] = frozenset()  # All stored keys, including ones without a field here
+    llm_provider: str | None = None
+    embedding_provider: str | None = None
+    openai_api_key: str | None = None
+    openai_model: str | None = None
+    openai_base_url: str | None = None
+    azure_openai_endpoint: str | None = None
+    azure_openai_api_version: str | None = None
+    azure_openai_deployment_name: str | None = None
+    azure_openai_embedding_deployment_name: str | None = None
+
+    @classmethod
+    def from_values(cls, values: Mapping[str, str | None]) -> "SystemSettings":
+        return cls(
+            keys=frozenset(values),
+            llm_provider=values.get("LLM_PROVIDER"),
+            embedding_provider=values.get("EMBEDDING_PROVIDER"),
+            openai_api_key=values.get("OPENAI_API_KEY"),
+            openai_model=values.get("OPENAI_MODEL"),
+            openai_base_url=values.get("OPENAI_BASE_URL"),
+            azure_openai_endpoint=values.get("AZURE_OPENAI_ENDPOINT"),
+            azure_openai_api_version=values.get("AZURE_OPENAI_API_VERSION"),
+            azure_openai_deployment_name=values.get("AZURE_OPENAI_DEPLOYMENT_NAME"),
+            azure_openai_embedding_deployment_name=values.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"),
+        )
+
+
+class SettingsCache:
+    """
+    In-process cache of the system_settings table as a frozen SystemSettings snapshot.
+    Writers in this process call `invalidate()` after committing. Other worker
+    processes pick changes up after SETTINGS_CACHE_TTL_SECONDS (0 disables the cache).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: SystemSettings | None = None
+        self._loaded_at = 0.0
+        self._generation = 0  # Bumped by invalidate(), so a load racing with a write is not kept
+        self.loads = 0
+
+    def get(self, db: Session) -> SystemSettings:
+        """Return the settings snapshot, loading it if the cache is empty or expired."""
+        with self._lock:
+            if self._values is not None and not self._expired():
+                return self._values
+            generation = self._generation
+
+        rows: Iterable[tuple[str, str | None]] = db.query(SystemSetting.key, SystemSetting.value)
+        values = SystemSettings.from_values({str(key): value for key, value in rows})
+        with self._lock:
+            self.loads += 1
+            if generation == self._generation:
+                self._values = values
+                self._loaded_at = time.monotonic()
+        return values
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._values = None
+            self._generation += 1
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self._loaded_at >= settings.SETTINGS_CACHE_TTL_SECONDS
+
+
+settings_cache = SettingsCache()
@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+
+from app.core.config import settings
+from app.services.ps_lexer import ps_lexer
+
+
+@dataclass(frozen=True)
+class Chunk:
+    start: int  # Offsets into the snippet content
+    end: int
+    name: str | None  # Function name, None for script code between functions
+
+    def text(self, content: str) -> str:
+        return content[self.start:self.end]
+
+
+class SnippetChunker:
+    """
+    Splits long snippets into chunks that are embedded separately: one per top-level function
+    (including its comment-based help) and one per run of script code between functions.
+    Chunks longer than EMBEDDING_CHUNK_MAX_CHARS are split further at line breaks.
+    """
+
+    def chunk(self, content: str, max_chars: int | None = None) -> list[Chunk]:
+        """Chunks of content, or an empty list if the snippet is no longer than max_chars (one embedding covers it)."""
+        max_chars = settings.EMBEDDING_CHUNK_MAX_CHARS if max_chars is None else max_chars
+        if max_chars <= 0 or len(content) <= max_chars:
+            return []
+        pieces: list[Chunk] = []
+        pos = 0
+        for function in ps_lexer.tokenize(content).functions:
+            if function.start < pos:
+                continue  # Nested function, part of its parent's chunk
+            help_block = function.help
+            start = help_block.start if help_block is not None and help_block.start >= pos else function.start
+            self._add_script(pieces, content, pos, start)
+            pieces.append(Chunk(start, function.end, function.name))
+            pos = function.end
+        self._add_script(pieces, content, pos, len(content))
+
+        chunks = [part for piece in pieces for part in self._split(piece, content, max_chars)]
+        return chunks if len(chunks) > 1 else []
+
+    def embedding_text(self, snippet_name: str, chunk: Chunk, content: str) -> str:
+        # The snippet name gives chunks of generic helper code some context
+        title = f"{snippet_name} / {chunk.name}" if chunk.name else snippet_name
+        return f"{title}\n{chunk.text(content)}"
+
+    @staticmethod
+    def _add_script(pieces: list[Chunk], content: str, start: int, end: int) -> None:
+        text = content[start:end]
+        if text.strip():
+            leading = len(text) - len(text.lstrip())
+            pieces.append(Chunk(start + leading, start + len(text.rstrip()), None))
+
+    @staticmethod
+    def _split(piece: Chunk, content: str, max_chars: int) -> list[Chunk]:
+        if piece.end - piece.start <= max_chars:
+            return [piece]
+        parts = []
+        start = piece.start
+        while piece.end - start > max_chars:
+            # Cut after the last line break that keeps the part within the limit
+            cut = content.rfind("\n", start, start + max_chars)
+            end = cut + 1 if cut > start else start + max_chars
+            parts.append(Chunk(start, end, piece.name))
+            start = end
+        parts.append(Chunk(start, piece.end, piece.name))
+        return parts
+
+
+snippet_chunker = SnippetChunker()
@@ -0,0 +1,157 @@
+import hashlib
+import logging
+import math
+import time
+from collections.abc import Sequence
+from typing import Any
+
+from pgvector.sqlalchemy import HALFVEC, Vector
+from sqlalchemy import ColumnElement, Select, cast, func, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.snippet import Snippet
+
+logger = logging.getLogger(__name__)
+
+# Largest dimension pgvector's HNSW and IVFFlat indexes take per type
+MAX_VECTOR_DIMENSIONS = 2000
+MAX_HALFVEC_DIMENSIONS = 4000
+INDEX_PREFIX = "ix_snippet_embedding_ann_"
+
+
+class VectorIndexService:
+    """
+    Approximate nearest neighbour (HNSW or IVFFlat) indexes on snippet.embedding.
+    The column holds every model's vectors at their native size, an index needs a fixed one,
+    so each (model, dimension) gets a partial expression index over its own rows. Searches
+    use the same cast and filters (see indexed_distance) so the planner picks that index.
+    """
+
+    def index_name(self, model_id: str, dimension: int) -> str:
+        digest = hashlib.sha1(f"{model_id}:{dimension}".encode()).hexdigest()[:12]
+        return f"{INDEX_PREFIX}{digest}"
+
+    def index_type(self, dimension: int) -> Vector | HALFVEC | None:
+        """Type the index casts to, None if the dimension is too large to index."""
+        if settings.EMBEDDING_HALF_PRECISION or dimension > MAX_VECTOR_DIMENSIONS:
+            return HALFVEC(dimension) if dimension <= MAX_HALFVEC_DIMENSIONS else None
+        return Vector(dimension)
+
+    def indexed_distance(self, query_embedding: Sequence[float]) -> ColumnElement[float]:
+        """
+        Cosine distance between snippet.embedding and the query, in the form the model's index covers.
+        Only valid together with the filters of model_filter.
+        """
+        index_type = self.index_type(len(query_embedding))
+        distance: ColumnElement[float]
+        if settings.VECTOR_INDEX_METHOD == "none" or index_type is None:
+            distance = Snippet.embedding.cosine_distance(query_embedding)
+        else:
+            distance = cast(Snippet.embedding, index_type).cosine_distance(query_embedding)
+        return distance
+
+    def model_filter(self, model_id: str, dimension: int) -> list[ColumnElement[bool]]:
+        return [Snippet.embedding_model == model_id, Snippet.embedding_dim == dimension]
+
+    def tune_statement(self, limit: int) -> Select[Any]:
+        """Recall knobs for the current transaction (hnsw.ef_search and ivfflat.probes)."""
+        return select(
+            func.set_config("hnsw.ef_search", str(max(settings.VECTOR_HNSW_EF_SEARCH, limit)), True),
+            func.set_config("ivfflat.probes", str(max(1, settings.VECTOR_IVFFLAT_PROBES)), True),
+        )
+
+    def create_statement(self, model_id: str, dimension: int, method: str, rows: int = 0) -> str | None:
+        """CREATE INDEX for the model's rows, None if the method is "none" or the dimension is too large."""
+        index_type = self.index_type(dimension)
+        if method == "none" or index_type is None:
+            return None
+        type_name = "halfvec" if isinstance(index_type, HALFVEC) else "vector"
+        if method == "hnsw":
+            options = f"m = {settings.VECTOR_HNSW_M}, ef_construction = {settings.VECTOR_HNSW_EF_CONSTRUCTION}"
+        elif method == "ivfflat":
+            options = f"lists = {self._ivfflat_lists(rows)}"
+        else:
+            raise ValueError(f"Unknown vector index method '{method}'")
+        # DDL takes no bind parameters, the model id is quoted as a literal
+        model_literal = "'" + model_id.replace("'", "''") + "'"
+        return (
+            f"CREATE INDEX IF NOT EXISTS {self.index_name(model_id, dimension)} ON snippet "
+            f"USING {method} ((embedding::{type_name}({dimension})) {type_name}_cosine_ops) "
+            f"WITH ({options}) "
+            f"WHERE embedding_model = {model_literal} AND embedding_dim = {dimension}"
+        )
+
+    def status(self, db: Session) -> list[dict[str, Any]]:
+        """One entry per (model, dimension) with embedded snippets, including its index if there is one."""
+        return [
+            self._describe(db, model_id, dimension, rows)
+            for model_id, dimension, rows in self._embedded_models(db)
+        ]
+
+    def ensure(self, db: Session, model_id: str) -> None:
+        """Create missing indexes for the model's embeddings with VECTOR_INDEX_METHOD (Postgres only)."""
+        if db.get_bind().dialect.name != "postgresql":
+            return
+        for indexed_model, dimension, rows in self._embedded_models(db, model_id):
+            statement = self.create_statement(indexed_model, dimension, settings.VECTOR_INDEX_METHOD, rows)
+            if statement is not None:
+                db.execute(text(statement))
+        db.commit()
+
+    def rebuild(self, db: Session, model_id: str, method: str | None = None) -> list[dict[str, Any]]:
+        """
+        Drop and build the model's indexes, with method or VECTOR_INDEX_METHOD.
+        Writes to snippet wait until the build finished.
+        """
+        method = method or settings.VECTOR_INDEX_METHOD
+        rebuilt = []
+        for indexed_model, dimension, rows in self._embedded_models(db, model_id):
+            start = time.perf_counter()
+            db.execute(text(f"DROP INDEX IF EXISTS {self.index_name(indexed_model, dimension)}"))
+            statement = self.create_statement(indexed_model, dimension, method, rows)
+            if statement is not None:
+                db.execute(text(statement))
+            db.commit()
+            build_seconds = time.perf_counter() - start
+            logger.info(f"Rebuilt {method} index for {indexed_model} ({rows} snippets) in {build_seconds:.1f}s")
+            rebuilt.append({**self._describe(db, indexed_model, dimension, rows), "build_seconds": build_seconds})
+        return rebuilt
+
+    def _embedded_models(self, db: Session, model_id: str | None = None) -> list[tuple[str, int, int]]:
+        stmt = (
+            select(Snippet.embedding_model, Snippet.embedding_dim, func.count(Snippet.id))
+            .where(Snippet.embedding.is_not(None), Snippet.embedding_model.is_not(None))
+            .group_by(Snippet.embedding_model, Snippet.embedding_dim)
+        )
+        if model_id is not None:
+            stmt = stmt.where(Snippet.embedding_model == model_id)
+        return [(m, d, n) for m, d, n in db.execute(stmt) if m and d]
+
+    def _describe(self, db: Session, model_id: str, dimension: int, rows: int) -> dict[str, Any]:
+        name = self.index_name(model_id, dimension)
+        row = db.execute(
+            text(
+                "SELECT am.amname, pg_relation_size(c.oid) FROM pg_class c "
+                "JOIN pg_am am ON am.oid = c.relam WHERE c.oid = to_regclass(:name)"
+            ),
+            {"name": name},
+        ).first()
+        return {
+            "name": name,
+            "model_id": model_id,
+            "dimension": dimension,
+            "rows": rows,
+            "method": row[0] if row else None,
+            "size_bytes": int(row[1]) if row else 0,
+        }
+
+    @staticmethod
+    def _ivfflat_lists(rows: int) -> int:
+        # pgvector's guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond
+        if settings.VECTOR_IVFFLAT_LISTS > 0:
+            return settings.VECTOR_IVFFLAT_LISTS
+        return max(1, rows // 1000 if rows <= 1_000_000 else int(math.sqrt(rows)))
+
+
+vector_index = VectorIndexService()
@@ -1,26 +1,111 @@
+import logging
+import math
+import re
+from collections.abc import Iterable, Sequence
+from typing import TYPE_CHECKING, Any
 
-from collections.abc import Sequence
-
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Float, Select, cast, func, literal, literal_column, select, type_coerce, union_all
+from sqlalchemy.dialects.postgresql import BIT
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models.snippet import Snippet
+from app.models.snippet_chunk import SnippetChunk
+from app.services.memory_vector_index import memory_vector_index
+from app.services.vector_index import vector_index
+
+if TYPE_CHECKING:
+    # sqlalchemy.ext.asyncio needs greenlet, only the async search uses it
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+
+# Prose words of a prompt that would match nearly every snippet in the full-text search
+STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "create", "do", "for", "from", "get", "give",
+    "how", "i", "in", "into", "is", "it", "make", "me", "my", "need", "of", "on", "or", "please", "script",
+    "set", "should", "some", "that", "the", "then", "this", "to", "use", "using", "want", "which", "will",
+    "with", "write", "you",
+})
+_TERM = re.compile(r"[a-z][a-z0-9_]*(?:-[a-z0-9_]+)*")
+
+
+def lexical_terms(text: str, max_terms: int = 32) -> list[str]:
+    """Words of text for the full-text query, cmdlet names like Get-ADUser stay whole."""
+    terms: list[str] = []
+    for term in _TERM.findall(text.lower()):
+        if len(term) > 1 and term not in STOP_WORDS and term not in terms:
+            terms.append(term)
+    return terms[:max_terms]
+
+
+def quantize_binary(embedding: Sequence[float]) -> str:
+    """One bit per dimension (1 for positive values), as stored in snippet.embedding_bits."""
+    return "".join("1" if x > 0 else "0" for x in embedding)
 
 
 class VectorStore:
     def __init__(self) -> None:
-        pass
+        self._quantized_failed = False
+
+    def search(
+        self,
+        db: Session,
+        query_embedding: list[float],
+        model_id: str,
+        limit: int = 3,
+        query_text: str | None = None,
+    ) -> list[Snippet]:
+        """
+        Snippets embedded with model_id, most similar (cosine) to query_embedding first.
+        With query_text and VECTOR_SEARCH_HYBRID on Postgres, the hybrid search ranks instead.
+        A snippet's distance is the best of its own embedding and its chunks' embeddings.
+        With VECTOR_SEARCH_QUANTIZED on Postgres, VECTOR_RERANK_CANDIDATES candidates are picked
+        by Hamming distance over the binary quantized embeddings and only those are reranked with
+        the full vectors. Falls back to the exact search if the database cannot do that (pgvector < 0.7).
+        Without pgvector (VECTOR_STORE_BACKEND) the in-memory index answers instead.
+        """
+        if self.uses_memory_index(db):
+            return self._load(db, [i for i, _ in memory_vector_index.search(db, query_embedding, model_id, limit)])
+        postgres = db.get_bind().dialect.name == "postgresql"
+        if postgres:
+            db.execute(vector_index.tune_statement(max(limit, settings.HYBRID_SEARCH_CANDIDATES)))
+            terms = lexical_terms(query_text) if query_text and settings.VECTOR_SEARCH_HYBRID else []
+            if terms:
+                statement = self._hybrid_statement(terms, query_embedding, model_id, limit)
+                return self._load(db, [snippet_id for snippet_id, _ in db.execute(statement).tuples()])
+        hits: list[tuple[int, float]] = list(
+            db.execute(self._chunk_hits_statement(query_embedding, model_id, limit)).tuples()
+        )
+        exact = True
+        if settings.VECTOR_SEARCH_QUANTIZED and not self._quantized_failed and postgres:
+            try:
+                with db.begin_nested():
+                    quantized_hits = db.execute(self._quantized_statement(query_embedding, model_id, limit)).tuples()
+                    hits.extend(quantized_hits)
+                exact = False
+            except DBAPIError as e:
+                logger.warning(f"Quantized vector search unavailable, using exact search: {e}")
+                self._quantized_failed = True
+        if exact:
+            hits.extend(db.execute(self._exact_statement(query_embedding, model_id, limit)).tuples())
+        return self._load(db, self.merge_hits(hits, limit))
 
     async def search_similar_snippets(
-        self, 
-        session: AsyncSession, 
-        query_embedding: list[float], 
+        self,
+        session: "AsyncSession",
+        query_embedding: list[float],
         limit: int = 5,
-        threshold: float = 0.5  # Optional distance threshold
+        threshold: float = 0.5,  # Optional distance threshold
+        model_id: str | None = None  # EmbeddingModel.id the query embedding was made with
     ) -> Sequence[Snippet]:
         """
         Finds snippets most similar to the query_embedding.
         Uses L2 distance (Euclidean) via the <-> operator.
+        Pass model_id whenever snippets may have been embedded with different models,
+        vectors of different models (or dimensions) cannot be compared.
         """
         # Note: pgvector supports:
         # <-> L2 distance
@@ -28,14 +113,135 @@ class VectorStore:
         # <#> Inner product
         # OpenAI embeddings are normalized, so Cosine and L2 yield same ranking.
         # But <=> is cosine distance (1 - cosine_similarity).
-        
-        stmt = (
-            select(Snippet)
-            .order_by(Snippet.embedding.cosine_distance(query_embedding))
+
+        if session.get_bind().dialect.name == "postgresql":
+            await session.execute(vector_index.tune_statement(limit))
+        hits = (await session.execute(self._exact_statement(query_embedding, model_id, limit))).tuples()
+        ids = [snippet_id for snippet_id, _ in hits]
+        result = await session.execute(select(Snippet).where(Snippet.id.in_(ids)))
+        by_id = {s.id: s for s in result.scalars()}
+        return [by_id[i] for i in ids if i in by_id]
+
+    @staticmethod
+    def uses_memory_index(db: Session) -> bool:
+        backend = settings.VECTOR_STORE_BACKEND
+        return backend == "numpy" or (backend == "auto" and db.get_bind().dialect.name != "postgresql")
+
+    @staticmethod
+    def merge_hits(hits: Iterable[tuple[int, float]], limit: int) -> list[int]:
+        """Snippet ids by their best distance over all hits (snippet and chunk embeddings)."""
+        best: dict[int, float] = {}
+        for snippet_id, distance in hits:
+            if distance < best.get(snippet_id, math.inf):
+                best[snippet_id] = distance
+        return sorted(best, key=lambda snippet_id: best[snippet_id])[:limit]
+
+    @staticmethod
+    def _load(db: Session, ids: list[int]) -> list[Snippet]:
+        by_id = {s.id: s for s in db.query(Snippet).filter(Snippet.id.in_(ids))}
+        return [by_id[i] for i in ids if i in by_id]
+
+    def _exact_statement(
+        self, query_embedding: list[float], model_id: str | None, limit: int
+    ) -> Select[Any]:
+        if model_id is None:
+            distance = Snippet.embedding.cosine_distance(query_embedding).label("distance")
+            stmt = select(Snippet.id, distance).where(Snippet.embedding.is_not(None))
+        else:
+            # Same expression and filters as the model's ANN index, see VectorIndexService
+            distance = vector_index.indexed_distance(query_embedding).label("distance")
+            stmt = select(Snippet.id, distance).where(*vector_index.model_filter(model_id, len(query_embedding)))
+        return stmt.order_by(distance).limit(limit)
+
+    def _quantized_statement(
+        self, query_embedding: list[float], model_id: str, limit: int
+    ) -> Select[Any]:
+        query_bits = cast(literal(quantize_binary(query_embedding)), BIT(varying=True))
+        candidates = (
+            select(Snippet.id)
+            .where(Snippet.embedding_model == model_id, Snippet.embedding_bits.is_not(None))
+            .order_by(Snippet.embedding_bits.op("<~>", return_type=Float)(query_bits))
+            .limit(max(limit, settings.VECTOR_RERANK_CANDIDATES))
+            .subquery()
+        )
+        # Exact rerank, only the candidates' full vectors are read
+        distance = Snippet.embedding.cosine_distance(query_embedding).label("distance")
+        return (
+            select(Snippet.id, distance)
+            .where(Snippet.id.in_(select(candidates.c.id)))
+            .order_by(distance)
             .limit(limit)
         )
-        
-        result = await session.execute(stmt)
-        return result.scalars().all()
+
+    def _hybrid_statement(
+        self, terms: list[str], query_embedding: list[float], model_id: str, limit: int
+    ) -> Select[Any]:
+        """
+        Reciprocal rank fusion of the full-text and the vector search, in one statement.
+        Returns (snippet id, score) best first. A snippet found by only one side still scores.
+        """
+        candidates = max(limit, settings.HYBRID_SEARCH_CANDIDATES)
+
+        # Vector side: best of snippet and chunk embeddings, ranked by distance
+        snippet_hits = self._exact_statement(query_embedding, model_id, candidates).subquery()
+        chunk_hits = self._chunk_hits_statement(query_embedding, model_id, candidates).subquery()
+        vector_hits = union_all(
+            select(snippet_hits.c.id.label("snippet_id"), snippet_hits.c.distance),
+            select(chunk_hits.c.snippet_id, chunk_hits.c.distance),
+        ).subquery()
+        vector_ranked = (
+            select(
+                vector_hits.c.snippet_id,
+                func.row_number().over(order_by=func.min(vector_hits.c.distance)).label("rank"),
+            )
+            .group_by(vector_hits.c.snippet_id)
+            .cte("vector_ranked")
+        )
+
+        # Lexical side: any of the terms, name matches weigh most (see the search_vector weights)
+        query = func.to_tsquery(literal_column("'simple'"), " | ".join(terms))
+        lexical_rank = func.ts_rank_cd(Snippet.search_vector, query)
+        lexical_ranked = (
+            select(
+                Snippet.id.label("snippet_id"),
+                func.row_number().over(order_by=lexical_rank.desc()).label("rank"),
+            )
+            .where(Snippet.search_vector.op("@@")(query))
+            .order_by(lexical_rank.desc())
+            .limit(candidates)
+            .cte("lexical_ranked")
+        )
+
+        k = settings.HYBRID_RRF_K
+        # Postgres computes the sum as numeric, read back as float
+        score = type_coerce(
+            func.coalesce(1.0 / (k + vector_ranked.c.rank), 0.0)
+            + func.coalesce(1.0 / (k + lexical_ranked.c.rank), 0.0),
+            Float,
+        ).label("score")
+        return (
+            select(func.coalesce(vector_ranked.c.snippet_id, lexical_ranked.c.snippet_id).label("snippet_id"), score)
+            .select_from(
+                vector_ranked.join(
+                    lexical_ranked, vector_ranked.c.snippet_id == lexical_ranked.c.snippet_id, full=True
+                )
+            )
+            .order_by(score.desc())
+            .limit(limit)
+        )
+
+    def _chunk_hits_statement(
+        self, query_embedding: list[float], model_id: str, limit: int
+    ) -> Select[Any]:
+        # Best chunk per snippet, a long snippet should not take several result slots
+        distance = func.min(SnippetChunk.embedding.cosine_distance(query_embedding)).label("distance")
+        return (
+            select(SnippetChunk.snippet_id, distance)
+            .where(SnippetChunk.embedding_model == model_id)
+            .group_by(SnippetChunk.snippet_id)
+            .order_by(distance)
+            .limit(limit)
+        )
+
 
 vector_store = VectorStore()
@@ -0,0 +1,71 @@
+import random
+
+# Synthetic PowerShell corpora for the benchmarks.
+# The generator is seeded, so the same parameters always produce the same script.
+
+_VERBS = ["Get", "Set", "New", "Remove", "Invoke", "Test", "Update", "Export"]
+_NOUNS = ["User", "Disk", "Report", "Service", "Mailbox", "Share", "Certificate", "Backup"]
+_CMDLETS = [
+    "Get-ChildItem -Path $Path -Recurse",
+    "Get-ADUser -Filter * -Properties Mail",
+    "Invoke-RestMethod -Uri $Uri -Method Get",
+    "Write-Verbose \"Processing $($item.Name) {0}\"",
+    "Set-Content -Path $Out -Value 'done } really'",
+    "$result += [pscustomobject]@{ Name = $item.Name; Size = $item.Length }",
+]
+
+
+def _help_block(name: str, rng: random.Random) -> list[str]:
+    return [
+        "<#",
+        ".SYNOPSIS",
+        f"    {name} does something useful.",
+        ".DESCRIPTION",
+        f"    Generated description {rng.randint(0, 10_000)} with a brace }} inside.",
+        ".PARAMETER Path",
+        "    Where to look.",
+        "#>",
+    ]
+
+
+def _block(depth: int, statements: int, indent: int, rng: random.Random) -> list[str]:
+    pad = " " * indent
+    lines = []
+    for _ in range(statements):
+        lines.append(pad + rng.choice(_CMDLETS))
+        if rng.random() < 0.2:
+            lines.append(pad + "# comment with an unbalanced { brace")
+    if depth > 0:
+        keyword = rng.choice(["if ($true)", "foreach ($item in $items)", "try", "while ($i -lt 10)"])
+        lines.append(f"{pad}{keyword} {{")
+        lines.extend(_block(depth - 1, statements, indent + 4, rng))
+        lines.append(pad + "}")
+    return lines
+
+
+def generate_script(functions: int, depth: int, statements: int = 4, seed: int = 0) -> str:
+    """
+    A module-style script with `functions` functions, each nesting blocks `depth` levels deep.
+    Help blocks, comments, strings and here-strings contain stray braces on purpose.
+    """
+    rng = random.Random(seed)
+    lines = ["Set-StrictMode -Version Latest", ""]
+    for i in range(functions):
+        name = f"{rng.choice(_VERBS)}-{rng.choice(_NOUNS)}{i}"
+        lines.extend(_help_block(name, rng))
+        lines.append(f"function {name} {{")
+        lines.append("    param([string]$Path, [string]$Uri, [string]$Out)")
+        lines.append('    $template = @"')
+        lines.append("function NotAFunction { unbalanced")
+        lines.append('"@')
+        lines.extend(_block(depth, statements, 4, rng))
+        lines.append("}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def generate_texts(count: int, words: int = 40, seed: int = 0) -> list[str]:
+    """Snippet-sized texts for the embedding benchmarks."""
+    rng = random.Random(seed)
+    vocabulary = _VERBS + _NOUNS + [c.split()[0] for c in _CMDLETS]
+    return [" ".join(rng.choice(vocabulary) for _ in range(words)) for _ in range(count)]
@@ -0,0 +1,305 @@
+"""
+Micro-benchmarks for the analyzer, embedding and retrieval hot paths.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --output new.json --compare bench.json
+
+Everything runs offline. The local embedding benchmarks need sentence-transformers and a
+cached all-MiniLM-L6-v2 model, the vector search benchmarks need BENCH_DATABASE_URL pointing
+at a Postgres database with pgvector; both are reported as skipped otherwise. The startup
+benchmarks import the application in a fresh interpreter each run.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable, Iterator
+from datetime import datetime
+from typing import Any
+
+from benchmarks.corpus import generate_script, generate_texts
+
+# name, params, callable, items processed per call
+Case = tuple[str, dict[str, Any], Callable[[], object], int]
+
+
+class Skip(Exception):
+    pass
+
+
+# Optional dependencies that take seconds to import, only the code paths that use them may load them
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "onnxruntime", "opentelemetry.sdk")
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time(module: str) -> tuple[float, list[str]]:
+    """Seconds to import module in a fresh interpreter, and the heavy modules that came with it."""
+    script = (
+        "import importlib, json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"importlib.import_module({module!r})\n"
+        "seconds = time.perf_counter() - start\n"
+        f"print(json.dumps([seconds, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    seconds, heavy = json.loads(result.stdout.strip().splitlines()[-1])
+    return seconds, heavy
+
+
+# (functions, nesting depth) per corpus
+SHAPES = {
+    "quick": [(10, 2), (50, 6)],
+    "full": [(10, 2), (200, 4), (1000, 4), (200, 16)],
+}
+
+
+def analyzer_cases(quick: bool) -> Iterator[Case]:
+    from app.services.near_duplicates import near_duplicate_index
+    from app.services.ps_lexer import Region, ps_lexer
+    from app.services.script_analyzer import ScriptAnalyzerService
+
+    service = ScriptAnalyzerService()
+    for functions, depth in SHAPES["quick" if quick else "full"]:
+        content = generate_script(functions, depth)
+        params = {"functions": functions, "depth": depth, "bytes": len(content)}
+        spans = ps_lexer.tokenize(content).functions
+        brace_starts = [f.body_start for f in spans]
+        help_regions = [f.help for f in spans]
+
+        def tokenize(content: str = content) -> object:
+            return ps_lexer.tokenize(content)
+
+        def extract_functions(content: str = content) -> object:
+            # _extract_functions bypasses the analysis result cache
+            return service._extract_functions(content, "bench.ps1", split_functions=True)
+
+        def find_matching_brace(content: str = content, starts: list[int] = brace_starts) -> object:
+            return [service._find_matching_brace(content, s) for s in starts]
+
+        def help_for_region(content: str = content, regions: list[Region | None] = help_regions) -> object:
+            return [service._help_for_region(content, r) for r in regions]
+
+        def minhash_signature(content: str = content) -> object:
+            return near_duplicate_index.signature(content)
+
+        yield "lexer.tokenize", params, tokenize, 1
+        yield "analyzer.extract_functions", params, extract_functions, functions
+        yield "analyzer.find_matching_brace", params, find_matching_brace, len(brace_starts)
+        yield "analyzer.help_for_region", params, help_for_region, len(help_regions)
+        yield "near_duplicates.signature", params, minhash_signature, 1
+
+
+def embedding_cases(quick: bool) -> Iterator[Case]:
+    from app.services.embedding_service import embedding_service
+
+    try:
+        model = embedding_service._get_local_model()
+    except Exception as e:
+        raise Skip(f"local embedding model unavailable: {e}") from e
+
+    texts = generate_texts(32 if quick else 256)
+    params = {"texts": len(texts)}
+
+    def encode_one_by_one() -> object:
+        return [model.encode(t) for t in texts]
+
+    def encode_batch() -> object:
+        return model.encode(texts)
+
+    yield "embedding.local_encode_single", params, encode_one_by_one, len(texts)
+    yield "embedding.local_encode_batch", params, encode_batch, len(texts)
+
+
+def vector_cases(quick: bool) -> Iterator[Case]:
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if not url:
+        raise Skip("BENCH_DATABASE_URL not set")
+
+    import random
+
+    from sqlalchemy import create_engine, func, select
+    from sqlalchemy.orm import Session
+
+    from app.models.snippet import Snippet
+    from app.services.vector_index import vector_index
+    from app.services.vector_store import VectorStore
+
+    session = Session(create_engine(url))
+    # Benchmark the model most snippets are embedded with, vectors of other models are not comparable
+    top_model = session.execute(
+        select(Snippet.embedding_model, Snippet.embedding_dim, func.count())
+        .where(Snippet.embedding.isnot(None), Snippet.embedding_model.isnot(None), Snippet.embedding_dim.isnot(None))
+        .group_by(Snippet.embedding_model, Snippet.embedding_dim)
+        .order_by(func.count().desc())
+        .limit(1)
+    ).first()
+    model_id, dim, rows = top_model if top_model is not None else (None, None, 0)
+    if model_id is None or dim is None:
+        raise Skip("no embedded snippets")
+    rng = random.Random(0)
+    queries = [[rng.uniform(-1, 1) for _ in range(dim)] for _ in range(5 if quick else 20)]
+    texts = generate_texts(len(queries))
+    params = {"rows": rows, "queries": len(queries), "model": model_id, "dim": dim}
+    store = VectorStore()
+
+    def exact_top3() -> object:
+        # The statement VectorStore runs for snippet embeddings, cast and filtered like the model's ANN index
+        session.execute(vector_index.tune_statement(3))
+        return [session.execute(store._exact_statement(q, model_id, 3)).all() for q in queries]
+
+    def rag_top3() -> object:
+        # The RAG retrieval of AIService.generate_script_with_db (chunks, hybrid and quantized as configured)
+        return [store.search(session, q, model_id, limit=3, query_text=t) for q, t in zip(queries, texts, strict=True)]
+
+    yield "vector.exact_top3", params, exact_top3, len(queries)
+    yield "vector.rag_top3", params, rag_top3, len(queries)
+
+
+def startup_cases(quick: bool) -> Iterator[Case]:
+    for module in ("app.main", "app.initial_data"):
+        def import_module(module: str = module) -> object:
+            return import_time(module)
+
+        yield "startup.import", {"module": module}, import_module, 1
+
+
+# suite, names of its cases, case builder. The names let --filter skip a suite before it is built,
+# building one can load models or connect to databases.
+SUITES: list[tuple[str, tuple[str, ...], Callable[[bool], Iterator[Case]]]] = [
+    (
+        "analyzer",
+        (
+            "lexer.tokenize",
+            "analyzer.extract_functions",
+            "analyzer.find_matching_brace",
+            "analyzer.help_for_region",
+            "near_duplicates.signature",
+        ),
+        analyzer_cases,
+    ),
+    ("embedding", ("embedding.local_encode_single", "embedding.local_encode_batch"), embedding_cases),
+    ("vector", ("vector.exact_top3", "vector.rag_top3"), vector_cases),
+    ("startup", ("startup.import",), startup_cases),
+]
+
+
+def measure(func: Callable[[], object], repeat: int) -> list[float]:
+    func()  # Warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_suite(quick: bool = False, repeat: int = 5, name_filter: str | None = None) -> dict[str, Any]:
+    results: list[dict[str, Any]] = []
+    for suite, names, cases in SUITES:
+        if name_filter and not any(name_filter in name for name in names):
+            continue
+        try:
+            for name, params, func, items in cases(quick):
+                if name_filter and name_filter not in name:
+                    continue
+                timings = measure(func, repeat)
+                median = statistics.median(timings)
+                results.append({
+                    "name": name,
+                    "params": params,
+                    "runs": timings,
+                    "min": min(timings),
+                    "median": median,
+                    "mean": statistics.fmean(timings),
+                    "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+                    "items_per_second": items / median if median > 0 else None,
+                })
+        except Skip as e:
+            results.append({"name": suite, "skipped": str(e)})
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": quick,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def _key(result: dict[str, Any]) -> str:
+    return str(result["name"]) + json.dumps(result.get("params", {}), sort_keys=True)
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], threshold: float) -> list[dict[str, Any]]:
+    """
+    Compare medians of benchmarks present in both runs.
+    Returns one row per benchmark; rows slower than baseline by more than threshold are regressions.
+    """
+    previous = {_key(r): r for r in baseline["results"] if "median" in r}
+    rows = []
+    for result in current["results"]:
+        before = previous.get(_key(result))
+        if before is None or "median" not in result:
+            continue
+        change = result["median"] / before["median"] - 1 if before["median"] > 0 else 0.0
+        rows.append({
+            "name": result["name"],
+            "params": result["params"],
+            "baseline": before["median"],
+            "current": result["median"],
+            "change": change,
+            "regression": change > threshold,
+        })
+    return rows
+
+
+def _print_results(report: dict[str, Any]) -> None:
+    for r in report["results"]:
+        if "skipped" in r:
+            print(f"{r['name']:<32} skipped: {r['skipped']}")
+            continue
+        rate = f"{r['items_per_second']:>12.1f}/s" if r["items_per_second"] else ""
+        print(f"{r['name']:<32} {json.dumps(r['params']):<56} {r['median'] * 1000:>10.3f} ms {rate}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the ER-PSScripter micro-benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Small corpora, for smoke runs")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", dest="name_filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown before failing (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    # Never reach out to the Hugging Face hub from a benchmark run
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+    report = run_suite(args.quick, args.repeat, args.name_filter)
+    _print_results(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if not args.compare:
+        return 0
+    with open(args.compare, encoding="utf-8") as f:
+        rows = compare(json.load(f), report, args.threshold)
+    print()
+    for row in rows:
+        marker = "REGRESSION" if row["regression"] else ""
+        print(f"{row['name']:<32} {json.dumps(row['params']):<56} {row['change']:>+8.1%} {marker}")
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
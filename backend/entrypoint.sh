@@ -8,5 +8,10 @@ alembic upgrade head
 # Initialize data (create default superuser if needed)
 python -m app.initial_data
 
+# Optional shared local embedding model for all workers (see EMBEDDING_SIDECAR_SOCKET)
+if [ -n "$EMBEDDING_SIDECAR_SOCKET" ]; then
+    python -m app.embedding_sidecar &
+fi
+
 # Start app
 exec uvicorn app.main:app --host 0.0.0.0 --port 8000
@@ -0,0 +1,60 @@
+from collections.abc import Generator
+
+import pytest
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.db.base  # noqa: F401  Registers all models before mappers are configured
+from app.db.base_class import Base
+from app.services.embedding_cache import embedding_cache
+from app.services.memory_vector_index import memory_vector_index
+from app.services.settings_cache import settings_cache
+
+
+class FakeArray(list[list[float]]):
+    def tolist(self) -> list[list[float]]:
+        return [list(v) for v in self]
+
+
+class FakeLocalModel:
+    """Stands in for the local sentence-transformers model: [len(text), 1.0] per text."""
+
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def encode(self, texts: list[str], batch_size: int = 32) -> FakeArray:
+        self.calls.append(list(texts))
+        return FakeArray([float(len(t)), 1.0] for t in texts)
+
+
+@pytest.fixture
+def local_model() -> FakeLocalModel:
+    return FakeLocalModel()
+
+
+@pytest.fixture
+def engine() -> Generator[Engine, None, None]:
+    # One shared in-memory connection, services also query from worker threads
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    # Process-wide caches must not carry state from one database to the next
+    settings_cache.invalidate()
+    embedding_cache.reset_stats()
+    memory_vector_index.clear()
+    yield engine
+    settings_cache.invalidate()
+    memory_vector_index.clear()
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine: Engine) -> sessionmaker[Session]:
+    # Configured like SessionLocal
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+@pytest.fixture
+def db(session_factory: sessionmaker[Session]) -> Generator[Session, None, None]:
+    with session_factory() as session:
+        yield session
@@ -0,0 +1,70 @@
+import os
+from pathlib import Path
+
+from app.services.analysis_cache import AnalysisCache
+from app.services.script_analyzer import ScriptAnalyzerService
+
+
+def test_cache_hit_replays_snippets_for_new_filename() -> None:
+    service = ScriptAnalyzerService()
+    service.cache = AnalysisCache(max_entries=8)
+    content = 'Write-Host "cached"'
+
+    first = service.analyze_content(content, "a.ps1")
+    first[0].relative_path = "mutated/by/caller.ps1"
+    second = service.analyze_content(content, "b.ps1")
+
+    assert service.cache.stats()["misses"] == 1
+    assert service.cache.stats()["hits"] == 1
+    assert second[0].name == "b.ps1"
+    assert second[0].source == "b.ps1"
+    assert second[0].relative_path is None
+    assert second[0].content_hash == first[0].content_hash
+
+
+def test_split_flag_is_part_of_the_key() -> None:
+    service = ScriptAnalyzerService()
+    service.cache = AnalysisCache(max_entries=8)
+    content = "function A { 1 }\nfunction B { 2 }"
+
+    assert len(service.analyze_content(content, "f.ps1", split_functions=False)) == 1
+    assert len(service.analyze_content(content, "f.ps1", split_functions=True)) == 2
+
+
+def test_lru_eviction_and_disk_tier(tmp_path: Path) -> None:
+    cache = AnalysisCache(max_entries=1, cache_dir=str(tmp_path))
+    cache.put("aa-0", ("a.ps1", [{"name": "a.ps1", "content": "A"}]))
+    cache.put("bb-0", ("b.ps1", [{"name": "b.ps1", "content": "B"}]))
+    assert cache.stats()["entries"] == 1
+
+    # Evicted from memory, still on disk; a fresh process only has the disk tier
+    assert cache.get("aa-0") == ("a.ps1", [{"name": "a.ps1", "content": "A"}])
+    fresh = AnalysisCache(max_entries=1, cache_dir=str(tmp_path))
+    assert fresh.get("bb-0") is not None
+    assert fresh.get("cc-0") is None
+    assert fresh.stats()["disk_hits"] == 1
+    assert fresh.stats()["misses"] == 1
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = AnalysisCache(max_entries=0, cache_dir=str(tmp_path), max_disk_entries=2)
+    cache.put("aa-0", ("a.ps1", []))
+    cache.put("bb-0", ("b.ps1", []))
+    os.utime(tmp_path / "aa" / "aa-0.json", (0, 1))
+    os.utime(tmp_path / "bb" / "bb-0.json", (0, 2))
+    assert cache.get("aa-0") is not None  # Used again, bb-0 is now the oldest
+
+    cache.put("cc-0", ("c.ps1", []))
+
+    assert cache.stats()["disk_evicted"] == 1
+    assert sorted(p.name for p in tmp_path.glob("*/*.json")) == ["aa-0.json", "cc-0.json"]
+
+
+def test_disk_entries_of_another_version_are_misses(tmp_path: Path) -> None:
+    AnalysisCache(max_entries=0, cache_dir=str(tmp_path), version=1).put("aa-0", ("a.ps1", []))
+
+    upgraded = AnalysisCache(max_entries=0, cache_dir=str(tmp_path), version=2)
+
+    assert upgraded.get("aa-0") is None
+    assert upgraded.stats()["misses"] == 1
+    assert AnalysisCache(max_entries=0, cache_dir=str(tmp_path), version=1).get("aa-0") is not None
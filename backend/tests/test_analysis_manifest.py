@@ -0,0 +1,85 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models.analysis_manifest import AnalysisManifestEntry
+from app.services.analysis_manifest import AnalysisManifestService
+from app.services.script_analyzer import ANALYZER_VERSION
+
+
+def test_rescan_only_parses_changed_files(db: Session, tmp_path: Path) -> None:
+    service = AnalysisManifestService()
+    (tmp_path / "a.ps1").write_text('Write-Host "a"', encoding="utf-8")
+    (tmp_path / "b.ps1").write_text('Write-Host "b"', encoding="utf-8")
+
+    first = service.analyze_folder(db, str(tmp_path))
+    assert first.parsed_files == 2
+    assert first.cached_files == 0
+
+    second = service.analyze_folder(db, str(tmp_path))
+    assert second.parsed_files == 0
+    assert second.cached_files == 2
+    assert [s.content_hash for s in second.snippets] == [s.content_hash for s in first.snippets]
+
+    changed = tmp_path / "b.ps1"
+    changed.write_text('Write-Host "changed"', encoding="utf-8")
+    os.utime(changed, (0, 12345))
+    third = service.analyze_folder(db, str(tmp_path))
+    assert third.parsed_files == 1
+    assert third.cached_files == 1
+    assert any(s.content == 'Write-Host "changed"' for s in third.snippets)
+
+
+def test_touched_file_is_replayed_and_deletions_reported(db: Session, tmp_path: Path) -> None:
+    service = AnalysisManifestService()
+    (tmp_path / "keep.ps1").write_text("Get-Date", encoding="utf-8")
+    (tmp_path / "gone.ps1").write_text("Get-Item", encoding="utf-8")
+    service.analyze_folder(db, str(tmp_path))
+
+    os.utime(tmp_path / "keep.ps1", (0, 12345))
+    (tmp_path / "gone.ps1").unlink()
+    result = service.analyze_folder(db, str(tmp_path))
+
+    assert result.parsed_files == 0
+    assert result.cached_files == 1
+    assert result.deleted == [str(tmp_path / "gone.ps1")]
+    assert db.query(AnalysisManifestEntry).count() == 1
+
+
+def test_entries_of_another_analyzer_version_are_parsed_again(db: Session, tmp_path: Path) -> None:
+    service = AnalysisManifestService()
+    (tmp_path / "a.ps1").write_text("Get-Date", encoding="utf-8")
+    service.analyze_folder(db, str(tmp_path))
+    db.query(AnalysisManifestEntry).update({"analyzer_version": None})
+    db.commit()
+
+    result = service.analyze_folder(db, str(tmp_path))
+
+    assert result.parsed_files == 1
+    assert result.cached_files == 0
+    assert db.query(AnalysisManifestEntry).one().analyzer_version == ANALYZER_VERSION
+
+
+def test_unreadable_file_is_not_recorded(db: Session, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    service = AnalysisManifestService()
+    (tmp_path / "ok.ps1").write_text("Get-Date", encoding="utf-8")
+    (tmp_path / "bad.ps1").write_text("Get-Item", encoding="utf-8")
+    decode = service.analyzer.decode_stream
+
+    def failing_decode(stream: Any) -> str:
+        content = decode(stream)
+        if content == "Get-Item":
+            raise OSError("read failed")
+        return content
+
+    monkeypatch.setattr(service.analyzer, "decode_stream", failing_decode)
+    result = service.analyze_folder(db, str(tmp_path))
+
+    assert result.parsed_files == 2
+    assert [e.path for e in db.query(AnalysisManifestEntry)] == [str(tmp_path / "ok.ps1")]
+    entry = db.query(AnalysisManifestEntry).one()
+    assert entry.content_hash == hashlib.sha256(b"Get-Date").hexdigest()
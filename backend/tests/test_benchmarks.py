@@ -0,0 +1,30 @@
+import os
+
+from app.services.script_analyzer import ScriptAnalyzerService
+from benchmarks.corpus import generate_script
+from benchmarks.run import compare, run_suite
+
+
+def test_corpus_functions_are_all_found() -> None:
+    content = generate_script(functions=5, depth=3, seed=1)
+    snippets = ScriptAnalyzerService()._extract_functions(content, "bench.ps1", split_functions=True)
+    assert len(snippets) == 5
+    assert all(s.description for s in snippets)
+
+
+def test_suite_runs_offline_and_compares() -> None:
+    environ = dict(os.environ)
+    report = run_suite(quick=True, repeat=1, name_filter="analyzer.")
+    # Suites without a matching case are not even built (no model loads, no skip entries)
+    assert os.environ == environ
+    assert all("skipped" not in r for r in report["results"])
+    measured = [r for r in report["results"] if "median" in r]
+    assert {r["name"] for r in measured} == {
+        "analyzer.extract_functions",
+        "analyzer.find_matching_brace",
+        "analyzer.help_for_region",
+    }
+
+    rows = compare(report, report, threshold=0.1)
+    assert len(rows) == len(measured)
+    assert not any(row["regression"] for row in rows)
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+def test_concurrent_calls_share_one_encode() -> None:
+    calls: list[list[str]] = []
+    threads: set[str] = set()
+
+    def encode(texts: list[str]) -> list[list[float]]:
+        calls.append(texts)
+        threads.add(threading.current_thread().name)
+        return [[float(len(t))] for t in texts]
+
+    batcher = EmbeddingBatcher(encode, max_batch_size=64, max_wait_ms=50)
+
+    async def run() -> list[list[list[float]]]:
+        return await asyncio.gather(
+            batcher.embed(["a"]), batcher.embed(["bb", "ccc"]), batcher.embed(["dddd"])
+        )
+
+    results = asyncio.run(run())
+    batcher.close()
+
+    assert calls == [["a", "bb", "ccc", "dddd"]]
+    assert results == [[[1.0]], [[2.0], [3.0]], [[4.0]]]
+    assert threads and all(name.startswith("embedding") for name in threads)
+
+
+def test_batches_are_cut_at_max_size() -> None:
+    calls: list[list[str]] = []
+
+    def encode(texts: list[str]) -> list[list[float]]:
+        calls.append(texts)
+        return [[0.0] for _ in texts]
+
+    batcher = EmbeddingBatcher(encode, max_batch_size=2, max_wait_ms=50)
+
+    async def run() -> None:
+        await asyncio.gather(*(batcher.embed([str(i)]) for i in range(5)))
+
+    asyncio.run(run())
+    batcher.close()
+
+    assert [len(c) for c in calls] == [2, 2, 1]
+
+
+def test_encode_errors_reach_every_caller() -> None:
+    def encode(texts: list[str]) -> list[list[float]]:
+        raise RuntimeError("model missing")
+
+    batcher = EmbeddingBatcher(encode, max_batch_size=8, max_wait_ms=10)
+
+    async def run() -> list[object]:
+        return await asyncio.gather(batcher.embed(["a"]), batcher.embed(["b"]), return_exceptions=True)
+
+    results = asyncio.run(run())
+    batcher.close()
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    with pytest.raises(RuntimeError):
+        asyncio.run(batcher.embed(["c"]))
+    batcher.close()
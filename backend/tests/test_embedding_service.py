@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+from conftest import FakeLocalModel
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.embedding_cache import EmbeddingCacheEntry
+from app.models.setting import SystemSetting
+from app.models.snippet import Snippet
+from app.services.embedding_cache import embedding_cache
+from app.services.embedding_service import EmbeddingService
+
+
+@pytest.fixture
+def db(db: Session) -> Session:
+    db.add(SystemSetting(key="EMBEDDING_PROVIDER", value="local_builtin"))
+    db.commit()
+    return db
+
+
+def test_local_provider_encodes_in_one_batch(db: Session, local_model: FakeLocalModel) -> None:
+    service = EmbeddingService()
+    service._local_model = local_model
+
+    vectors = asyncio.run(service.generate_embeddings(["a", "bbb"], db))
+
+    assert local_model.calls == [["a", "bbb"]]
+    # Stored at the model's native dimension, no zero padding
+    assert vectors == [[1.0, 1.0], [3.0, 1.0]]
+
+
+def test_batches_respect_count_and_size_limits(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_SIZE", 3)
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_MAX_CHARS", 10)
+    texts = ["x" * 4, "x" * 4, "x" * 4, "x", "x", "x", "x", "x" * 20]
+
+    batches = list(EmbeddingService()._batches(texts))
+
+    assert [len(b) for b in batches] == [2, 3, 2, 1]
+    assert [t for b in batches for t in b] == texts
+
+
+def test_cached_texts_are_not_embedded_again(db: Session, local_model: FakeLocalModel) -> None:
+    service = EmbeddingService()
+    service._local_model = local_model
+
+    first = asyncio.run(service.generate_embeddings(["a", "bbb", "a"], db))
+    second = asyncio.run(service.generate_embeddings(["bbb", "cc"], db))
+
+    # Duplicates within a call are embedded once, cached texts are not embedded again
+    assert local_model.calls == [["a", "bbb"], ["cc"]]
+    assert first[0] == first[2] and first[0] is not first[2]
+    assert second[0] == first[1]
+    stats = embedding_cache.stats(db)
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 4, 3)
+
+
+def test_cache_evicts_least_recently_used(
+    db: Session, local_model: FakeLocalModel, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_MAX_ENTRIES", 2)
+    service = EmbeddingService()
+    service._local_model = local_model
+
+    for text in ["a", "b", "c"]:
+        asyncio.run(service.generate_embeddings([text], db))
+
+    assert {row.text_hash for row in db.query(EmbeddingCacheEntry)} == {
+        embedding_cache.text_hash("b"), embedding_cache.text_hash("c")
+    }
+    assert embedding_cache.stats(db)["evicted"] == 1
+
+
+def test_cache_eviction_keeps_rows_written_together(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_MAX_ENTRIES", 2)
+
+    # One write, all rows share their last_used_at
+    embedding_cache.put_many(db, "local", "model", 2, {"a": [1.0, 0.0], "b": [0.0, 1.0], "c": [1.0, 1.0]})
+
+    assert embedding_cache.count(db) == 2
+    assert embedding_cache.stats(db)["evicted"] == 1
+
+
+def test_index_snippets_records_the_model(db: Session, local_model: FakeLocalModel) -> None:
+    service = EmbeddingService()
+    service._local_model = local_model
+    snippet = Snippet(name="Get-Thing", description=None, content="Get-Item")
+
+    asyncio.run(service.index_snippets([snippet], db))
+
+    assert snippet.embedding == [19.0, 1.0]
+    assert snippet.embedding_model == "local_builtin/all-MiniLM-L6-v2"
+    assert snippet.embedding_dim == 2
+    assert snippet.embedding_bits == "11"
+    assert service.active_model(db).dimension == 384
+
+
+def test_index_snippets_embeds_chunks_of_long_snippets(
+    db: Session, local_model: FakeLocalModel, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Longer than the limit, each function fits
+    monkeypatch.setattr(settings, "EMBEDDING_CHUNK_MAX_CHARS", 30)
+    service = EmbeddingService()
+    service._local_model = local_model
+    content = "function Get-A { 'a' }\n\nfunction Get-B { 'b' }\n"
+    snippet = Snippet(name="Tools", description=None, content=content)
+
+    asyncio.run(service.index_snippets([snippet], db))
+
+    assert [c.name for c in snippet.chunks] == ["Get-A", "Get-B"]
+    assert [c.position for c in snippet.chunks] == [0, 1]
+    assert all(c.embedding_model == "local_builtin/all-MiniLM-L6-v2" for c in snippet.chunks)
+    assert len(local_model.calls) == 1  # Snippet and chunks in one batch
+
+
+def test_onnx_backend_is_a_separate_model(
+    db: Session, local_model: FakeLocalModel, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    service = EmbeddingService()
+    service._local_model = local_model
+    asyncio.run(service.embed_texts(["Get-Item"], db))
+
+    monkeypatch.setattr(settings, "EMBEDDING_LOCAL_BACKEND", "onnx")
+    _, onnx_model = asyncio.run(service.embed_texts(["Get-Item"], db))
+
+    # Quantized vectors are neither compared with nor served from the cache of the torch ones
+    assert onnx_model.id == "local_builtin/all-MiniLM-L6-v2@onnx:onnx/model_quantized.onnx"
+    assert local_model.calls == [["Get-Item"], ["Get-Item"]]
+
+
+def test_warm_up_loads_the_model_and_reports_latency(
+    local_model: FakeLocalModel, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    service = EmbeddingService()
+    monkeypatch.setattr(service, "_get_local_model", lambda: local_model)
+
+    asyncio.run(service.warm_up())
+    service.shutdown()
+
+    stats = service.local_stats()
+    assert len(local_model.calls) == 1
+    assert stats["encodes"] == 1 and stats["texts"] == 1
+    assert stats["warmup_ms"] is not None and stats["last_encode_ms"] is not None
+    assert stats["backend"] == settings.EMBEDDING_LOCAL_BACKEND
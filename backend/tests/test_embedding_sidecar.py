@@ -0,0 +1,88 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Generator
+
+import pytest
+from conftest import FakeLocalModel
+
+from app.core.config import settings
+from app.services.embedding_service import EmbeddingService
+from app.services.embedding_sidecar import EmbeddingSidecarClient, serve
+
+
+def fake_encode(texts: list[str]) -> list[list[float]]:
+    return [[float(len(t)), 0.5, -1.0] for t in texts]
+
+
+@pytest.fixture
+def sidecar() -> Generator[str, None, None]:
+    # Unix socket paths are limited to ~100 characters, pytest's tmp_path can be longer
+    socket_path = os.path.join(tempfile.mkdtemp(), "embed.sock")
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(serve(socket_path, fake_encode, max_batch_size=16, max_wait_ms=5))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    for _ in range(200):
+        if os.path.exists(socket_path):
+            break
+        time.sleep(0.01)
+    yield socket_path
+    loop.call_soon_threadsafe(task.cancel)
+    time.sleep(0.05)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+
+
+def test_client_round_trip(sidecar: str) -> None:
+    client = EmbeddingSidecarClient(sidecar, timeout=5)
+
+    assert client.encode(["a", "abc"]) == [[1.0, 0.5, -1.0], [3.0, 0.5, -1.0]]
+
+
+def test_service_uses_sidecar(sidecar: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "EMBEDDING_SIDECAR_SOCKET", sidecar)
+    service = EmbeddingService()
+
+    vectors = service._encode_local(["abcd"])
+
+    assert service._local_model is None
+    assert vectors == [[4.0, 0.5, -1.0]]
+
+
+def test_service_falls_back_without_sidecar(local_model: FakeLocalModel, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "EMBEDDING_SIDECAR_SOCKET", os.path.join(tempfile.mkdtemp(), "missing.sock"))
+    service = EmbeddingService()
+    service._local_model = local_model
+
+    assert service._encode_local(["x"]) == [[1.0, 1.0]]
+    assert service._sidecar_available is False
+
+
+def test_sidecar_timeout_does_not_load_the_model(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "EMBEDDING_SIDECAR_SOCKET", "/unused.sock")
+    service = EmbeddingService()
+
+    def timeout(texts: list[str]) -> list[list[float]]:
+        raise TimeoutError("timed out")
+
+    service._sidecar = EmbeddingSidecarClient("/unused.sock", timeout=1)
+    monkeypatch.setattr(service._sidecar, "encode", timeout)
+
+    with pytest.raises(RuntimeError, match="did not answer"):
+        service._encode_local(["x"])
+    assert service._local_model is None
+
+
+def test_warm_up_waits_for_the_sidecar_instead_of_loading(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "EMBEDDING_SIDECAR_SOCKET", os.path.join(tempfile.mkdtemp(), "missing.sock"))
+    monkeypatch.setattr(settings, "EMBEDDING_SIDECAR_TIMEOUT", 0.3)
+    service = EmbeddingService()
+
+    asyncio.run(service.warm_up())
+
+    assert service._local_model is None
+    assert service.local_stats()["warmup_ms"] is None
+    service.shutdown()
@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+from benchmarks.run import import_time
+
+# Seconds for a cold import, generous for slow CI machines; the heavy module check is the strict part
+BUDGET = float(os.environ.get("IMPORT_TIME_BUDGET", "5"))
+
+
+@pytest.mark.parametrize("module", ["app.main", "app.initial_data", "app.db.base", "app.embedding_sidecar"])
+def test_import_stays_within_budget(module: str) -> None:
+    seconds, heavy = import_time(module)
+
+    assert heavy == [], f"{module} imports {heavy} eagerly"
+    assert seconds < BUDGET, f"Importing {module} took {seconds:.2f}s (budget {BUDGET}s)"
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.llm_clients import LLMClientRegistry
+
+
+def test_clients_are_reused_per_config() -> None:
+    registry = LLMClientRegistry()
+
+    first = registry.openai(api_key="sk-1", base_url=None)
+    assert registry.openai(api_key="sk-1", base_url=None) is first
+    assert registry.openai(api_key="sk-2", base_url=None) is not first
+    assert registry.azure(api_key="sk-1", api_version="2024-02-15-preview", azure_endpoint="https://a") is not first
+    assert registry.created == 3
+
+    asyncio.run(registry.aclose())
+    assert first.is_closed()
+
+
+def test_pool_settings_are_applied(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "LLM_HTTP_CONNECT_TIMEOUT", 1.5)
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 5)
+    registry = LLMClientRegistry()
+
+    client = registry.openai(api_key="sk-1")
+
+    assert client.max_retries == 5
+    assert client.timeout.connect == 1.5
+    asyncio.run(registry.aclose())
+
+
+def test_least_recently_used_clients_are_evicted(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "LLM_CLIENT_CACHE_SIZE", 2)
+    monkeypatch.setattr(settings, "LLM_HTTP_TIMEOUT", 0.0)
+    registry = LLMClientRegistry()
+
+    async def run() -> None:
+        first = registry.openai(api_key="sk-1")
+        registry.openai(api_key="sk-2")
+        registry.openai(api_key="sk-1")
+        registry.openai(api_key="sk-3")  # Evicts sk-2
+        assert registry.openai(api_key="sk-1") is first
+        await asyncio.sleep(0.01)
+        assert registry.created == 3
+        await registry.aclose()
+
+    asyncio.run(run())
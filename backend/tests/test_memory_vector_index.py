@@ -0,0 +1,83 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.snippet import Snippet
+from app.models.snippet_chunk import SnippetChunk
+from app.services.memory_vector_index import MemoryVectorIndex, memory_vector_index
+from app.services.vector_store import VectorStore
+
+np = pytest.importorskip("numpy")
+
+MODEL = "local_builtin/all-MiniLM-L6-v2"
+
+
+def _snippet(name: str, embedding: list[float]) -> Snippet:
+    return Snippet(name=name, content=name, embedding=embedding, embedding_model=MODEL, embedding_dim=len(embedding))
+
+
+def test_sqlite_search_uses_the_in_memory_index(db: Session) -> None:
+    db.add_all([_snippet("east", [1.0, 0.0]), _snippet("north", [0.0, 1.0]), _snippet("north-east", [1.0, 1.0])])
+    db.commit()
+
+    found = VectorStore().search(db, [0.9, 0.1], MODEL, limit=2)
+
+    assert [s.name for s in found] == ["east", "north-east"]
+
+
+def test_committed_writes_update_the_index(db: Session) -> None:
+    east, north = _snippet("east", [1.0, 0.0]), _snippet("north", [0.0, 1.0])
+    db.add_all([east, north])
+    db.commit()
+    assert [i for i, _ in memory_vector_index.search(db, [-1.0, 0.0], MODEL, 1)] == [north.id]
+
+    west = _snippet("west", [-1.0, 0.0])
+    db.add(west)
+    db.commit()
+    assert [i for i, _ in memory_vector_index.search(db, [-1.0, 0.0], MODEL, 1)] == [west.id]
+
+    # A chunk counts for its snippet, rolled back writes never reach the index
+    east.chunks = [SnippetChunk(position=0, start=0, end=4, embedding=[-1.0, 0.1], embedding_model=MODEL)]
+    db.commit()
+    db.add(_snippet("rolled back", [-1.0, 0.0]))
+    db.flush()
+    db.rollback()
+    db.delete(west)
+    db.commit()
+    hits = memory_vector_index.search(db, [-1.0, 0.0], MODEL, 5)
+    assert [i for i, _ in hits] == [east.id, north.id]
+    assert hits[0][1] == pytest.approx(1 - 1 / np.sqrt(1.01), abs=1e-6)  # float32
+
+
+
+def test_deleting_a_snippet_deletes_its_chunks(db: Session) -> None:
+    # SQLite does not enforce ON DELETE CASCADE here, the ORM has to remove them
+    snippet = _snippet("long", [1.0, 0.0])
+    snippet.chunks = [SnippetChunk(position=0, start=0, end=4, embedding=[1.0, 0.0], embedding_model=MODEL)]
+    db.add(snippet)
+    db.commit()
+
+    db.delete(snippet)
+    db.commit()
+
+    assert db.query(SnippetChunk).count() == 0
+
+def test_saved_index_is_memory_mapped_until_snippets_change(
+    db: Session, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "VECTOR_MEMORY_INDEX_DIR", str(tmp_path))
+    db.add_all([_snippet("east", [1.0, 0.0]), _snippet("north", [0.0, 1.0])])
+    db.commit()
+    memory_vector_index.search(db, [1.0, 0.0], MODEL, 1)  # Builds and saves
+
+    restarted = MemoryVectorIndex()
+    restarted.search(db, [1.0, 0.0], MODEL, 1)
+    assert isinstance(restarted._matrices[(MODEL, 2)].matrix, np.memmap)
+
+    db.add(_snippet("west", [-1.0, 0.0]))
+    db.commit()
+    stale = MemoryVectorIndex()
+    assert len(stale.search(db, [1.0, 0.0], MODEL, 5)) == 3
+    assert not isinstance(stale._matrices[(MODEL, 2)].matrix, np.memmap)
@@ -0,0 +1,44 @@
+from app.services.near_duplicates import near_duplicate_index
+
+ORIGINAL = """
+function Get-DiskReport {
+    # Collect free space per drive
+    $drives = Get-PSDrive -PSProvider FileSystem
+    foreach ($drive in $drives) {
+        $free = [math]::Round($drive.Free / 1GB, 2)
+        Write-Output "$($drive.Name): $free GB free"
+    }
+}
+"""
+
+RENAMED = """
+function Get-DiskReport {
+    <# Report free space #>
+    $volumes = Get-PSDrive -PSProvider FileSystem
+    foreach ($vol in $volumes) {
+        $freeGb = [math]::Round($vol.Free / 1GB, 2)
+        Write-Output "$($vol.Name): $freeGb GB free"
+    }
+}
+"""
+
+UNRELATED = """
+Invoke-RestMethod -Uri "https://example.org/api" -Method Post -Body (@{ name = "x" } | ConvertTo-Json)
+"""
+
+
+def test_normalization_ignores_comments_case_and_variable_names() -> None:
+    assert near_duplicate_index.normalize_tokens(ORIGINAL) == near_duplicate_index.normalize_tokens(RENAMED)
+
+
+def test_signature_similarity() -> None:
+    original = near_duplicate_index.signature(ORIGINAL)
+    assert near_duplicate_index.similarity(original, near_duplicate_index.signature(RENAMED.upper())) == 1.0
+    assert near_duplicate_index.similarity(original, near_duplicate_index.signature(UNRELATED)) < 0.2
+
+
+def test_identical_signatures_share_every_bucket() -> None:
+    a = near_duplicate_index.buckets(near_duplicate_index.signature(ORIGINAL))
+    b = near_duplicate_index.buckets(near_duplicate_index.signature(RENAMED))
+    assert len(a) == 16
+    assert a == b
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.services.onnx_embedder import OnnxEmbedder, mean_pool_normalize
+
+np = pytest.importorskip("numpy")
+
+
+class FakeTokenizer:
+    def encode_batch(self, texts: list[str]) -> list[SimpleNamespace]:
+        # One token per character, padded to the longest text
+        width = max(len(t) for t in texts)
+        return [
+            SimpleNamespace(
+                ids=[1] * len(t) + [0] * (width - len(t)),
+                attention_mask=[1] * len(t) + [0] * (width - len(t)),
+                type_ids=[0] * width,
+            )
+            for t in texts
+        ]
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.batches: list[int] = []
+
+    def run(self, outputs: Any, feeds: dict[str, Any]) -> list[Any]:
+        assert set(feeds) == {"input_ids", "attention_mask"}  # Only inputs the model declares
+        ids = feeds["input_ids"]
+        self.batches.append(ids.shape[0])
+        # Token embedding [1, n] where n is the text length, padding tokens get garbage
+        lengths = feeds["attention_mask"].sum(axis=1, keepdims=True)
+        hidden = np.stack([np.ones_like(ids), np.repeat(lengths, ids.shape[1], axis=1)], axis=-1).astype(np.float32)
+        hidden[feeds["attention_mask"] == 0] = 100.0
+        return [hidden]
+
+
+def test_mean_pool_ignores_padding_and_normalizes() -> None:
+    hidden = np.array([[[3.0, 4.0], [100.0, 100.0]]], dtype=np.float32)
+    mask = np.array([[1, 0]])
+
+    assert mean_pool_normalize(hidden, mask).tolist() == [[pytest.approx(0.6), pytest.approx(0.8)]]
+
+
+def test_encode_keeps_input_order_across_batches() -> None:
+    embedder = OnnxEmbedder.__new__(OnnxEmbedder)
+    embedder._tokenizer = FakeTokenizer()
+    embedder._session = session = FakeSession()
+    embedder._inputs = {"input_ids", "attention_mask"}
+    texts = ["ab", "abcdef", "a", "abc"]
+
+    vectors = embedder.encode(texts, batch_size=2)
+
+    assert session.batches == [2, 2]
+    for text, vector in zip(texts, vectors.tolist(), strict=True):
+        expected = np.array([1.0, len(text)]) / np.linalg.norm([1.0, len(text)])
+        assert vector == pytest.approx(expected.tolist())
@@ -0,0 +1,99 @@
+import asyncio
+import datetime
+
+import pytest
+from conftest import FakeLocalModel
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.models.reindex_job import ReindexJob
+from app.models.setting import SystemSetting
+from app.models.snippet import Snippet
+from app.services.embedding_service import embedding_service
+from app.services.reindex import reindex_service
+
+LOCAL_MODEL_ID = "local_builtin/all-MiniLM-L6-v2"
+
+
+@pytest.fixture
+def session_factory(
+    session_factory: sessionmaker[Session], local_model: FakeLocalModel, monkeypatch: pytest.MonkeyPatch
+) -> sessionmaker[Session]:
+    with session_factory() as db:
+        db.add(SystemSetting(key="EMBEDDING_PROVIDER", value="local_builtin"))
+        db.add_all(Snippet(name=f"s{i}", content=f"Write-Host {i}") for i in range(1, 6))
+        db.add(Snippet(name="done", content="Get-Date", embedding=[1.0, 1.0], embedding_model=LOCAL_MODEL_ID))
+        db.commit()
+    monkeypatch.setattr(embedding_service, "_local_model", local_model)
+    monkeypatch.setattr(settings, "REINDEX_CHUNK_SIZE", 2)
+    monkeypatch.setattr(settings, "REINDEX_BATCH_SIZE", 1)
+    return session_factory
+
+
+def test_job_embeds_stale_snippets_in_chunks(session_factory: sessionmaker[Session]) -> None:
+    async def run() -> int:
+        with session_factory() as db:
+            job = reindex_service.start(db, session_factory)
+            await reindex_service._tasks[job.id]
+            return int(job.id)
+
+    job_id = asyncio.run(run())
+
+    with session_factory() as db:
+        job = db.get(ReindexJob, job_id)
+        assert job is not None
+        assert (job.status, job.total, job.processed, job.failed) == ("completed", 5, 5, 0)
+        assert job.last_snippet_id == 5
+        assert {s.embedding_model for s in db.query(Snippet)} == {LOCAL_MODEL_ID}
+        progress = reindex_service.progress(job)
+        assert progress["percent"] == 100.0 and progress["eta_seconds"] is None
+
+
+def test_interrupted_job_resumes_after_its_cursor(session_factory: sessionmaker[Session]) -> None:
+    with session_factory() as db:
+        stale = datetime.datetime.utcnow() - datetime.timedelta(seconds=settings.REINDEX_STALE_SECONDS + 1)
+        job = ReindexJob(status="running", model_id=LOCAL_MODEL_ID, total=5, processed=2, last_snippet_id=2,
+                         heartbeat_at=stale)
+        db.add(job)
+        db.commit()
+        job_id = int(job.id)
+
+    async def run() -> list[int]:
+        resumed = reindex_service.resume_interrupted(session_factory)
+        # A second worker must not pick up the same job
+        assert reindex_service.resume_interrupted(session_factory) == []
+        await asyncio.gather(*reindex_service._tasks.values())
+        return resumed
+
+    assert asyncio.run(run()) == [job_id]
+
+    with session_factory() as db:
+        job = db.get(ReindexJob, job_id)
+        assert job is not None
+        assert (job.status, job.processed) == ("completed", 5)
+        embedded = {s.id for s in db.query(Snippet).filter(Snippet.embedding.is_not(None))}
+        assert embedded == {3, 4, 5, 6}
+
+
+def test_heartbeat_is_written_per_batch(
+    session_factory: sessionmaker[Session], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    heartbeats: list[int] = []
+    heartbeat = reindex_service._heartbeat
+
+    def record(db: Session, job_id: int) -> None:
+        heartbeats.append(job_id)
+        heartbeat(db, job_id)
+
+    monkeypatch.setattr(reindex_service, "_heartbeat", record)
+
+    async def run() -> int:
+        with session_factory() as db:
+            job = reindex_service.start(db, session_factory)
+            await reindex_service._tasks[job.id]
+            return int(job.id)
+
+    job_id = asyncio.run(run())
+
+    # Five stale snippets in batches of one
+    assert heartbeats == [job_id] * 5
@@ -1,3 +1,7 @@
+import codecs
+import io
+from pathlib import Path
+
 from app.services.script_analyzer import ScriptAnalyzerService
 
 
@@ -62,3 +66,85 @@ def test_multiple_functions() -> None:
     assert len(snippets) == 2
     assert snippets[0].name == "Func-A"
     assert snippets[1].name == "Func-B"
+
+def test_braces_in_here_strings_and_comments_are_ignored() -> None:
+    service = ScriptAnalyzerService()
+    content = """
+# function Fake-Comment { 
+$template = @"
+function Fake-HereString {
+"@
+function Get-Real {
+    $s = 'single } quote'
+    <# } #>
+    Write-Host "brace } in string"
+}
+    """
+    snippets = service._extract_functions(content, "lexer.ps1", split_functions=True)
+    assert len(snippets) == 1
+    assert snippets[0].name == "Get-Real"
+    assert snippets[0].content.endswith('"brace } in string"\n}')
+
+def test_nested_functions_are_ordered_by_start() -> None:
+    service = ScriptAnalyzerService()
+    content = """
+function Outer-Func {
+    function Inner-Func { "inner" }
+    Inner-Func
+}
+    """
+    snippets = service._extract_functions(content, "nested.ps1", split_functions=True)
+    assert [s.name for s in snippets] == ["Outer-Func", "Inner-Func"]
+
+def test_find_matching_brace_skips_strings() -> None:
+    service = ScriptAnalyzerService()
+    content = "{ '}' \"}\" { } }"
+    assert service._find_matching_brace(content, 0) == len(content) - 1
+    assert service._find_matching_brace(content, 1) == -1
+
+def test_script_help_for_whole_file() -> None:
+    service = ScriptAnalyzerService()
+    content = """<#
+.SYNOPSIS
+    Cleans temp files.
+#>
+Remove-Item $env:TEMP\\* -Recurse
+"""
+    snippets = service.analyze_content(content, "cleanup.ps1")
+    assert len(snippets) == 1
+    assert snippets[0].description == "Cleans temp files."
+
+def test_leading_function_help_is_not_script_help() -> None:
+    service = ScriptAnalyzerService()
+    content = """<#
+.SYNOPSIS
+    Gets a thing.
+#>
+function Get-Thing { 1 }
+Get-Thing
+"""
+    snippets = service.analyze_content(content, "thing.ps1")
+    assert len(snippets) == 1
+    assert snippets[0].description is None
+    functions = service._extract_functions(content, "thing.ps1", split_functions=True)
+    assert functions[0].description == "Gets a thing."
+
+def test_analyze_folder_parallel_matches_serial(tmp_path: Path) -> None:
+    service = ScriptAnalyzerService()
+    for i in range(5):
+        sub = tmp_path / f"dir{i % 2}"
+        sub.mkdir(exist_ok=True)
+        (sub / f"script{i}.ps1").write_text(f'Write-Host "{i}"', encoding="utf-8")
+    (tmp_path / "notes.txt").write_text("ignored", encoding="utf-8")
+
+    serial = service.analyze_folder(str(tmp_path), workers=1)
+    parallel = service.analyze_folder(str(tmp_path), workers=2, chunk_size=2)
+    assert len(serial) == 5
+    assert [s.content_hash for s in parallel] == [s.content_hash for s in serial]
+
+def test_decode_stream_detects_bom_and_falls_back_to_latin1() -> None:
+    service = ScriptAnalyzerService()
+    text = 'Write-Host "Grüße"'
+    assert service.decode_stream(io.BytesIO(codecs.BOM_UTF8 + text.encode("utf-8"))) == text
+    assert service.decode_stream(io.BytesIO(codecs.BOM_UTF16_LE + text.encode("utf-16-le"))) == text
+    assert service.decode_stream(io.BytesIO(text.encode("latin-1"))) == text
@@ -0,0 +1,68 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.api.v1.endpoints.settings import DEFAULT_KEYS, _ensure_defaults
+from app.models.setting import SystemSetting
+from app.services.settings_cache import settings_cache
+
+
+def count_statements(db: Session) -> list[str]:
+    statements: list[str] = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_settings_are_loaded_once_until_invalidated(db: Session) -> None:
+    db.add(SystemSetting(key="LLM_PROVIDER", value="openai"))
+    db.commit()
+
+    assert settings_cache.get(db).llm_provider == "openai"
+    db.query(SystemSetting).filter(SystemSetting.key == "LLM_PROVIDER").update({"value": "azure"})
+    db.commit()
+    statements = count_statements(db)
+
+    assert settings_cache.get(db).llm_provider == "openai"
+    assert statements == []
+
+    settings_cache.invalidate()
+    assert settings_cache.get(db).llm_provider == "azure"
+    assert len(statements) == 1
+
+
+def test_ensure_defaults_is_one_insert_that_keeps_values(db: Session) -> None:
+    db.add(SystemSetting(key="OPENAI_MODEL", value="gpt-4o-mini"))
+    db.commit()
+    statements = count_statements(db)
+
+    _ensure_defaults(db)
+
+    inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT")]
+    assert len(inserts) == 1
+    values = {s.key: s for s in db.query(SystemSetting)}
+    assert values.keys() == DEFAULT_KEYS.keys()
+    assert values["OPENAI_MODEL"].value == "gpt-4o-mini"
+    assert values["OPENAI_API_KEY"].is_secret
+
+    # Afterwards the defaults are only checked against the (reloaded) cache
+    statements.clear()
+    _ensure_defaults(db)
+    _ensure_defaults(db)
+    assert len(statements) == 1 and statements[0].lstrip().startswith("SELECT")
+
+
+def test_snapshot_exposes_the_client_settings(db: Session) -> None:
+    db.add_all(
+        [
+            SystemSetting(key="LLM_PROVIDER", value="azure"),
+            SystemSetting(key="AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", value="embed"),
+            SystemSetting(key="CUSTOM_CATEGORIES", value="[]"),
+        ]
+    )
+    db.commit()
+
+    config = settings_cache.get(db)
+
+    assert config.llm_provider == "azure"
+    assert config.azure_openai_embedding_deployment_name == "embed"
+    assert config.openai_api_key is None
+    assert config.keys == {"LLM_PROVIDER", "AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", "CUSTOM_CATEGORIES"}
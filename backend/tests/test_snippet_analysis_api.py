@@ -0,0 +1,170 @@
+import codecs
+import io
+import json
+import tarfile
+import zipfile
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api import deps
+from app.api.v1.endpoints import snippets
+from app.core.config import settings
+
+
+@pytest.fixture
+def client(session_factory: sessionmaker[Session]) -> Generator[TestClient, None, None]:
+    def get_db() -> Generator[Session, None, None]:
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(snippets.router, prefix="/snippets")
+    app.dependency_overrides[deps.get_db] = get_db
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_analyze_stream_ndjson(client: TestClient, tmp_path: Path) -> None:
+    for i in range(3):
+        (tmp_path / f"s{i}.ps1").write_text(f"Write-Host {i}", encoding="utf-8")
+
+    response = client.post(
+        "/snippets/analyze/stream", params={"folder_path": str(tmp_path), "progress_every": 2}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    frames = [json.loads(line) for line in response.text.splitlines()]
+    assert [f["type"] for f in frames].count("result") == 3
+    assert [f["type"] for f in frames].count("progress") == 1
+    assert frames[-1] == {"type": "done", "data": {"files_scanned": 3, "snippets_found": 3}}
+
+
+def test_analyze_stream_sse(client: TestClient, tmp_path: Path) -> None:
+    (tmp_path / "only.ps1").write_text("Get-Date", encoding="utf-8")
+
+    response = client.post("/snippets/analyze/stream", params={"folder_path": str(tmp_path), "format": "sse"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block for block in response.text.split("\n\n") if block]
+    assert events[0].startswith("event: result\ndata: ")
+    assert events[-1].startswith("event: done\n")
+
+
+def test_analyze_upload_decodes_and_parses(client: TestClient) -> None:
+    files = [
+        ("files", ("utf16.ps1", codecs.BOM_UTF16_LE + "Get-Date".encode("utf-16-le"))),
+        ("files", ("ansi.ps1", 'Write-Host "Grüße"'.encode("cp1252"))),
+        ("files", ("readme.txt", b"ignored")),
+    ]
+    response = client.post("/snippets/analyze/upload", files=files)
+    assert response.status_code == 200
+    assert [r["content"] for r in response.json()] == ["Get-Date", 'Write-Host "Grüße"']
+
+
+def test_analyze_upload_rejects_oversized_file(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "ANALYZER_UPLOAD_MAX_FILE_BYTES", 16)
+    files = [("files", ("big.ps1", b"Write-Host " + b"x" * 32))]
+    response = client.post("/snippets/analyze/upload", files=files)
+    assert response.status_code == 413
+
+
+def test_analyze_archive_zip_and_tar(client: TestClient) -> None:
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as archive:
+        archive.writestr("tools/Get-Thing.ps1", "function Get-Thing { 1 }")
+        archive.writestr("docs/readme.md", "ignored")
+    response = client.post(
+        "/snippets/analyze/archive",
+        params={"split_functions": True},
+        files={"file": ("repo.zip", zip_buffer.getvalue())},
+    )
+    assert response.status_code == 200
+    assert [(r["name"], r["relative_path"]) for r in response.json()] == [("Get-Thing", "tools/Get-Thing.ps1")]
+
+    tar_buffer = io.BytesIO()
+    with tarfile.open(fileobj=tar_buffer, mode="w:gz") as archive:
+        data = b"Get-Date"
+        info = tarfile.TarInfo("./scripts/date.ps1")
+        info.size = len(data)
+        archive.addfile(info, io.BytesIO(data))
+    response = client.post("/snippets/analyze/archive", files={"file": ("repo.tar.gz", tar_buffer.getvalue())})
+    assert response.status_code == 200
+    assert [r["relative_path"] for r in response.json()] == ["scripts/date.ps1"]
+
+
+def test_analyze_archive_rejects_other_files(client: TestClient) -> None:
+    response = client.post("/snippets/analyze/archive", files={"file": ("notes.txt", b"not an archive")})
+    assert response.status_code == 400
+
+
+def test_analyze_archive_rejects_corrupt_zip(client: TestClient) -> None:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        archive.writestr("bad.ps1", "Write-Host 'intact'")
+    # Same length, different bytes: only the CRC check while reading the member notices
+    data = buffer.getvalue().replace(b"intact", b"broken")
+
+    response = client.post("/snippets/analyze/archive", files={"file": ("bad.zip", data)})
+    assert response.status_code == 400
+
+
+def test_analyze_archive_rejects_truncated_tar(client: TestClient) -> None:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        data = "\n".join(f"Write-Host {i} {i * 7919 % 104729}" for i in range(5000)).encode()
+        info = tarfile.TarInfo("big.ps1")
+        info.size = len(data)
+        archive.addfile(info, io.BytesIO(data))
+    truncated = buffer.getvalue()[: len(buffer.getvalue()) // 2]
+
+    response = client.post("/snippets/analyze/archive", files={"file": ("cut.tar.gz", truncated)})
+    assert response.status_code == 400
+
+
+def test_analyze_archive_rejects_oversized_upload(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "ANALYZER_UPLOAD_MAX_REQUEST_BYTES", 64)
+    response = client.post("/snippets/analyze/archive", files={"file": ("big.zip", b"x" * 128)})
+    assert response.status_code == 413
+
+
+def test_request_body_is_counted_while_received(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "ANALYZER_UPLOAD_MAX_REQUEST_BYTES", 64)
+
+    def body() -> Generator[bytes, None, None]:
+        # Chunked, without a Content-Length to check up front
+        yield b'{"name": "big", '
+        yield b'"content": "' + b"x" * 128 + b'"}'
+
+    response = client.post("/snippets/", content=body(), headers={"content-type": "application/json"})
+    assert response.status_code == 413
+
+
+def test_analysis_flags_existing_snippets_as_duplicates(client: TestClient, tmp_path: Path) -> None:
+    (tmp_path / "known.ps1").write_text("Get-Known", encoding="utf-8")
+    (tmp_path / "new.ps1").write_text("Get-New", encoding="utf-8")
+    created = client.post("/snippets/", json={"name": "known", "content": "Get-Known"})
+    assert created.status_code == 200
+
+    response = client.post("/snippets/analyze", params={"folder_path": str(tmp_path)})
+    flags = {r["content"]: r["is_duplicate"] for r in response.json()}
+    assert flags == {"Get-Known": True, "Get-New": False}
+
+
+def test_analysis_reports_near_duplicates(client: TestClient, tmp_path: Path) -> None:
+    content = "Get-ChildItem $path -Recurse | Where-Object { $_.Length -gt 1MB }"
+    stored = client.post("/snippets/", json={"name": "stored", "content": content}).json()
+    (tmp_path / "copy.ps1").write_text(
+        "# tweaked copy\nGet-ChildItem $root -Recurse | Where-Object { $_.Length -gt 1MB }", encoding="utf-8"
+    )
+
+    result = client.post("/snippets/analyze", params={"folder_path": str(tmp_path)}).json()[0]
+    assert result["is_duplicate"] is False
+    assert result["near_duplicates"] == [{"snippet_id": stored["id"], "name": "stored", "similarity": 1.0}]
@@ -0,0 +1,58 @@
+from app.services.snippet_chunker import snippet_chunker
+
+SCRIPT = """<#
+.SYNOPSIS
+Reads the config.
+#>
+function Get-Config {
+    param($Path)
+    Get-Content $Path | ConvertFrom-Json
+}
+
+function Set-Config {
+    param($Path, $Value)
+    $Value | ConvertTo-Json | Set-Content $Path
+}
+
+$config = Get-Config -Path config.json
+Set-Config -Path config.json -Value $config
+"""
+
+
+def test_functions_and_script_code_become_chunks() -> None:
+    # SCRIPT is longer than the limit, each of its pieces fits
+    chunks = snippet_chunker.chunk(SCRIPT, max_chars=200)
+
+    assert [c.name for c in chunks] == ["Get-Config", "Set-Config", None]
+    assert chunks[0].text(SCRIPT).startswith("<#\n.SYNOPSIS")  # Help stays with its function
+    assert chunks[1].text(SCRIPT).startswith("function Set-Config")
+    assert chunks[2].text(SCRIPT) == (
+        "$config = Get-Config -Path config.json\nSet-Config -Path config.json -Value $config"
+    )
+
+
+def test_long_chunks_are_split_at_line_breaks() -> None:
+    chunks = snippet_chunker.chunk(SCRIPT, max_chars=50)
+
+    assert all(c.end - c.start <= 50 for c in chunks)
+    # The parts of a function add up to the function's chunk
+    whole = snippet_chunker.chunk(SCRIPT, max_chars=200)[0]
+    assert "".join(c.text(SCRIPT) for c in chunks if c.name == "Get-Config") == whole.text(SCRIPT)
+    assert {c.name for c in chunks} == {"Get-Config", "Set-Config", None}
+
+
+def test_short_snippets_are_not_chunked() -> None:
+    assert snippet_chunker.chunk("Get-ChildItem | Sort-Object Length", max_chars=4000) == []
+    assert snippet_chunker.chunk(SCRIPT, max_chars=0) == []
+
+
+def test_short_snippets_with_several_functions_are_not_chunked() -> None:
+    assert snippet_chunker.chunk("function A { 1 }\nfunction B { 2 }", max_chars=4000) == []
+
+
+def test_embedding_text_names_snippet_and_function() -> None:
+    chunk = snippet_chunker.chunk(SCRIPT, max_chars=200)[1]
+
+    assert snippet_chunker.embedding_text("Config tools", chunk, SCRIPT).startswith(
+        "Config tools / Set-Config\nfunction Set-Config"
+    )
@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+import app.db.base  # noqa: F401  Registers all models before mappers are configured
+from app.core.config import settings
+from app.services.vector_index import vector_index
+from app.services.vector_store import VectorStore
+
+
+def _sql(stmt: object) -> str:
+    return " ".join(str(stmt.compile(dialect=postgresql.dialect())).split())  # type: ignore[attr-defined]
+
+
+def test_hnsw_index_covers_one_model() -> None:
+    statement = vector_index.create_statement("local_builtin/all-MiniLM-L6-v2", 384, "hnsw")
+
+    assert statement is not None
+    assert "USING hnsw ((embedding::vector(384)) vector_cosine_ops) WITH (m = 16, ef_construction = 64)" in statement
+    assert statement.endswith("WHERE embedding_model = 'local_builtin/all-MiniLM-L6-v2' AND embedding_dim = 384")
+
+
+def test_large_models_are_indexed_as_halfvec(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "VECTOR_IVFFLAT_LISTS", 0)
+
+    statement = vector_index.create_statement("openai/text-embedding-3-large", 3072, "ivfflat", rows=25_000)
+
+    assert statement is not None
+    assert "USING ivfflat ((embedding::halfvec(3072)) halfvec_cosine_ops) WITH (lists = 25)" in statement
+    assert vector_index.create_statement("custom/huge", 5000, "hnsw") is None
+    assert "'it''s/model'" in (vector_index.create_statement("it's/model", 8, "hnsw") or "")
+
+
+def test_search_matches_the_index_expression() -> None:
+    sql = _sql(VectorStore()._exact_statement([0.1, 0.2], "openai/text-embedding-3-small", limit=3))
+
+    assert "CAST(snippet.embedding AS VECTOR(2)) <=>" in sql
+    assert "snippet.embedding_model = " in sql and "snippet.embedding_dim = " in sql
+
+
+def test_recall_knobs_apply_to_the_transaction(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "VECTOR_HNSW_EF_SEARCH", 40)
+
+    stmt = vector_index.tune_statement(limit=100)
+
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    # ef_search is raised to the limit, is_local=true scopes both to the search's transaction
+    assert {"hnsw.ef_search", "100", "ivfflat.probes", "10"} <= set(params.values())
+    assert list(params.values()).count(True) == 2
@@ -0,0 +1,45 @@
+from sqlalchemy.dialects import postgresql
+
+import app.db.base  # noqa: F401  Registers all models before mappers are configured
+from app.services.vector_store import VectorStore, lexical_terms, quantize_binary
+
+
+def test_quantize_binary_sets_bits_for_positive_values() -> None:
+    assert quantize_binary([0.3, -0.1, 0.0, 2.0]) == "1001"
+
+
+def test_quantized_search_reranks_hamming_candidates() -> None:
+    stmt = VectorStore()._quantized_statement([0.5, -0.5], "openai/text-embedding-3-small", limit=3)
+
+    sql = " ".join(str(stmt.compile(dialect=postgresql.dialect())).split())
+
+    # Candidates by Hamming distance on the bits, final order by exact cosine distance
+    inner, outer = sql.split(") AS anon_1)")
+    assert "ORDER BY snippet.embedding_bits <~> CAST(" in inner and "AS BIT VARYING)" in inner
+    assert outer.strip().startswith("ORDER BY distance")
+    assert "snippet.embedding <=> " in sql.split(" FROM ")[0]
+
+
+def test_snippets_rank_by_their_best_chunk() -> None:
+    # (snippet id, distance) from the snippet and chunk searches
+    hits = [(1, 0.40), (2, 0.30), (3, 0.50), (1, 0.10), (3, 0.35)]
+
+    assert VectorStore.merge_hits(hits, limit=2) == [1, 2]
+
+
+def test_lexical_terms_keep_cmdlet_names_and_drop_prose() -> None:
+    terms = lexical_terms("Write a script that uses Get-ADUser to list disabled users, please")
+
+    assert terms == ["uses", "get-aduser", "list", "disabled", "users"]
+
+
+def test_hybrid_search_fuses_both_rankings_in_one_statement() -> None:
+    stmt = VectorStore()._hybrid_statement(["get-aduser", "disabled"], [0.5, -0.5], "openai/text-embedding-3-small", 3)
+
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    sql = " ".join(str(compiled).split())
+    assert "WITH vector_ranked AS" in sql and "lexical_ranked AS" in sql
+    assert "snippet.search_vector @@ to_tsquery('simple'," in sql
+    assert "FROM vector_ranked FULL OUTER JOIN lexical_ranked" in sql
+    assert "ORDER BY score DESC LIMIT" in sql
+    assert "get-aduser | disabled" in compiled.params.values()